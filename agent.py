@@ -0,0 +1,715 @@
+"""
+Agent core shared by the Streamlit UI (app.py) and the HTTP API (api.py).
+
+Holds the LLM clients, prompts, tools, chatbot node and the LangGraph
+definition, so the graph can be compiled once per process and reused by
+every caller instead of being rebuilt on each Streamlit rerun.
+"""
+import os
+import json
+import hashlib
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextvars import copy_context
+from typing import Dict, Any, List, Optional, Annotated
+from chatbot_model import (
+    UserMemory,
+    ChatbotState,
+    ProfileAnalysisModel,
+    JobFitModel,
+    ContentGenerationModel,
+)
+from llm_utils import call_llm_and_parse
+from llm_scheduler import BACKGROUND, estimate_tokens, llm_context, llm_scheduler
+from profiling import span, instrument_checkpointer
+from profile_preprocessing import normalize_url, profile_version
+from storage import get_store
+from intent import classify_intent, normalize_role, SpeculationStats
+from response_cache import RESPONSE_CACHE, response_cache, replay_tool_calls
+from prompt_templates import (
+    PROFILE_ANALYSIS_TEMPLATE,
+    JOB_FIT_TEMPLATE,
+    CONTENT_GENERATION_TEMPLATE,
+    CHATBOT_SYSTEM_PROMPT,
+)
+from openai import OpenAI
+from dotenv import load_dotenv
+from langchain_openai import ChatOpenAI
+from langchain_core.messages import SystemMessage, HumanMessage, AIMessage, BaseMessage, ToolMessage
+from langchain_core.tools import tool, InjectedToolCallId
+from langchain_core.runnables import RunnableConfig
+from langgraph.graph import StateGraph, END, START
+from langgraph.prebuilt import ToolNode, tools_condition, InjectedState
+from langgraph.types import Command
+try:
+    from langgraph.config import get_stream_writer
+except ImportError:  # older langgraph: no custom stream events
+    get_stream_writer = None
+
+
+# ========== 1. ENVIRONMENT & LLM SETUP ==========
+load_dotenv()
+groq_key = os.getenv("GROQ_API_KEY")
+assert groq_key, "GROQ_API_KEY not found in environment!"
+groq_client=OpenAI(
+            api_key=os.getenv("GROQ_API_KEY"),
+            base_url="https://api.groq.com/openai/v1"
+        )
+
+USER_MEMORY_MAX_ENTRIES = int(os.getenv("USER_MEMORY_MAX_ENTRIES", "50"))
+
+
+def get_user_memory(config: Optional[RunnableConfig]) -> UserMemory:
+    """
+    Memory of the thread the current graph run belongs to.
+    Runs without a thread_id get a throwaway, unpersisted memory.
+    """
+    thread_id = ((config or {}).get("configurable") or {}).get("thread_id")
+    store = get_store() if thread_id is not None else None
+    return UserMemory(thread_id, store=store, max_entries=USER_MEMORY_MAX_ENTRIES)
+
+
+def analysis_memory_key(profile: Dict[str, Any]) -> str:
+    return f"{PROFILE_ANALYSIS_TEMPLATE.cache_tag}:{profile_version(profile)}"
+
+
+def job_fit_memory_key(profile: Dict[str, Any], target_role: Optional[str]) -> str:
+    return f"{JOB_FIT_TEMPLATE.cache_tag}:{profile_version(profile)}:{normalize_role(target_role)}"
+
+# ========== 7. AGENT FUNCTIONS ==========
+
+def run_profile_analysis(profile: Dict[str, Any]) -> dict:
+    """
+    Run the profile analysis LLM call (no caching, no state updates).
+    """
+    messages = PROFILE_ANALYSIS_TEMPLATE.messages(profile)
+    analysis_model = call_llm_and_parse(groq_client,messages, ProfileAnalysisModel)
+    return analysis_model.model_dump()
+
+
+def run_job_fit(profile: Dict[str, Any], target_role: Optional[str]) -> dict:
+    """
+    Run the job fit LLM call (no caching, no state updates).
+    Raises if the response can't be parsed.
+    """
+    messages = JOB_FIT_TEMPLATE.messages(profile, target_role=target_role)
+    job_fit_model = call_llm_and_parse(groq_client,messages, JobFitModel)
+    job_fit_dict = job_fit_model.model_dump()
+    job_fit_dict["target_role"] = target_role
+    return job_fit_dict
+
+
+# ========== SPECULATIVE TOOL PREFETCH ==========
+# While chatbot_node waits for the router LLM, the tool the local intent
+# classifier expects is already started. If the router agrees, the tool picks
+# up the running result instead of starting its own LLM call; otherwise the
+# speculative result is discarded.
+SPECULATIVE_PREFETCH = os.getenv("SPECULATIVE_PREFETCH", "1") == "1"
+SPECULATION_MAX_AGE = 600  # seconds an unclaimed speculative result is kept
+
+_speculation_pool = ThreadPoolExecutor(
+    max_workers=int(os.getenv("SPECULATION_WORKERS", "4")), thread_name_prefix="speculation"
+)
+_speculative: Dict[str, Dict[str, Any]] = {}
+_speculative_lock = threading.Lock()
+speculation_stats = SpeculationStats()
+
+
+def _timed_call(fn, *args):
+    started = time.perf_counter()
+    result = fn(*args)
+    return result, started, time.perf_counter()
+
+
+def _speculative_call(fn, *args):
+    # A wrong guess can't be cancelled once its LLM call starts, so it queues
+    # behind every real turn
+    with llm_context(priority=BACKGROUND):
+        return _timed_call(fn, *args)
+
+
+def _thread_id(config: Optional[RunnableConfig]) -> Optional[str]:
+    return ((config or {}).get("configurable") or {}).get("thread_id")
+
+
+def start_speculation(state: ChatbotState, config: Optional[RunnableConfig]) -> Optional[Dict[str, Any]]:
+    """
+    Classify the latest user message and start the expected LLM-backed tool.
+    """
+    messages = state.get("messages", []) or []
+    if not SPECULATIVE_PREFETCH or not messages or not isinstance(messages[-1], HumanMessage):
+        return None
+    intent = classify_intent(messages[-1].content)
+    profile = state.get("profile", {}) or {}
+    if intent.tool == "profile_analyzer":
+        memory_key = analysis_memory_key(profile)
+        fn, args = run_profile_analysis, (profile,)
+    elif intent.tool == "job_matcher":
+        memory_key = job_fit_memory_key(profile, intent.args.get("target_role"))
+        fn, args = run_job_fit, (profile, intent.args.get("target_role"))
+    else:
+        return None
+    # Nothing to gain if the result is already remembered
+    if get_user_memory(config).get(memory_key) is not None:
+        return None
+
+    speculation_stats.record_attempt()
+    print(f"[speculation] prefetching {intent.tool} {intent.args}")
+    return {
+        "intent": intent,
+        "key": f"{_thread_id(config)}:{memory_key}",
+        "future": _speculation_pool.submit(copy_context().run, _speculative_call, fn, *args),
+        "created": time.time(),
+    }
+
+
+def resolve_speculation(speculation: Optional[Dict[str, Any]], response: AIMessage) -> None:
+    """
+    Compare the router's tool call with the speculation: park it for the tool on
+    a hit, drop it on a miss.
+    """
+    if speculation is None:
+        return
+    intent = speculation["intent"]
+    calls = getattr(response, "tool_calls", None) or []
+    call = calls[0] if calls else {}
+    hit = call.get("name") == intent.tool
+    if hit and intent.tool == "job_matcher":
+        hit = normalize_role(call.get("args", {}).get("target_role")) == normalize_role(intent.args.get("target_role"))
+
+    if not hit:
+        speculation["future"].cancel()
+        speculation_stats.record_miss()
+        print(f"[speculation] miss: router chose {call.get('name')}, hit rate {speculation_stats.summary()['hit_rate']}")
+        return
+
+    with _speculative_lock:
+        now = time.time()
+        for key in [k for k, v in _speculative.items() if now - v["created"] > SPECULATION_MAX_AGE]:
+            _speculative.pop(key)["future"].cancel()
+        _speculative[speculation["key"]] = speculation
+
+
+def take_speculative_result(config: Optional[RunnableConfig], memory_key: str) -> Optional[dict]:
+    """
+    Result of a confirmed speculation for this tool call, waiting for it if it
+    is still running. None if there is none or it failed.
+    """
+    with _speculative_lock:
+        speculation = _speculative.pop(f"{_thread_id(config)}:{memory_key}", None)
+    if speculation is None:
+        return None
+    claimed_at = time.perf_counter()
+    try:
+        result, started, finished = speculation["future"].result()
+    except Exception as e:
+        print(f"[speculation] prefetched call failed: {e}")
+        speculation_stats.record_miss()
+        return None
+    # Without speculation the call would have started now and taken (finished - started).
+    duration = finished - started
+    waited = max(0.0, finished - claimed_at)
+    saved = duration - waited
+    speculation_stats.record_hit(saved)
+    print(f"[speculation] hit, saved {saved:.2f}s ({speculation_stats.summary()})")
+    return result
+
+
+# --- Tool: Profile Analyzer ---
+@tool
+def profile_analyzer(state: Annotated[ChatbotState, InjectedState], config: RunnableConfig) -> dict:
+    """
+    Tool: Analyze the overall full user's profile to give strengths, weaknesses, suggestions.
+    This is needed only if full analysis of profile is needed. 
+    Returns the full analysis in the form of a json.
+
+    - It takes no arguments
+    """
+
+
+    # Get summarized profile (dictionary of strings)
+    profile = getattr(state, "profile", {}) or {}
+    memory = get_user_memory(config)
+    memory_key = analysis_memory_key(profile)
+
+    # Reuse the analysis of this exact profile version if we already have it
+    analysis_dict = memory.get(memory_key)
+    if analysis_dict is not None:
+        print("💾 [DEBUG] Reusing profile analysis from user memory.")
+    else:
+        analysis_dict = take_speculative_result(config, memory_key) or run_profile_analysis(profile)
+        memory.save(memory_key, analysis_dict)
+        print("💾 [DEBUG] Saved analysis to user memory.")
+
+    # Save to state
+    state.profile_analysis = analysis_dict
+    print("📦 [DEBUG] Updated state.profile_analysis with analysis.")
+
+    return analysis_dict
+
+# --- Tool: Job Matcher ---
+
+
+@tool
+def job_matcher(
+    state: Annotated[ChatbotState, InjectedState],
+    config: RunnableConfig,
+    target_role: str = None
+) -> dict:
+    """
+    Tool: Analyze how well the user's profile fits the target role.
+    - If user is asking if he is a good fit for a certain role, or needs to see if his profile is compatible with a certain role, call this.
+    - Takes target_role as an argument.
+    - this tool is needed when match score, missing skills, suggestions are needed based on a job name given.
+    """
+    print(f"target role is {target_role}")
+    # Update state.target_role if provided
+
+    profile = getattr(state, "profile", {}) or {}
+    memory = get_user_memory(config)
+    memory_key = job_fit_memory_key(profile, target_role)
+
+    job_fit_dict = memory.get(memory_key)
+    if job_fit_dict is not None:
+        # Remembered under the normalized role; show it the way the user asked
+        job_fit_dict = dict(job_fit_dict, target_role=target_role)
+    else:
+        # Call LLM and parse
+        try:
+            job_fit_dict = take_speculative_result(config, memory_key) or run_job_fit(profile, target_role)
+            # Keep the role exactly as the router passed it
+            job_fit_dict["target_role"] = target_role
+            # Roles asked about are kept warm by prewarm.py
+            memory.add_target_role(target_role)
+            memory.save(memory_key, job_fit_dict)
+        except Exception as e:
+            # Failures are not remembered, so the next ask retries. The "error"
+            # key sends the turn back to the chatbot instead of a 0% summary.
+            job_fit_dict = {
+                "target_role":target_role,
+                "match_score": 0,
+                "missing_skills": [],
+                "suggestions": ["Parsing failed or incomplete response."],
+                "error": str(e),
+            }
+
+    # Save to state
+    state.job_fit = job_fit_dict
+
+    return job_fit_dict
+
+
+
+
+
+
+@tool
+def extract_from_state_tool(
+    state: Annotated[ChatbotState, InjectedState],
+    key: str
+) -> dict:
+    """
+    This tool is used if user wants to ask about any particular part of this profile. Use this if a singe section is targeted. It expects key as an arguement, that represents what
+    the user is wanting to look at, from his profile.
+    Argument:
+      key: only pass one from the below list, identify one thing the user wants to look into and choose that:
+        "sections.about", "sections.headline", "sections.skills", "sections.projects",
+        "sections.educations", "sections.certifications", "sections.honors_and_awards",
+        "sections.experiences", "sections.publications", "sections.patents",
+        "sections.courses", "sections.test_scores", "sections.verifications",
+        "sections.highlights", "sections.job_title", "sections.company_name",
+        "sections.company_industry", "sections.current_job_duration", "sections.full_name",
+        "enhanced_content,"profile_analysis", "job_fit", "target_role", "editing_section"
+    """
+    value = state
+    try:
+        for part in key.split('.'):
+            # Support both dict and Pydantic model
+            if isinstance(value, dict):
+                value = value.get(part)
+            elif hasattr(value, part):
+                value = getattr(value, part)
+            else:
+                value = None
+            if value is None:
+                break
+    except Exception:
+        value = None
+    return {"result": value}
+
+
+# --- Tool: Content Generator ---
+CONTENT_VARIANTS = int(os.getenv("CONTENT_VARIANTS", "3"))
+CONTENT_CACHE_TTL = 7 * 24 * 3600
+
+# One style hint per variant, so concurrent samples come back meaningfully different
+CONTENT_STYLES = [
+    "Keep it concise and punchy, focused on the strongest points.",
+    "Emphasize measurable impact, results and concrete technologies.",
+    "Use a warm, first-person storytelling tone that shows motivation.",
+    "Optimize for recruiter keyword search without keyword stuffing.",
+]
+
+# Shared by every session; llm_scheduler enforces the rate limits, so the pool
+# only needs to keep concurrent enhancement requests from queueing behind each other
+CONTENT_POOL_WORKERS = int(os.getenv("CONTENT_POOL_WORKERS", str(4 * max(CONTENT_VARIANTS, 1))))
+_content_pool = ThreadPoolExecutor(
+    max_workers=max(CONTENT_POOL_WORKERS, 1), thread_name_prefix="content"
+)
+
+
+def _content_cache_key(section: str, text: str, instructions: str) -> str:
+    digest = hashlib.sha256(
+        f"{CONTENT_GENERATION_TEMPLATE.cache_tag}|{CONTENT_VARIANTS}|{section}|{instructions}|{text}".encode("utf-8")
+    ).hexdigest()
+    return f"content:{digest}"
+
+
+def _generate_variant(messages: List[Dict[str, str]]) -> str:
+    result = call_llm_and_parse(groq_client, messages, ContentGenerationModel)
+    if isinstance(result, dict):
+        raise ValueError(result.get("error", "content generation failed"))
+    return result.new_content
+
+
+@tool
+def content_generator(
+    state: Annotated[ChatbotState, InjectedState],
+    tool_call_id: Annotated[str, InjectedToolCallId],
+    section: str,
+    instructions: str = ""
+):
+    """
+    Tool: Rewrite / enhance one section of the user's profile and return several alternative versions.
+    - Use this whenever the user asks to enhance, improve, rewrite or polish a section.
+    Arguments:
+      section: one of "about", "headline", "skills", "projects", "experiences", "educations",
+        "certifications", "honors_and_awards", "job_title"
+      instructions: optional extra wishes from the user (tone, length, focus), else empty
+    """
+    key = section.strip().lower().replace("sections.", "").replace(" ", "_")
+    sections = getattr(state, "sections", {}) or {}
+    if key not in sections:
+        return {"error": f"Unknown section '{section}'."}
+    text = sections.get(key, "")
+    profile = getattr(state, "profile", {}) or {}
+
+    store = get_store()
+    cache_key = _content_cache_key(key, text, instructions)
+    variants = store.get(cache_key)
+    if variants:
+        print(f"💾 [DEBUG] Reusing {len(variants)} cached variants for {key}.")
+    else:
+        writer = None
+        if get_stream_writer is not None:
+            try:
+                writer = get_stream_writer()
+            except Exception:
+                writer = None
+        futures = [
+            _content_pool.submit(
+                copy_context().run, _generate_variant,
+                CONTENT_GENERATION_TEMPLATE.messages(
+                    profile, section=key, text=text or "(empty)",
+                    style=CONTENT_STYLES[i % len(CONTENT_STYLES)], instructions=instructions or "none",
+                ),
+            )
+            for i in range(CONTENT_VARIANTS)
+        ]
+        variants = []
+        for future in as_completed(futures):
+            try:
+                variant = future.result()
+            except Exception as e:
+                print(f"[content_generator] variant failed: {e}")
+                continue
+            variants.append(variant)
+            # Show the first finished variant right away; the rest follow with the tool result
+            if writer is not None:
+                writer({"type": "content_variant", "section": key, "index": len(variants) - 1, "text": variant})
+        if not variants:
+            return {"error": "Content generation failed, please try again."}
+        store.set(cache_key, variants, ttl=CONTENT_CACHE_TTL)
+
+    # InjectedState is a copy: the graph state only changes through a Command update
+    result = {"section": key, "original": text, "variants": variants}
+    return Command(update={
+        "enhanced_content": {**(getattr(state, "enhanced_content", {}) or {}), key: variants[0]},
+        "editing_section": key,
+        "messages": [ToolMessage(content=json.dumps(result, ensure_ascii=False), name="content_generator",
+                                 tool_call_id=tool_call_id)],
+    })
+
+
+tools = [
+    profile_analyzer,
+   job_matcher,
+    extract_from_state_tool,
+    content_generator
+]
+llm = ChatOpenAI(
+    api_key=groq_key,
+    base_url="https://api.groq.com/openai/v1",
+    model="llama3-8b-8192",
+    temperature=0,
+    # Rate-limit headers feed llm_scheduler
+    include_response_headers=True
+)
+llm_with_tools = llm.bind_tools(tools)
+# Output budget assumed when admitting router calls (tool call or short reply)
+ROUTER_MAX_TOKENS = 256
+
+
+
+# ========== 8. LANGGRAPH PIPELINE ==========
+
+# --- Response cache ---
+# Router responses to a user question, reused for near-identical questions on
+# the same profile version (see response_cache.py).
+
+
+def cached_router_response(version: str, question: Optional[str]) -> Optional[AIMessage]:
+    """
+    The cached router response for this question, marked as cached, or None.
+    """
+    if not RESPONSE_CACHE or question is None:
+        return None
+    with span("response_cache.lookup"):
+        hit = response_cache.lookup(version, question)
+    if hit is None:
+        return None
+    print(f"[response_cache] hit ({hit['similarity']:.2f}) for {question!r} via {hit['question']!r}")
+    return AIMessage(
+        content=hit["content"],
+        tool_calls=replay_tool_calls(hit["tool_calls"]),
+        response_metadata={"response_cache": {"similarity": round(hit["similarity"], 3),
+                                              "question": hit["question"]}},
+    )
+
+
+def remember_router_response(version: str, question: str, response: AIMessage, seconds: float) -> None:
+    # Only tool routing is reused: a free-text answer belongs to its conversation
+    if not RESPONSE_CACHE or not response.tool_calls:
+        return
+    content = response.content if isinstance(response.content, str) else ""
+    tool_calls = [{"name": call["name"], "args": call.get("args") or {}} for call in response.tool_calls]
+    response_cache.store(version, question, {"content": content, "tool_calls": tool_calls}, seconds)
+
+
+
+def chatbot_node(state: ChatbotState, config: RunnableConfig) -> ChatbotState:
+    ChatbotState.model_validate(state)
+
+    messages = state.get("messages", [])
+
+    system_prompt = CHATBOT_SYSTEM_PROMPT
+    recent_messages = []
+    for msg in messages[-6:]:  # last few, e.g., 6
+        if isinstance(msg, HumanMessage):
+            recent_messages.append({
+                "role": "user",
+                "content": f"User asked: {msg.content}"
+            })
+        elif isinstance(msg, AIMessage):
+        # keep only non-empty AI replies (actual answers)
+            if msg.content.strip():
+                recent_messages.append({
+                    "role": "assistant",
+                    "content": msg.content
+                })
+        elif isinstance(msg, ToolMessage):
+            recent_messages.append({
+                "role": "assistant",
+                "content": f"[Tool: {msg.name}] {msg.content}"
+            })
+
+
+    # A new question against an unchanged profile may have been answered before
+    last = (state.get("messages") or [None])[-1]
+    question = last.content if isinstance(last, HumanMessage) else None
+    version = profile_version(state.get("profile", {}) or {})
+    cached = cached_router_response(version, question)
+    if cached is not None:
+        state.setdefault("messages", []).append(cached)
+        return state
+
+    # Build messages & invoke LLM
+    messages = [SystemMessage(content=system_prompt)] + recent_messages
+    # messages = [SystemMessage(content=system_prompt)]
+    speculation = start_speculation(state, config)
+    if question is not None:
+        speculation_stats.record_turn()
+    started = time.perf_counter()
+    with llm_scheduler.admit(estimate_tokens(messages, ROUTER_MAX_TOKENS)) as admission, span("llm.router"):
+        response = llm_with_tools.invoke(messages)
+    admission.record((response.usage_metadata or {}).get("total_tokens"),
+                     (response.response_metadata or {}).get("headers"))
+    resolve_speculation(speculation, response)
+    if question is not None:
+        remember_router_response(version, question, response, time.perf_counter() - started)
+    if hasattr(response, "tool_calls") and response.tool_calls:
+        first_tool = response.tool_calls[0]
+        tool_name = first_tool.get("name") if isinstance(first_tool, dict) else getattr(first_tool, "name", None)
+        tool_args = first_tool.get("args") if isinstance(first_tool, dict) else getattr(first_tool, "args", {})
+        print(f"[DEBBBBUUUUGGG] using tool {tool_name}")
+
+    # DEBUG
+    print("[DEBUG] LLM response:", response)
+    state.setdefault("messages", []).append(response)
+
+    return state
+
+
+
+
+
+# --- Routing after tools ---
+# "direct": structured results of the tools below end the turn; the UI renders
+#           them as rich cards, so no extra LLM call is spent phrasing them.
+# "narrative": always loop back to the chatbot to answer in prose.
+AGENT_RESPONSE_MODE = os.getenv("AGENT_RESPONSE_MODE", "direct")
+# In direct mode, add a short templated AI message after the tool card.
+AGENT_TOOL_SUMMARY = os.getenv("AGENT_TOOL_SUMMARY", "1") == "1"
+DIRECT_RENDER_TOOLS = {"profile_analyzer", "job_matcher", "extract_from_state_tool", "content_generator"}
+
+
+def _last_tool_result(state: ChatbotState):
+    messages = state.get("messages", []) or []
+    if not messages or not isinstance(messages[-1], ToolMessage):
+        return None, None
+    msg = messages[-1]
+    try:
+        parsed = json.loads(msg.content)
+    except Exception:
+        return msg.name, None
+    return msg.name, parsed if isinstance(parsed, dict) else None
+
+
+def _last_human_text(state: ChatbotState) -> str:
+    for msg in reversed(state.get("messages", []) or []):
+        if isinstance(msg, HumanMessage):
+            return msg.content
+    return ""
+
+
+def route_after_tools(state: ChatbotState) -> str:
+    if AGENT_RESPONSE_MODE != "direct":
+        return "chatbot"
+    name, parsed = _last_tool_result(state)
+    if name not in DIRECT_RENDER_TOOLS or not parsed or "error" in parsed:
+        return "chatbot"
+    if name == "extract_from_state_tool":
+        if not parsed.get("result"):
+            return "chatbot"
+        # Extraction is only the first step of an enhancement request
+        if classify_intent(_last_human_text(state)).kind == "enhance":
+            return "chatbot"
+    return "tool_summary" if AGENT_TOOL_SUMMARY else END
+
+
+def _tool_summary_text(name: str, parsed: Dict[str, Any]) -> str:
+    if name == "profile_analyzer":
+        suggestions = parsed.get("suggestions", []) or []
+        return (
+            f"Here is your full profile analysis, with {len(suggestions)} suggestions to improve it. "
+            "Ask me to enhance any section or check your fit for a role next."
+        )
+    if name == "job_matcher":
+        missing = parsed.get("missing_skills", []) or []
+        return (
+            f"Your profile matches the {parsed.get('target_role') or 'target'} role at "
+            f"{parsed.get('match_score', 0)}%, with {len(missing)} key skills missing. "
+            "See the suggestions above to close the gap."
+        )
+    if name == "content_generator":
+        return (
+            f"Here are {len(parsed.get('variants', []))} alternative versions of your "
+            f"{parsed.get('section', '').replace('_', ' ')} section. Pick one, or tell me how to adjust them."
+        )
+    return "That's the section from your profile. Want me to enhance it?"
+
+
+def tool_summary_node(state: ChatbotState) -> ChatbotState:
+    name, parsed = _last_tool_result(state)
+    state.setdefault("messages", []).append(AIMessage(content=_tool_summary_text(name, parsed or {})))
+    return state
+
+
+# --- Graph definition ---
+graph = StateGraph(state_schema=ChatbotState)
+graph.add_node("chatbot", chatbot_node)
+graph.add_node("tools", ToolNode(tools))
+graph.add_node("tool_summary", tool_summary_node)
+graph.add_edge(START, "chatbot")
+graph.add_conditional_edges("chatbot", tools_condition)
+graph.add_conditional_edges(
+    "tools",
+    route_after_tools,
+    {"chatbot": "chatbot", "tool_summary": "tool_summary", END: END},
+)
+graph.add_edge("tool_summary", END)
+graph.set_entry_point("chatbot")
+
+
+def compile_graph(checkpointer):
+    """
+    Compile the agent graph against the given checkpointer.
+    """
+    return graph.compile(checkpointer=instrument_checkpointer(checkpointer))
+
+
+# Find or create thread
+LEGACY_SCAN_KEY = "thread:legacy_scanned"
+
+
+def _thread_config(thread_id):
+    return {"configurable": {"thread_id": str(thread_id), "checkpoint_ns": ""}}
+
+
+def _index_legacy_threads(store, max_threads=100):
+    # Threads created before the URL index existed only live in the checkpoint
+    # table under ids 0..max_threads-1; index them once per store.
+    if not store.add(LEGACY_SCAN_KEY, True):
+        return
+    checkpointer = store.checkpointer()
+    for tid in range(max_threads):
+        state = checkpointer.get(_thread_config(tid))
+        if state and "channel_values" in state:
+            stored_url = normalize_url(state["channel_values"].get("profile_url", "") or "")
+            if stored_url and store.find_thread(stored_url) is None:
+                store.register_thread(stored_url, str(tid))
+
+
+def find_thread_id_for_url(store, url, max_threads=100):
+    search_url = normalize_url(url)
+    _index_legacy_threads(store, max_threads)
+    thread_id = store.find_thread(search_url)
+    if thread_id is None:
+        return None, None
+    state = store.checkpointer().get(_thread_config(thread_id))
+    if state and "channel_values" in state:
+        return thread_id, state["channel_values"]
+    return None, None
+
+def delete_thread_checkpoint(store, thread_id):
+    UserMemory(thread_id, store=store).clear()
+    checkpointer = store.checkpointer()
+    # For SqliteSaver, use the delete_thread method if available
+    if hasattr(checkpointer, "delete_thread"):
+        checkpointer.delete_thread(thread_id)
+    else:
+        # For in-memory or custom checkpointers, implement as needed
+        pass
+
+
+def get_next_thread_id(store):
+    """
+    Allocate a thread id that is unused by every worker sharing the store.
+    """
+    checkpointer = store.checkpointer()
+    while True:
+        tid = store.allocate_thread_id()
+        # Skip ids already taken by threads from before the shared counter.
+        if not checkpointer.get(_thread_config(tid)):
+            return tid
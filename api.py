@@ -0,0 +1,299 @@
+"""
+Headless HTTP API for the LinkedIn assistant.
+
+Serves the same LangGraph agent as the Streamlit UI, without re-running a
+whole Streamlit script per request. The graph is compiled once per worker
+process and shared by every request; checkpoints, the thread index and
+pending threads live in the shared store, so any worker can serve any thread.
+
+Run with:
+    uvicorn api:app --host 0.0.0.0 --port 8000 --workers 4
+"""
+import asyncio
+import json
+from typing import Dict, Any, List, Optional
+
+from fastapi import FastAPI, HTTPException
+from fastapi.responses import StreamingResponse
+from fastapi.concurrency import run_in_threadpool
+from pydantic import BaseModel, Field
+from langchain_core.messages import HumanMessage, AIMessage, ToolMessage, BaseMessage
+
+from agent import (
+    compile_graph,
+    find_thread_id_for_url,
+    delete_thread_checkpoint,
+    get_next_thread_id,
+    speculation_stats,
+)
+from llm_scheduler import llm_scheduler
+from llm_utils import retry_stats
+from response_cache import response_cache
+from profile_preprocessing import initialize_state, is_profile_url, normalize_url
+from scraping_profile import scrape_linkedin_profile
+from storage import get_store
+
+
+# ========== SHARED GRAPH & STORE ==========
+store = get_store()
+app_graph = compile_graph(store.checkpointer())
+
+# Freshly scraped threads that have not received their first message yet are
+# kept in the store under this prefix (the Streamlit UI keeps them in
+# st.session_state instead).
+PENDING_PREFIX = "pending:"
+PENDING_TTL = 24 * 3600
+TURN_LOCK_TTL = 300
+
+app = FastAPI(title="LinkedIn AI Career Assistant API")
+
+
+# ========== REQUEST / RESPONSE MODELS ==========
+
+class ThreadRequest(BaseModel):
+    profile_url: str = Field(..., description="LinkedIn profile URL, e.g. https://www.linkedin.com/in/username/")
+    new_chat: bool = Field(False, description="Discard an existing thread for this URL and start over.")
+
+
+class ThreadResponse(BaseModel):
+    thread_id: str
+    profile_url: str
+    created: bool
+
+
+class MessageRequest(BaseModel):
+    content: str = Field(..., min_length=1)
+
+
+# ========== HELPERS ==========
+
+def serialize_message(msg: BaseMessage) -> Dict[str, Any]:
+    """
+    Convert a LangChain message into a JSON-friendly dict.
+    """
+    data: Dict[str, Any] = {"type": msg.type, "content": msg.content}
+    if isinstance(msg, ToolMessage):
+        data["name"] = msg.name
+        try:
+            data["result"] = json.loads(msg.content)
+        except Exception:
+            data["result"] = None
+    elif isinstance(msg, AIMessage):
+        if msg.tool_calls:
+            data["tool_calls"] = [
+                {"name": call.get("name"), "args": call.get("args", {})} for call in msg.tool_calls
+            ]
+        cached = (msg.response_metadata or {}).get("response_cache")
+        if cached:
+            data["cached"] = cached
+    return data
+
+
+def _thread_config(thread_id: str) -> Dict[str, Any]:
+    return {"configurable": {"thread_id": thread_id}}
+
+
+def _turn_lock(thread_id: str):
+    # Turns on the same thread must not interleave their checkpoint writes,
+    # even when they land on different workers.
+    return store.lock(f"turn:{thread_id}", ttl=TURN_LOCK_TTL, wait=TURN_LOCK_TTL)
+
+
+def _load_state(thread_id: str) -> Dict[str, Any]:
+    snapshot = app_graph.get_state(_thread_config(thread_id))
+    if snapshot and snapshot.values:
+        return dict(snapshot.values)
+    pending = store.get(PENDING_PREFIX + thread_id)
+    if pending:
+        return pending
+    raise HTTPException(status_code=404, detail=f"Unknown thread_id {thread_id}")
+
+
+def _latest_tool_result(messages: List[BaseMessage], tool_name: str) -> Optional[Dict[str, Any]]:
+    for msg in reversed(messages):
+        if isinstance(msg, ToolMessage) and msg.name == tool_name:
+            try:
+                return json.loads(msg.content)
+            except Exception:
+                return None
+    return None
+
+
+def _create_thread(url: str, new_chat: bool) -> ThreadResponse:
+    with store.lock(f"create:{url}", ttl=TURN_LOCK_TTL, wait=TURN_LOCK_TTL):
+        existing_thread_id, previous_state = find_thread_id_for_url(store, url)
+        indexed_thread_id = store.find_thread(url)
+        if not new_chat:
+            if existing_thread_id and previous_state:
+                return ThreadResponse(thread_id=existing_thread_id, profile_url=url, created=False)
+            if indexed_thread_id and store.get(PENDING_PREFIX + indexed_thread_id):
+                return ThreadResponse(thread_id=indexed_thread_id, profile_url=url, created=False)
+
+        # Scrape before touching the old thread, so a failed scrape keeps it
+        raw = scrape_linkedin_profile(url)
+        if not raw:
+            raise HTTPException(status_code=502, detail="Profile scraping failed.")
+        state = initialize_state(raw)
+        state["profile_url"] = url
+        state["messages"] = []
+
+        thread_id = existing_thread_id or indexed_thread_id or get_next_thread_id(store)
+        with _turn_lock(thread_id):
+            if existing_thread_id:
+                delete_thread_checkpoint(store, existing_thread_id)
+            store.set(PENDING_PREFIX + thread_id, state, ttl=PENDING_TTL)
+        store.register_thread(url, thread_id)
+        store.mark_scraped(thread_id)
+    return ThreadResponse(thread_id=thread_id, profile_url=url, created=True)
+
+
+def _prepare_turn(thread_id: str, content: str) -> Dict[str, Any]:
+    state = _load_state(thread_id)
+    if "profile" not in state or "sections" not in state:
+        raise HTTPException(status_code=409, detail="Thread is still being initialized.")
+    state["messages"] = list(state.get("messages", [])) + [HumanMessage(content=content.strip())]
+    return state
+
+
+def _sse(event: str, data: Any) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+# ========== ENDPOINTS ==========
+
+@app.post("/threads", response_model=ThreadResponse)
+async def create_or_get_thread(req: ThreadRequest) -> ThreadResponse:
+    """
+    Look up the thread for a profile URL, or scrape the profile and create one.
+    """
+    if not is_profile_url(req.profile_url):
+        raise HTTPException(status_code=422,
+                            detail="Invalid LinkedIn profile URL, expected https://www.linkedin.com/in/<username>/")
+    url = normalize_url(req.profile_url)
+    return await run_in_threadpool(_create_thread, url, req.new_chat)
+
+
+@app.get("/threads", response_model=ThreadResponse)
+async def lookup_thread(profile_url: str) -> ThreadResponse:
+    url = normalize_url(profile_url)
+    thread_id = await run_in_threadpool(store.find_thread, url)
+    if thread_id is None:
+        raise HTTPException(status_code=404, detail="No thread for this profile URL.")
+    return ThreadResponse(thread_id=thread_id, profile_url=url, created=False)
+
+
+@app.get("/threads/{thread_id}/messages")
+async def get_messages(thread_id: str) -> Dict[str, Any]:
+    state = await run_in_threadpool(_load_state, thread_id)
+    return {"thread_id": thread_id, "messages": [serialize_message(m) for m in state.get("messages", [])]}
+
+
+@app.post("/threads/{thread_id}/messages")
+async def post_message(thread_id: str, req: MessageRequest) -> Dict[str, Any]:
+    """
+    Run one chat turn and return the messages it produced.
+    """
+    def run_turn():
+        with _turn_lock(thread_id):
+            state = _prepare_turn(thread_id, req.content)
+            seen = len(state["messages"])
+            result = app_graph.invoke(state, _thread_config(thread_id))
+            store.delete(PENDING_PREFIX + thread_id)
+        return result.get("messages", [])[seen:]
+
+    new_messages = await run_in_threadpool(run_turn)
+    return {"thread_id": thread_id, "messages": [serialize_message(m) for m in new_messages]}
+
+
+@app.post("/threads/{thread_id}/messages/stream")
+async def stream_message(thread_id: str, req: MessageRequest) -> StreamingResponse:
+    """
+    Run one chat turn and stream each node's new messages as server-sent events.
+    """
+    # Validate the thread up front so unknown ids get a plain 404, not an SSE error.
+    await run_in_threadpool(_prepare_turn, thread_id, req.content)
+
+    loop = asyncio.get_running_loop()
+    queue: asyncio.Queue = asyncio.Queue()
+
+    def run_graph():
+        try:
+            with _turn_lock(thread_id):
+                # Reload under the lock: another worker may have finished a turn meanwhile.
+                turn_state = _prepare_turn(thread_id, req.content)
+                seen_ids = {m.id for m in turn_state["messages"] if getattr(m, "id", None)}
+                for mode, chunk in app_graph.stream(turn_state, _thread_config(thread_id),
+                                                    stream_mode=["updates", "custom"]):
+                    if mode == "custom":
+                        # e.g. the first content_generator variant, before the tool finishes
+                        loop.call_soon_threadsafe(queue.put_nowait, ("custom", None, chunk))
+                        continue
+                    for node, values in chunk.items():
+                        msgs = values.get("messages", []) if values and hasattr(values, "get") else []
+                        # Nodes may return the full message list; only emit what is new.
+                        new_msgs = [
+                            m for m in msgs
+                            if not isinstance(m, HumanMessage) and getattr(m, "id", None) not in seen_ids
+                        ]
+                        seen_ids.update(m.id for m in new_msgs if getattr(m, "id", None))
+                        if new_msgs:
+                            loop.call_soon_threadsafe(queue.put_nowait, ("node", node, new_msgs))
+                store.delete(PENDING_PREFIX + thread_id)
+            loop.call_soon_threadsafe(queue.put_nowait, ("done", None, None))
+        except Exception as e:
+            loop.call_soon_threadsafe(queue.put_nowait, ("error", None, str(e)))
+
+    async def events():
+        worker = loop.run_in_executor(None, run_graph)
+        while True:
+            kind, node, payload = await queue.get()
+            if kind == "done":
+                yield _sse("done", {"thread_id": thread_id})
+                break
+            if kind == "error":
+                yield _sse("error", {"detail": payload})
+                break
+            if kind == "custom":
+                yield _sse(payload.get("type", "custom") if isinstance(payload, dict) else "custom", payload)
+                continue
+            for msg in payload:
+                yield _sse("message", {"node": node, **serialize_message(msg)})
+        await worker
+
+    return StreamingResponse(events(), media_type="text/event-stream")
+
+
+@app.get("/threads/{thread_id}/analysis")
+async def get_profile_analysis(thread_id: str) -> Dict[str, Any]:
+    state = await run_in_threadpool(_load_state, thread_id)
+    analysis = state.get("profile_analysis") or _latest_tool_result(state.get("messages", []), "profile_analyzer")
+    if not analysis:
+        raise HTTPException(status_code=404, detail="No profile analysis for this thread yet.")
+    return analysis
+
+
+@app.get("/threads/{thread_id}/job_fit")
+async def get_job_fit(thread_id: str) -> Dict[str, Any]:
+    state = await run_in_threadpool(_load_state, thread_id)
+    job_fit = state.get("job_fit") or _latest_tool_result(state.get("messages", []), "job_matcher")
+    if not job_fit:
+        raise HTTPException(status_code=404, detail="No job fit result for this thread yet.")
+    return job_fit
+
+
+@app.get("/metrics")
+async def metrics() -> Dict[str, Any]:
+    """
+    Per-worker counters for the agent's latency optimizations.
+    """
+    return {
+        "speculation": speculation_stats.summary(),
+        "llm": retry_stats.summary(),
+        "llm_scheduler": llm_scheduler.stats(),
+        "response_cache": response_cache.summary(),
+    }
+
+
+@app.get("/health")
+async def health() -> Dict[str, str]:
+    return {"status": "ok"}
@@ -1,53 +1,33 @@
+import time
+_script_start = time.perf_counter()
 import os
 import json
-import re
-import time
 from typing import Dict, Any, List, Optional, Annotated
-from chatbot_model import (
-    UserMemory,
-    ChatbotState,
-    ProfileAnalysisModel,
-    JobFitModel,
-    ContentGenerationModel,
-    
-)
-from llm_utils import call_llm_and_parse
+from chatbot_model import ChatbotState
 from profile_preprocessing import (
     preprocess_profile,
     initialize_state,
+    is_profile_url,
     normalize_url
 )
-import os
-from openai import OpenAI
 import streamlit as st
 import hashlib
-from dotenv import load_dotenv
 from pydantic import BaseModel, Field,ValidationError
 # import pdb; pdb.set_trace()
 from scraping_profile import scrape_linkedin_profile
-from langchain_openai import ChatOpenAI
 from langchain_core.messages import SystemMessage, HumanMessage, AIMessage,BaseMessage,ToolMessage
-from langchain_core.tools import tool
-from langgraph.graph import StateGraph, END,START
-from langgraph.checkpoint.memory import MemorySaver
-from langgraph.graph import add_messages  # if your framework exposes this
-from langgraph.prebuilt import ToolNode,tools_condition,InjectedState
-import dirtyjson
-import sqlite3
-from langgraph.checkpoint.sqlite import SqliteSaver
+from storage import get_store
+from agent import (
+    compile_graph,
+    find_thread_id_for_url,
+    delete_thread_checkpoint,
+    get_next_thread_id,
+)
+from profiling import profiling_enabled, begin_run, end_run, discard_run, span, waterfall_html
    
 
 
 
-# ========== 1. ENVIRONMENT & LLM SETUP ==========
-load_dotenv()
-groq_key = os.getenv("GROQ_API_KEY")
-assert groq_key, "GROQ_API_KEY not found in environment!"
-groq_client=OpenAI(
-            api_key=os.getenv("GROQ_API_KEY"),
-            base_url="https://api.groq.com/openai/v1"
-        )
-
 def normalize_url(url):
     return url.strip().rstrip('/')
 
@@ -73,381 +53,44 @@ def validate_state(state: dict) -> None:
         st.stop()
 
 
-user_memory = UserMemory()
-
-# ========== 7. AGENT FUNCTIONS ==========
-
-def profile_analysis_prompt(profile: Dict[str, str]) -> str:
-    return f"""
-You are a top-tier LinkedIn career coach and AI analyst.
-
-Analyze the following candidate profile carefully.
-
-Candidate profile data:
-FullName: {profile.get("FullName", "")}
-Headline: {profile.get("Headline", "")}
-JobTitle: {profile.get("JobTitle", "")}
-CompanyName: {profile.get("CompanyName", "")}
-CompanyIndustry: {profile.get("CompanyIndustry", "")}
-CurrentJobDuration: {profile.get("CurrentJobDuration", "")}
-About: {profile.get("About", "")}
-Experiences: {profile.get("Experiences", "")}
-Skills: {profile.get("Skills", "")}
-Educations: {profile.get("Educations", "")}
-Certifications: {profile.get("Certifications", "")}
-HonorsAndAwards: {profile.get("HonorsAndAwards", "")}
-Verifications: {profile.get("Verifications", "")}
-Highlights: {profile.get("Highlights", "")}
-Projects: {profile.get("Projects", "")}
-Publications: {profile.get("Publications", "")}
-Patents: {profile.get("Patents", "")}
-Courses: {profile.get("Courses", "")}
-TestScores: {profile.get("TestScores", "")}
-
-
-Identify and summarize:
-1. strengths:
-    - technical strengths (skills, tools, frameworks)
-    - project strengths (impactful projects, innovation)
-    - educational strengths (degrees, certifications, awards)
-    - soft skills and personality traits (teamwork, leadership)
-2. weaknesses:
-    - missing or weak technical skills
-    - gaps in projects, experience, or education
-    - unclear profile sections or missing context
-3. actionable suggestions:
-    - concrete ways to improve profile headline, about section, or add projects
-    - suggestions to learn or highlight new skills
-    - ideas to make the profile more attractive for recruiters
-
-Important instructions:
-- Respond ONLY with valid JSON.
-- Do NOT include text before or after JSON.
-- Be concise but detailed.
-
-
-
-Example JSON format:
-{{
-  "strengths": {{
-    "technical": ["...", "..."],
-    "projects": ["...", "..."],
-    "education": ["...", "..."],
-    "soft_skills": ["...", "..."]
-  }},
-  "weaknesses": {{
-    "technical_gaps": ["...", "..."],
-    "project_or_experience_gaps": ["...", "..."],
-    "missing_context": ["...", "..."]
-  }},
-  "suggestions": [
-    "...",
-    "...",
-    "..."
-  ]
-}}
-""".strip()
-
-
-
-
-def job_fit_prompt(sections: Dict[str, str], target_role: str) -> str:
-    return f"""
-You are an expert career coach and recruiter.
-
-Compare the following candidate profile against the typical requirements for the role of "{target_role}".
-
-Candidate Profile:
-- Headline: {sections.get('headline', '')}
-- About: {sections.get('about', '')}
-- Job Title: {sections.get('job_title', '')}
-- Company: {sections.get('company_name', '')}
-- Industry: {sections.get('company_industry', '')}
-- Current Job Duration: {sections.get('current_job_duration', '')}
-- Skills: {sections.get('skills', '')}
-- Projects: {sections.get('projects', '')}
-- Educations: {sections.get('educations', '')}
-- Certifications: {sections.get('certifications', '')}
-- Honors & Awards: {sections.get('honors_and_awards', '')}
-- Experiences: {sections.get('experiences', '')}
-
-**Instructions:**
-- Respond ONLY with valid JSON.
-- Your JSON must exactly match the following schema:
-{{
-  "match_score": 85,
-  "missing_skills": ["Skill1", "Skill2"],
-  "suggestions": ["...", "...", "..."]
-}}
-- "match_score": integer from 0–100 estimating how well the profile fits the target role.
-- "missing_skills": key missing or weakly mentioned skills.
-- "suggestions": 3 actionable recommendations to improve fit (e.g., learn tools, rewrite headline).
-
-Do NOT include explanations, text outside JSON, or markdown.
-Start with '{{' and end with '}}'.
-The JSON must be directly parseable.
-""".strip()
-
-
-# --- Tool: Profile Analyzer ---
-@tool
-def profile_analyzer(state: Annotated[ChatbotState, InjectedState]) -> dict:
-    """
-    Tool: Analyze the overall full user's profile to give strengths, weaknesses, suggestions.
-    This is needed only if full analysis of profile is needed. 
-    Returns the full analysis in the form of a json.
-
-    - It takes no arguments
-    """
-
-
-    # Get summarized profile (dictionary of strings)
-    profile = getattr(state, "profile", {}) or {}
-
-    # Build prompt
-    prompt = profile_analysis_prompt(profile)
-
-    # Call the LLM & parse structured result
-    analysis_model = call_llm_and_parse(groq_client,prompt, ProfileAnalysisModel)
-    analysis_dict = analysis_model.model_dump()
-
-    # Save to state and user memory
-    state.profile_analysis = analysis_dict
-    user_memory.save("profile_analysis", analysis_dict)
-
-    print("💾 [DEBUG] Saved analysis to user memory.")
-    print("📦 [DEBUG] Updated state.profile_analysis with analysis.")
-
-    return analysis_dict
-
-# --- Tool: Job Matcher ---
-
-
-@tool
-def job_matcher(
-    state: Annotated[ChatbotState, InjectedState],
-    target_role: str = None
-) -> dict:
-    """
-    Tool: Analyze how well the user's profile fits the target role.
-    - If user is asking if he is a good fit for a certain role, or needs to see if his profile is compatible with a certain role, call this.
-    - Takes target_role as an argument.
-    - this tool is needed when match score, missing skills, suggestions are needed based on a job name given.
-    """
-    print(f"target role is {target_role}")
-    # Update state.target_role if provided
-
-    sections = getattr(state, "sections", {})
-
-    # Build prompt
-    prompt = job_fit_prompt(sections, target_role)
-
-    # Call LLM and parse
-    try:
-        job_fit_model = call_llm_and_parse(groq_client,prompt, JobFitModel)
-        job_fit_dict = job_fit_model.model_dump()
-        job_fit_dict["target_role"] = target_role
-    except Exception as e:
-        job_fit_dict = {
-            "target_role":target_role,
-            "match_score": 0,
-            "missing_skills": [],
-            "suggestions": ["Parsing failed or incomplete response."]
-        }
-
-    # Save to state and user memory
-    state.job_fit = job_fit_dict
-    user_memory.save("job_fit", job_fit_dict)
-
-    return job_fit_dict
-
-
 
+# --- Streamlit UI ---
+st.set_page_config(page_title="💼 LinkedIn AI Career Assistant", page_icon="🤖", layout="wide")
+st.title("🧑‍💼 LinkedIn AI Career Assistant")
 
+# --- Opt-in profiling (APP_PROFILE=1 or ?profile=1) ---
+profile_run = None
+# A run cut short by st.stop() never reached end_profile_run()
+stale_run = st.session_state.pop("profile_run", None)
+if stale_run is not None:
+    discard_run(stale_run)
+if profiling_enabled(st.query_params.to_dict()):
+    profile_run = begin_run("rerun")
+    profile_run.add_span("imports", _script_start, time.perf_counter())
+    st.session_state["profile_run"] = profile_run
 
 
-@tool
-def extract_from_state_tool(
-    state: Annotated[ChatbotState, InjectedState],
-    key: str
-) -> dict:
+def end_profile_run():
     """
-    This tool is used if user wants to ask about any particular part of this profile. Use this if a singe section is targeted. It expects key as an arguement, that represents what
-    the user is wanting to look at, from his profile.
-    Argument:
-      key: only pass one from the below list, identify one thing the user wants to look into and choose that:
-        "sections.about", "sections.headline", "sections.skills", "sections.projects",
-        "sections.educations", "sections.certifications", "sections.honors_and_awards",
-        "sections.experiences", "sections.publications", "sections.patents",
-        "sections.courses", "sections.test_scores", "sections.verifications",
-        "sections.highlights", "sections.job_title", "sections.company_name",
-        "sections.company_industry", "sections.current_job_duration", "sections.full_name",
-        "enhanced_content,"profile_analysis", "job_fit", "target_role", "editing_section"
+    Finish this rerun's profile and keep its summary for the timing panel.
     """
-    value = state
-    try:
-        for part in key.split('.'):
-            # Support both dict and Pydantic model
-            if isinstance(value, dict):
-                value = value.get(part)
-            elif hasattr(value, part):
-                value = getattr(value, part)
-            else:
-                value = None
-            if value is None:
-                break
-    except Exception:
-        value = None
-    return {"result": value}
-
-
-tools = [
-    profile_analyzer,
-   job_matcher,
-    extract_from_state_tool
-]
-llm = ChatOpenAI(
-    api_key=groq_key,
-    base_url="https://api.groq.com/openai/v1",
-    model="llama3-8b-8192",
-    temperature=0
-)
-llm_with_tools = llm.bind_tools(tools)
-
-
-
-# ========== 8. LANGGRAPH PIPELINE ==========
-
-
-def chatbot_node(state: ChatbotState) -> ChatbotState:
-    validate_state(state)
-
-    messages = state.get("messages", [])
-
-    system_prompt = """
-You are a helpful AI assistant specialized in LinkedIn profile coaching.
-
-Guidelines:
-- Greet the user if they greet you, and explain you can help analyze, enhance, and improve their LinkedIn profile.
-- Prefer using tools instead of answering directly whenever this can give better, data-backed answers.
-- Call only one tool at a time. Never call multiple tools together.
-
-When to use tools:
-- If the user asks to show a section (like About, Projects, etc.): call extract_from_state_tool, unless you already have that section stored.
-- If the user asks to enhance a section: use extract_from_state_tool first if you don’t already have that section, then enhance it.
-- If the user requests a full profile analysis: use profile_analyzer.
-- If the user wants to know how well they fit a target job role: use job_matcher with the given role.
-- Use tools to check strengths, weaknesses, missing skills, or improvement suggestions.
-- If the tool was just called recently and info is still fresh, you may answer directly.
-
-Important:
-- Never describe or print JSON of a tool call.
-- Never say "I'm about to call a tool" — just call the tool properly.
-- Keep answers clear, helpful, and actionable.
-
-Your goal: help the user see, improve, and analyze their LinkedIn profile.
-
-"""
-    recent_messages = []
-    for msg in messages[-6:]:  # last few, e.g., 6
-        if isinstance(msg, HumanMessage):
-            recent_messages.append({
-                "role": "user",
-                "content": f"User asked: {msg.content}"
-            })
-        elif isinstance(msg, AIMessage):
-        # keep only non-empty AI replies (actual answers)
-            if msg.content.strip():
-                recent_messages.append({
-                    "role": "assistant",
-                    "content": msg.content
-                })
-        elif isinstance(msg, ToolMessage):
-            recent_messages.append({
-                "role": "assistant",
-                "content": f"[Tool: {msg.name}] {msg.content}"
-            })
-
-
-    # Build messages & invoke LLM
-    messages = [SystemMessage(content=system_prompt)] + recent_messages
-    # messages = [SystemMessage(content=system_prompt)]
-    response = llm_with_tools.invoke(messages)
-    if hasattr(response, "tool_calls") and response.tool_calls:
-        first_tool = response.tool_calls[0]
-        tool_name = first_tool.get("name") if isinstance(first_tool, dict) else getattr(first_tool, "name", None)
-        tool_args = first_tool.get("args") if isinstance(first_tool, dict) else getattr(first_tool, "args", {})
-        print(f"[DEBBBBUUUUGGG] using tool {tool_name}")
-
-    # DEBUG
-    print("[DEBUG] LLM response:", response)
-    state.setdefault("messages", []).append(response)
-
-    return state
-
-
-
-
-
-# --- Graph definition ---
-graph = StateGraph(state_schema=ChatbotState)
-graph.add_node("chatbot", chatbot_node)
-graph.add_node("tools", ToolNode(tools))
-graph.add_edge(START, "chatbot")
-graph.add_conditional_edges("chatbot", tools_condition)
-graph.add_edge("tools","chatbot")
-graph.set_entry_point("chatbot")
-
-# --- Streamlit UI ---
-st.set_page_config(page_title="💼 LinkedIn AI Career Assistant", page_icon="🤖", layout="wide")
-st.title("🧑‍💼 LinkedIn AI Career Assistant")
+    if profile_run is None or st.session_state.get("profile_run") is not profile_run:
+        return
+    del st.session_state["profile_run"]
+    summaries = st.session_state.setdefault("profile_summaries", [])
+    summaries.insert(0, end_run(profile_run))
+    del summaries[5:]
 
 # --- Checkpointer and graph initialization ---
-if "checkpointer" not in st.session_state:
-        
+# Shared by all sessions of this server process; the store itself is shared
+# with every other worker (see storage.py / STORE_URL).
+@st.cache_resource
+def load_app_graph():
     print("Current working directory:", os.getcwd())
-    print("Files in working directory:", os.listdir("."))
-
-    conn = sqlite3.connect("checkpoints1.db", check_same_thread=False)
-    st.session_state["checkpointer"] = SqliteSaver(conn)
-checkpointer = st.session_state["checkpointer"]
-
-if "app_graph" not in st.session_state:
-    st.session_state["app_graph"] = graph.compile(checkpointer=checkpointer)
-app_graph = st.session_state["app_graph"]
-# Find or create thread
-def find_thread_id_for_url(checkpointer, url, max_threads=100):
-    search_url = normalize_url(url)
-    for tid in range(max_threads):
-        config = {"configurable": {"thread_id": str(tid), "checkpoint_ns": ""}}
-        state = checkpointer.get(config)
-        if state and "channel_values" in state:
-            user_state = state["channel_values"]
-            stored_url = normalize_url(user_state.get("profile_url", ""))
-            if stored_url == search_url:
-                return str(tid), user_state
-    return None, None
-
-def delete_thread_checkpoint(checkpointer, thread_id):
-    # For SqliteSaver, use the delete_thread method if available
-    if hasattr(checkpointer, "delete_thread"):
-        checkpointer.delete_thread(thread_id)
-    else:
-        # For in-memory or custom checkpointers, implement as needed
-        pass
-
-
-def get_next_thread_id(checkpointer, max_threads=100):
-    used = set()
-    for tid in range(max_threads):
-        config = {"configurable": {"thread_id": str(tid), "checkpoint_ns": ""}}
-        if checkpointer.get(config):
-            used.add(tid)
-    for tid in range(max_threads):
-        if tid not in used:
-            return str(tid)
-    raise RuntimeError("No available thread_id")
+    return compile_graph(get_store().checkpointer())
 
+store = get_store()
+app_graph = load_app_graph()
 # --- Session selection and state initialization ---
 
 if "chat_mode" not in st.session_state:
@@ -456,13 +99,12 @@ if "chat_mode" not in st.session_state:
         st.info("Please enter a valid LinkedIn profile URL above to start.")
         st.stop()
 
-    valid_pattern = r"^https://www\.linkedin\.com/in/[^/]+/?$"
-    if not re.match(valid_pattern, profile_url.strip()):
+    if not is_profile_url(profile_url):
         st.error("❌ Invalid LinkedIn profile URL. Make sure it matches the format.")
         st.stop()
     url = profile_url.strip()
 
-    existing_thread_id, previous_state = find_thread_id_for_url(checkpointer, url)
+    existing_thread_id, previous_state = find_thread_id_for_url(store, url)
     # Defensive: ensure required fields
     required_fields = ["profile", "sections"]
     if previous_state and not all(f in previous_state and previous_state[f] for f in required_fields):
@@ -478,10 +120,15 @@ if "chat_mode" not in st.session_state:
             st.session_state.state = previous_state
             st.rerun()
         elif col2.button("Start new chat"):
-            delete_thread_checkpoint(checkpointer, existing_thread_id)
-            with st.spinner("Fetching and processing profile... ⏳"):
+            # Scrape first: a failed scrape must not cost the user their old chat
+            with st.spinner("Fetching and processing profile... ⏳"), span("scrape"):
                 raw=scrape_linkedin_profile(url)
+            if not raw:
+                st.error("❌ Profile scraping failed. Your previous chat was kept.")
+                st.stop()
+            delete_thread_checkpoint(store, existing_thread_id)
             thread_id = existing_thread_id
+            store.mark_scraped(thread_id)
             st.session_state["chat_mode"] = "new"
             st.session_state["thread_id"] = thread_id
             st.session_state.state = initialize_state(raw)
@@ -490,9 +137,11 @@ if "chat_mode" not in st.session_state:
             st.rerun()
         st.stop()
     else:
-        with st.spinner("Fetching and processing profile... ⏳"):
+        with st.spinner("Fetching and processing profile... ⏳"), span("scrape"):
                 raw=scrape_linkedin_profile(url)
-        thread_id = get_next_thread_id(checkpointer)
+        thread_id = get_next_thread_id(store)
+        store.register_thread(normalize_url(url), thread_id)
+        store.mark_scraped(thread_id)
         st.session_state["thread_id"] = thread_id
         st.session_state["chat_mode"] = "new"
         st.session_state.state = initialize_state(raw)
@@ -508,7 +157,7 @@ st.subheader("💬 Chat with your AI Assistant")
 messages = state.get("messages", [])
 chat_container = st.container()
 
-with chat_container:
+with chat_container, span("render_transcript"):
     st.markdown(
         """
         <style>
@@ -542,14 +191,19 @@ with chat_container:
                 unsafe_allow_html=True,
             )
         elif isinstance(msg, AIMessage):
+            cached = (msg.response_metadata or {}).get("response_cache")
             if not msg.content or not msg.content.strip():
+                # A cached tool call: the tool card follows, just say the routing was reused
+                if cached:
+                    st.caption(f"⚡ Served from the response cache (similar to \"{cached.get('question', '')}\")")
                 continue
+            label = "🤖 AI · ⚡ cached" if cached else "🤖 AI"
             st.markdown(
                 f"""
                 <div class="chat-row ai">
                     <img class="avatar" src="https://img.icons8.com/ios-filled/50/1a237e/robot-2.png" alt="AI"/>
                     <div class="chat-bubble bubble-ai">
-                        <span class="sender-label">🤖 AI</span>
+                        <span class="sender-label">{label}</span>
                         {msg.content}
                     </div>
                 </div>
@@ -604,7 +258,7 @@ with chat_container:
 
 
                 # --- Job fit format ---
-                elif "match_score" in parsed:
+                elif "match_score" in parsed and "error" not in parsed:
                     percent = parsed["match_score"]
                     suggestions = parsed.get("suggestions", [])
                     missing = parsed.get("missing_skills", [])
@@ -632,6 +286,22 @@ with chat_container:
                         </div>
                     """, unsafe_allow_html=True)
 
+                # --- Content variants format ---
+                elif "variants" in parsed:
+                    section_name = parsed.get("section", "").replace("_", " ").title()
+                    variants_html = "".join(
+                        f"<li style='margin-bottom: 10px;'>{v}</li>" for v in parsed.get("variants", [])
+                    )
+                    st.markdown(f"""
+                        <div class="chat-row ai">
+                            <img class="avatar" src="https://img.icons8.com/ios-filled/50/1a237e/robot-2.png" alt="Tool"/>
+                            <div class="chat-bubble bubble-ai">
+                                <span class="sender-label">✏️ Enhanced {section_name}</span>
+                                <ol>{variants_html}</ol>
+                            </div>
+                        </div>
+                    """, unsafe_allow_html=True)
+
                 # --- Section text format ---
                 elif "result" in parsed:
                     text = parsed["result"]
@@ -666,10 +336,52 @@ user_input = st.chat_input(
 )
 
 if user_input and user_input.strip():
-    state.setdefault("messages", []).append(HumanMessage(content=user_input.strip()))
-    validate_state(state)
+    if profile_run is not None:
+        profile_run.label = "turn"
     thread_id = st.session_state.get("thread_id")
     config = {"configurable": {"thread_id": thread_id}}
+    # Start from the checkpoint, not the session copy: prewarm.py may have
+    # refreshed the profile since this session loaded it
+    with span("load_state"):
+        snapshot = app_graph.get_state(config)
+    if snapshot and snapshot.values:
+        state = dict(snapshot.values)
+    state.setdefault("messages", []).append(HumanMessage(content=user_input.strip()))
+    with span("validate_state"):
+        validate_state(state)
     with st.spinner("Processing your request..."):
-        st.session_state.state = app_graph.invoke(state, config)
+        preview = st.empty()
+        final_state = None
+        graph_started = time.perf_counter()
+        for mode, chunk in app_graph.stream(state, config, stream_mode=["custom", "values"]):
+            if mode == "values":
+                final_state = chunk
+            elif mode == "custom" and chunk.get("type") == "content_variant" and chunk.get("index") == 0:
+                # Show the first enhanced version while the others are still generating
+                preview.markdown(f"""
+                    <div class="chat-row ai">
+                        <img class="avatar" src="https://img.icons8.com/ios-filled/50/1a237e/robot-2.png" alt="AI"/>
+                        <div class="chat-bubble bubble-ai">
+                            <span class="sender-label">✏️ First draft</span>
+                            {chunk.get("text", "")}
+                        </div>
+                    </div>
+                """, unsafe_allow_html=True)
+        if profile_run is not None:
+            profile_run.add_span("graph.stream", graph_started, time.perf_counter())
+        st.session_state.state = final_state
+    end_profile_run()
     st.rerun()
+
+end_profile_run()
+if st.session_state.get("profile_summaries"):
+    with st.expander("⏱ Timing breakdown (profiling)"):
+        for summary in st.session_state["profile_summaries"]:
+            st.markdown(
+                f"**{summary['label']}** — {summary['duration'] * 1000:.0f} ms, "
+                f"{summary['samples']} samples, profiler overhead {summary['overhead']:.2%}"
+                + (f" — flame graph stacks: `{summary['path']}`" if summary["path"] else "")
+            )
+            st.markdown(waterfall_html(summary), unsafe_allow_html=True)
+            if summary["top_frames"]:
+                st.caption("Hottest frames: " + ", ".join(f"{name} ({count})" for name, count in summary["top_frames"]))
@@ -0,0 +1,174 @@
+"""
+Streaming, bounded-memory preprocessing of large scraped-profile datasets.
+
+Reads raw profiles incrementally from JSON Lines files, JSON arrays or a
+single JSON object, runs preprocess_profile over a process pool, and yields
+summarized profiles in input order. Only a bounded number of chunks is in
+flight at any time, so memory stays flat regardless of dataset size.
+
+Usage:
+    python batch_preprocessing.py raw_profiles.jsonl summarized.jsonl --workers 4
+"""
+import argparse
+import json
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, Iterable, Iterator, List, Optional, TextIO, Union
+
+from profile_preprocessing import preprocess_profile
+
+READ_CHUNK_SIZE = 1 << 16
+
+
+def _iter_json_values(f: TextIO) -> Iterator[Any]:
+    """
+    Yield the elements of a top-level JSON array (or the single top-level
+    value) without loading the whole file.
+    """
+    decoder = json.JSONDecoder()
+    buf = f.read(READ_CHUNK_SIZE).lstrip()
+    if not buf:
+        return
+    if not buf.startswith("["):
+        # Single object (e.g. scraped_profile.json): nothing to stream
+        yield json.loads(buf + f.read())
+        return
+
+    buf = buf[1:]
+    read_size = READ_CHUNK_SIZE
+    eof = False
+    while True:
+        buf = buf.lstrip().lstrip(",").lstrip()
+        if buf.startswith("]"):
+            return
+        try:
+            value, end = decoder.raw_decode(buf)
+        except json.JSONDecodeError:
+            if eof:
+                raise
+            # Element spans past the buffer: read more, growing the read size
+            # so very large elements don't cost quadratic re-parsing.
+            more = f.read(read_size)
+            read_size *= 2
+            eof = not more
+            buf += more
+            continue
+        read_size = READ_CHUNK_SIZE
+        yield value
+        buf = buf[end:]
+        if len(buf) < READ_CHUNK_SIZE and not eof:
+            more = f.read(READ_CHUNK_SIZE)
+            eof = not more
+            buf += more
+
+
+def iter_raw_records(path: str) -> Iterator[Union[str, Dict[str, Any]]]:
+    """
+    Like iter_raw_profiles, but JSON Lines records are yielded unparsed so
+    that parsing happens in the pool workers instead of this process.
+    """
+    if not path.endswith((".jsonl", ".ndjson")):
+        yield from iter_raw_profiles(path)
+        return
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                yield line
+
+
+def iter_raw_profiles(path: str) -> Iterator[Dict[str, Any]]:
+    """
+    Stream raw scraped profiles from a .jsonl file or a .json file.
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        if path.endswith((".jsonl", ".ndjson")):
+            for line in f:
+                line = line.strip()
+                if line:
+                    yield json.loads(line)
+        else:
+            for value in _iter_json_values(f):
+                if isinstance(value, dict):
+                    yield value
+
+
+def _preprocess_one(raw: Union[str, Dict[str, Any]]) -> Dict[str, str]:
+    return preprocess_profile(json.loads(raw) if isinstance(raw, str) else raw)
+
+
+def _preprocess_chunk(chunk: List[Union[str, Dict[str, Any]]]) -> List[Dict[str, str]]:
+    return [_preprocess_one(raw) for raw in chunk]
+
+
+def _chunked(items: Iterable[Any], size: int) -> Iterator[List[Any]]:
+    chunk: List[Any] = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def iter_preprocessed_profiles(
+    raw_profiles: Iterable[Union[str, Dict[str, Any]]],
+    workers: Optional[int] = None,
+    chunk_size: int = 16,
+    max_in_flight: Optional[int] = None,
+) -> Iterator[Dict[str, str]]:
+    """
+    Yield preprocess_profile(raw) for every raw profile (a dict, or its JSON
+    text), in input order.
+
+    With workers=0 everything runs in this process. Otherwise chunks of
+    chunk_size profiles go to a process pool, with at most max_in_flight
+    chunks (default 2 per worker) submitted but not yet consumed.
+    """
+    if workers == 0:
+        for raw in raw_profiles:
+            yield _preprocess_one(raw)
+        return
+
+    workers = workers or os.cpu_count() or 1
+    max_in_flight = max_in_flight or 2 * workers
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending: deque = deque()
+        for chunk in _chunked(raw_profiles, chunk_size):
+            pending.append(pool.submit(_preprocess_chunk, chunk))
+            if len(pending) >= max_in_flight:
+                yield from pending.popleft().result()
+        while pending:
+            yield from pending.popleft().result()
+
+
+def preprocess_dataset(
+    input_path: str,
+    output_path: str,
+    workers: Optional[int] = None,
+    chunk_size: int = 16,
+) -> int:
+    """
+    Preprocess a raw dataset file into a JSON Lines file of summarized
+    profiles. Returns the number of profiles written.
+    """
+    count = 0
+    with open(output_path, "w", encoding="utf-8") as out:
+        for profile in iter_preprocessed_profiles(iter_raw_records(input_path), workers, chunk_size):
+            out.write(json.dumps(profile, ensure_ascii=False))
+            out.write("\n")
+            count += 1
+    return count
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Preprocess a scraped profile dataset into summarized JSONL.")
+    parser.add_argument("input", help="Raw profiles (.jsonl, .ndjson or .json)")
+    parser.add_argument("output", help="Output .jsonl of summarized profiles")
+    parser.add_argument("--workers", type=int, default=None, help="Process pool size (0 = no pool)")
+    parser.add_argument("--chunk-size", type=int, default=16)
+    args = parser.parse_args()
+
+    n = preprocess_dataset(args.input, args.output, args.workers, args.chunk_size)
+    print(f"✅ Preprocessed {n} profiles into {args.output}")
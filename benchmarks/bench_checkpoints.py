@@ -0,0 +1,124 @@
+"""
+Checkpoint storage benchmark: default serializer vs DedupSerializer.
+
+Runs a stand-in graph over ChatbotState (same channels and reducers as the
+agent, no LLM) for --turns turns on a profile built from scraped_profile.json.
+Each turn appends a user message, a tool-call message, a tool result of the
+size of a profile analysis and a reply. Reports database bytes per turn and
+checkpointer.get latency, cold (fresh process state) and warm.
+
+Usage:
+    python benchmarks/bench_checkpoints.py --turns 30
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage  # noqa: E402
+from langgraph.graph import END, StateGraph  # noqa: E402
+
+from chatbot_model import ChatbotState  # noqa: E402
+from profile_preprocessing import initialize_state  # noqa: E402
+from storage import SqliteStore  # noqa: E402
+
+ANALYSIS = {
+    "strengths": {k: [f"{k} strength {i}: " + "detail " * 12 for i in range(4)]
+                  for k in ("technical", "projects", "education", "soft_skills")},
+    "weaknesses": {k: [f"{k} gap {i}: " + "detail " * 12 for i in range(3)]
+                   for k in ("technical_gaps", "project_or_experience_gaps", "missing_context")},
+    "suggestions": ["suggestion " + "detail " * 15 for _ in range(5)],
+}
+
+
+def fake_turn(state: ChatbotState):
+    turn = len(state.messages)
+    call_id = f"call_{turn}"
+    return {
+        "messages": [
+            AIMessage(content="", tool_calls=[{"name": "profile_analyzer", "args": {}, "id": call_id}]),
+            ToolMessage(content=json.dumps(dict(ANALYSIS, turn=turn)), tool_call_id=call_id),
+            AIMessage(content=f"Here is your analysis (turn {turn}). " + "Summary text. " * 20),
+        ],
+        "profile_analysis": dict(ANALYSIS, turn=turn),
+    }
+
+
+def build_graph(checkpointer):
+    graph = StateGraph(ChatbotState)
+    graph.add_node("chatbot", fake_turn)
+    graph.set_entry_point("chatbot")
+    graph.add_edge("chatbot", END)
+    return graph.compile(checkpointer=checkpointer)
+
+
+def db_bytes(store: SqliteStore) -> int:
+    total = 0
+    for query in ("SELECT SUM(LENGTH(checkpoint) + LENGTH(metadata)) FROM checkpoints",
+                  "SELECT SUM(LENGTH(value)) FROM writes",
+                  "SELECT SUM(LENGTH(data)) FROM blobs"):
+        total += store.kv.execute(query).fetchone()[0] or 0
+    return total
+
+
+def get_latency(path: str, config: dict, repeats: int):
+    cold = []
+    for _ in range(repeats):
+        store = SqliteStore(path)  # new serializer, empty blob cache
+        start = time.perf_counter()
+        store.checkpointer().get(config)
+        cold.append(time.perf_counter() - start)
+    checkpointer = store.checkpointer()
+    warm = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        checkpointer.get(config)
+        warm.append(time.perf_counter() - start)
+    return statistics.median(cold), statistics.median(warm)
+
+
+def run(serde: str, turns: int, repeats: int, tmp: str) -> None:
+    os.environ["CHECKPOINT_SERDE"] = serde
+    path = os.path.join(tmp, f"{serde}.db")
+    store = SqliteStore(path)
+    app = build_graph(store.checkpointer())
+    config = {"configurable": {"thread_id": "bench"}}
+
+    with open(os.path.join(ROOT, "scraped_profile.json"), encoding="utf-8") as f:
+        state = initialize_state(json.load(f))
+    state["messages"] = []
+
+    start = time.perf_counter()
+    for turn in range(turns):
+        state = app.invoke({**state, "messages": state["messages"] + [HumanMessage(content=f"turn {turn}")]},
+                           config)
+    elapsed = time.perf_counter() - start
+
+    total = db_bytes(store)
+    cold, warm = get_latency(path, {"configurable": {"thread_id": "bench", "checkpoint_ns": ""}}, repeats)
+    print(
+        f"{serde:>7}: {total / 1024:.0f} KiB for {turns} turns ({total / turns / 1024:.1f} KiB/turn), "
+        f"file {os.path.getsize(path) / 1024:.0f} KiB, {elapsed / turns * 1000:.1f} ms/turn, "
+        f"get cold {cold * 1000:.2f} ms, warm {warm * 1000:.2f} ms"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--turns", type=int, default=30)
+    parser.add_argument("--repeats", type=int, default=20)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for serde in ("default", "dedup"):
+            run(serde, args.turns, args.repeats, tmp)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""
+Throughput benchmark for streaming profile preprocessing.
+
+Builds a synthetic dataset of large profiles derived from scraped_profile.json
+(lists inflated by --scale, names/URLs made unique), then runs
+batch_preprocessing over it and reports profiles/sec and peak RSS.
+
+Usage:
+    python benchmarks/bench_preprocessing.py --profiles 5000 --scale 20 --workers 0 2 4
+"""
+import argparse
+import copy
+import json
+import os
+import resource
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from batch_preprocessing import iter_preprocessed_profiles, iter_raw_records  # noqa: E402
+
+INFLATED_KEYS = ("experiences", "skills", "educations", "licenseAndCertificates", "projects",
+                 "honorsAndAwards", "courses", "publications")
+
+
+def synthetic_profile(base: dict, i: int, scale: int) -> dict:
+    profile = copy.deepcopy(base)
+    profile["fullName"] = f"{base.get('fullName', 'Candidate')} {i}"
+    profile["linkedinUrl"] = f"https://www.linkedin.com/in/synthetic-{i}/"
+    for key in INFLATED_KEYS:
+        items = base.get(key) or []
+        profile[key] = items * scale
+    return profile
+
+
+def write_dataset(path: str, n: int, scale: int) -> int:
+    with open(os.path.join(ROOT, "scraped_profile.json"), encoding="utf-8") as f:
+        base = json.load(f)
+    with open(path, "w", encoding="utf-8") as out:
+        for i in range(n):
+            out.write(json.dumps(synthetic_profile(base, i, scale)))
+            out.write("\n")
+    return os.path.getsize(path)
+
+
+def peak_rss_mb(who=resource.RUSAGE_SELF) -> float:
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    rss = resource.getrusage(who).ru_maxrss
+    return rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--profiles", type=int, default=2000)
+    parser.add_argument("--scale", type=int, default=20, help="How many times list sections are repeated")
+    parser.add_argument("--workers", type=int, nargs="+", default=[0, 2, 4])
+    parser.add_argument("--chunk-size", type=int, default=16)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "profiles.jsonl")
+        size = write_dataset(path, args.profiles, args.scale)
+        print(f"dataset: {args.profiles} profiles, {size / 1e6:.1f} MB, baseline RSS {peak_rss_mb():.1f} MB")
+
+        for workers in args.workers:
+            start = time.perf_counter()
+            count = 0
+            for _ in iter_preprocessed_profiles(iter_raw_records(path), workers=workers,
+                                                chunk_size=args.chunk_size):
+                count += 1
+            elapsed = time.perf_counter() - start
+            print(
+                f"workers={workers}: {count} profiles in {elapsed:.2f}s "
+                f"({count / elapsed:.0f} profiles/s), peak RSS parent {peak_rss_mb():.1f} MB, "
+                f"largest worker {peak_rss_mb(resource.RUSAGE_CHILDREN):.1f} MB"
+            )
+
+
+if __name__ == "__main__":
+    main()
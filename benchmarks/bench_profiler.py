@@ -0,0 +1,73 @@
+"""
+Overhead of the sampling profiler on a CPU-bound workload.
+
+Runs preprocess_profile over scraped_profile.json repeatedly (on the main
+thread and a few worker threads, like graph nodes do), with and without an
+active profiled run, and reports the wall-time slowdown next to the
+sampler's own measured busy fraction.
+
+Usage:
+    python benchmarks/bench_profiler.py --iterations 40000 --intervals 0.01 0.005 0.001
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import profiling  # noqa: E402
+from profile_preprocessing import preprocess_profile  # noqa: E402
+
+
+def workload(raw: dict, iterations: int, threads: int) -> None:
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        per_thread = iterations // threads
+        list(pool.map(lambda _: [preprocess_profile(raw) for _ in range(per_thread)], range(threads)))
+
+
+def timed(raw: dict, iterations: int, threads: int, interval=None):
+    run = profiling.begin_run("bench", interval) if interval else None
+    start = time.perf_counter()
+    workload(raw, iterations, threads)
+    elapsed = time.perf_counter() - start
+    summary = profiling.end_run(run) if run else None
+    return elapsed, summary
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=40000)
+    parser.add_argument("--threads", type=int, default=4)
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--intervals", type=float, nargs="+", default=[0.01, 0.005, 0.001])
+    args = parser.parse_args()
+
+    with open(os.path.join(ROOT, "scraped_profile.json"), encoding="utf-8") as f:
+        raw = json.load(f)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        profiling.PROFILE_DIR = tmp
+        workload(raw, args.iterations // 10, args.threads)  # warm up
+
+        baseline = statistics.median(timed(raw, args.iterations, args.threads)[0] for _ in range(args.repeats))
+        print(f"no profiler: {baseline * 1000:.0f} ms")
+        for interval in args.intervals:
+            results = [timed(raw, args.iterations, args.threads, interval) for _ in range(args.repeats)]
+            elapsed = statistics.median(r[0] for r in results)
+            busy = statistics.median(r[1]["overhead"] for r in results)
+            samples = statistics.median(r[1]["samples"] for r in results)
+            print(
+                f"interval {interval * 1000:g} ms: {elapsed * 1000:.0f} ms "
+                f"({(elapsed / baseline - 1) * 100:+.1f}% wall), sampler busy {busy:.2%}, "
+                f"{samples:.0f} samples"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,223 @@
+"""
+Prompt rendering benchmark: legacy f-string prompts vs. prompt_templates.
+
+Reports per-call render time and the "prefix-hit potential" of a typical
+session on one profile (analysis, job fit for several roles, a few section
+rewrites): the share of prompt characters that repeat an earlier call's
+prefix exactly and could be served from a backend's prefix/KV cache.
+
+Usage:
+    python benchmarks/bench_prompts.py --iterations 2000
+"""
+import argparse
+import os
+import sys
+import time
+from typing import Dict, List
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import json  # noqa: E402
+
+from profile_preprocessing import initialize_state  # noqa: E402
+from prompt_templates import (  # noqa: E402
+    CONTENT_GENERATION_TEMPLATE,
+    JOB_FIT_TEMPLATE,
+    PROFILE_ANALYSIS_TEMPLATE,
+)
+
+ROLES = ["Data Scientist", "Machine Learning Engineer", "Backend Engineer", "Data Engineer", "AI Researcher"]
+SECTIONS = ["about", "headline", "projects"]
+
+
+# --- Pre-template prompts, kept verbatim as the baseline ---
+
+def legacy_profile_analysis_prompt(profile: Dict[str, str]) -> str:
+    return f"""
+You are a top-tier LinkedIn career coach and AI analyst.
+
+Analyze the following candidate profile carefully.
+
+Candidate profile data:
+FullName: {profile.get("FullName", "")}
+Headline: {profile.get("Headline", "")}
+JobTitle: {profile.get("JobTitle", "")}
+CompanyName: {profile.get("CompanyName", "")}
+CompanyIndustry: {profile.get("CompanyIndustry", "")}
+CurrentJobDuration: {profile.get("CurrentJobDuration", "")}
+About: {profile.get("About", "")}
+Experiences: {profile.get("Experiences", "")}
+Skills: {profile.get("Skills", "")}
+Educations: {profile.get("Educations", "")}
+Certifications: {profile.get("Certifications", "")}
+HonorsAndAwards: {profile.get("HonorsAndAwards", "")}
+Verifications: {profile.get("Verifications", "")}
+Highlights: {profile.get("Highlights", "")}
+Projects: {profile.get("Projects", "")}
+Publications: {profile.get("Publications", "")}
+Patents: {profile.get("Patents", "")}
+Courses: {profile.get("Courses", "")}
+TestScores: {profile.get("TestScores", "")}
+
+
+Identify and summarize:
+1. strengths:
+    - technical strengths (skills, tools, frameworks)
+    - project strengths (impactful projects, innovation)
+    - educational strengths (degrees, certifications, awards)
+    - soft skills and personality traits (teamwork, leadership)
+2. weaknesses:
+    - missing or weak technical skills
+    - gaps in projects, experience, or education
+    - unclear profile sections or missing context
+3. actionable suggestions:
+    - concrete ways to improve profile headline, about section, or add projects
+    - suggestions to learn or highlight new skills
+    - ideas to make the profile more attractive for recruiters
+
+Important instructions:
+- Respond ONLY with valid JSON.
+- Do NOT include text before or after JSON.
+- Be concise but detailed.
+
+
+
+Example JSON format:
+{{
+  "strengths": {{
+    "technical": ["...", "..."],
+    "projects": ["...", "..."],
+    "education": ["...", "..."],
+    "soft_skills": ["...", "..."]
+  }},
+  "weaknesses": {{
+    "technical_gaps": ["...", "..."],
+    "project_or_experience_gaps": ["...", "..."],
+    "missing_context": ["...", "..."]
+  }},
+  "suggestions": [
+    "...",
+    "...",
+    "..."
+  ]
+}}
+""".strip()
+
+
+
+
+def legacy_job_fit_prompt(sections: Dict[str, str], target_role: str) -> str:
+    return f"""
+You are an expert career coach and recruiter.
+
+Compare the following candidate profile against the typical requirements for the role of "{target_role}".
+
+Candidate Profile:
+- Headline: {sections.get('headline', '')}
+- About: {sections.get('about', '')}
+- Job Title: {sections.get('job_title', '')}
+- Company: {sections.get('company_name', '')}
+- Industry: {sections.get('company_industry', '')}
+- Current Job Duration: {sections.get('current_job_duration', '')}
+- Skills: {sections.get('skills', '')}
+- Projects: {sections.get('projects', '')}
+- Educations: {sections.get('educations', '')}
+- Certifications: {sections.get('certifications', '')}
+- Honors & Awards: {sections.get('honors_and_awards', '')}
+- Experiences: {sections.get('experiences', '')}
+
+**Instructions:**
+- Respond ONLY with valid JSON.
+- Your JSON must exactly match the following schema:
+{{
+  "match_score": 85,
+  "missing_skills": ["Skill1", "Skill2"],
+  "suggestions": ["...", "...", "..."]
+}}
+- "match_score": integer from 0–100 estimating how well the profile fits the target role.
+- "missing_skills": key missing or weakly mentioned skills.
+- "suggestions": 3 actionable recommendations to improve fit (e.g., learn tools, rewrite headline).
+
+Do NOT include explanations, text outside JSON, or markdown.
+Start with '{{' and end with '}}'.
+The JSON must be directly parseable.
+""".strip()
+
+
+def legacy_content_prompt(sections: Dict[str, str], section: str) -> str:
+    # The chat LLM used to rewrite sections inline; approximate it as one
+    # prompt with the section text up front.
+    return f"Rewrite the {section} section:\n{sections.get(section, '')}\nRespond ONLY with JSON."
+
+
+def flatten(messages: List[Dict[str, str]]) -> str:
+    return "".join(f"<{m['role']}>{m['content']}" for m in messages)
+
+
+def session_prompts(profile: Dict[str, str], sections: Dict[str, str], legacy: bool) -> List[str]:
+    prompts = []
+    if legacy:
+        prompts.append(legacy_profile_analysis_prompt(profile))
+        prompts.extend(legacy_job_fit_prompt(sections, role) for role in ROLES)
+        prompts.extend(legacy_content_prompt(sections, s) for s in SECTIONS)
+    else:
+        prompts.append(flatten(PROFILE_ANALYSIS_TEMPLATE.messages(profile)))
+        prompts.extend(flatten(JOB_FIT_TEMPLATE.messages(profile, target_role=role)) for role in ROLES)
+        prompts.extend(
+            flatten(CONTENT_GENERATION_TEMPLATE.messages(
+                profile, section=s, text=sections.get(s, ""), style="concise", instructions="none"))
+            for s in SECTIONS
+        )
+    return prompts
+
+
+def common_prefix(a: str, b: str) -> int:
+    n = min(len(a), len(b))
+    i = 0
+    while i < n and a[i] == b[i]:
+        i += 1
+    return i
+
+
+def prefix_hit_share(prompts: List[str]) -> float:
+    reused = 0
+    for i, prompt in enumerate(prompts):
+        if i:
+            reused += max(common_prefix(prompt, prev) for prev in prompts[:i])
+    return reused / sum(len(p) for p in prompts)
+
+
+def time_per_call(fn, iterations: int) -> float:
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return (time.perf_counter() - start) / iterations * 1e6
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=2000)
+    args = parser.parse_args()
+
+    with open(os.path.join(ROOT, "scraped_profile.json"), encoding="utf-8") as f:
+        state = initialize_state(json.load(f))
+    profile, sections = state["profile"], state["sections"]
+
+    legacy_us = time_per_call(lambda: legacy_job_fit_prompt(sections, "Data Scientist"), args.iterations)
+    template_us = time_per_call(
+        lambda: JOB_FIT_TEMPLATE.messages(profile, target_role="Data Scientist"), args.iterations)
+    print(f"job fit render: legacy {legacy_us:.1f} us/call, template {template_us:.1f} us/call")
+
+    legacy_us = time_per_call(lambda: legacy_profile_analysis_prompt(profile), args.iterations)
+    template_us = time_per_call(lambda: PROFILE_ANALYSIS_TEMPLATE.messages(profile), args.iterations)
+    print(f"analysis render: legacy {legacy_us:.1f} us/call, template {template_us:.1f} us/call")
+
+    for name, legacy in (("legacy", True), ("template", False)):
+        prompts = session_prompts(profile, sections, legacy)
+        print(f"{name}: {len(prompts)} calls, {sum(map(len, prompts))} chars, "
+              f"prefix-hit potential {prefix_hit_share(prompts):.0%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""
+Candidate ranking benchmark: index build, save, memory-mapped reload and
+ranking latency on synthetic candidates.
+
+Candidates are variations of scraped_profile.json with skills, About text,
+degree and certifications drawn from a few role archetypes, so the expected
+winners of a query are known. Reports timings and the share of the top-k
+that belongs to the queried archetype.
+
+Usage:
+    python benchmarks/bench_ranking.py --candidates 5000
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from candidate_ranking import CandidateIndex, RoleSpec, build_index  # noqa: E402
+from profile_preprocessing import preprocess_profile  # noqa: E402
+
+ARCHETYPES = {
+    "data engineer": {
+        "skills": ["Python", "SQL", "Apache Spark", "Apache Airflow", "Apache Kafka", "ETL", "dbt",
+                   "Amazon Web Services (AWS)", "Data Warehousing", "Snowflake"],
+        "about": "I build batch and streaming data pipelines, data warehouses and ETL workflows at scale.",
+        "cert": "AWS Certified Data Engineer (Amazon Web Services, Issued Jan 2024)",
+    },
+    "data scientist": {
+        "skills": ["Python", "SQL", "Machine Learning", "Statistics", "Pandas", "Scikit-Learn",
+                   "Data Visualization", "A/B Testing", "Deep Learning"],
+        "about": "I turn data into decisions with statistical modelling, experiments and machine learning.",
+        "cert": "IBM Data Science Professional Certificate (IBM, Issued Mar 2023)",
+    },
+    "frontend engineer": {
+        "skills": ["JavaScript", "TypeScript", "React.js", "CSS", "HTML", "Next.js", "Web Accessibility"],
+        "about": "I build fast, accessible web interfaces and design systems in React and TypeScript.",
+        "cert": "Meta Front-End Developer (Meta, Issued Feb 2024)",
+    },
+}
+DEGREES = [
+    "University of Somewhere (Bachelor's degree, Computer Science, 2019)",
+    "University of Somewhere (Master of Science - MS, Computer Science, 2021)",
+    "University of Somewhere (PhD, Computer Science, 2023)",
+]
+
+
+def synthetic_profiles(n: int, seed: int = 7):
+    with open(os.path.join(ROOT, "scraped_profile.json"), encoding="utf-8") as f:
+        base = preprocess_profile(json.load(f))
+    rng = random.Random(seed)
+    names = list(ARCHETYPES)
+    for i in range(n):
+        archetype = names[i % len(names)]
+        spec = ARCHETYPES[archetype]
+        skills = rng.sample(spec["skills"], rng.randint(3, len(spec["skills"])))
+        skills += rng.sample(ARCHETYPES[rng.choice(names)]["skills"], 2)
+        profile = dict(base)
+        profile.update({
+            "FullName": f"{archetype.title()} {i}",
+            "profile_url": f"https://www.linkedin.com/in/candidate-{i}/",
+            "Skills": ", ".join(dict.fromkeys(skills)),
+            "About": spec["about"] + " " + (base["About"] or "")[: rng.randint(0, 600)],
+            "Educations": rng.choice(DEGREES),
+            "Certifications": spec["cert"] if rng.random() < 0.5 else "",
+        })
+        yield archetype, profile
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--candidates", type=int, default=5000)
+    parser.add_argument("--top", type=int, default=50)
+    parser.add_argument("--repeats", type=int, default=20)
+    args = parser.parse_args()
+
+    labelled = list(synthetic_profiles(args.candidates))
+    archetypes = [a for a, _ in labelled]
+
+    start = time.perf_counter()
+    index = build_index(p for _, p in labelled)
+    built = time.perf_counter() - start
+
+    role = RoleSpec(title="Data Engineer", required_skills=["python", "sql", "spark", "airflow"],
+                    preferred_skills=["kafka", "aws", "snowflake"], keywords=["pipelines", "etl"],
+                    min_degree="bachelor")
+    with tempfile.TemporaryDirectory() as tmp:
+        start = time.perf_counter()
+        index.save(tmp)
+        saved = time.perf_counter() - start
+        size = sum(os.path.getsize(os.path.join(tmp, f)) for f in os.listdir(tmp))
+
+        loads = []
+        for _ in range(args.repeats):
+            start = time.perf_counter()
+            loaded = CandidateIndex.load(tmp)
+            loads.append(time.perf_counter() - start)
+
+        ranks = []
+        for _ in range(args.repeats):
+            start = time.perf_counter()
+            ranked = loaded.rank(role, args.top)
+            ranks.append(time.perf_counter() - start)
+
+        precision = sum(archetypes[c["row"]] == "data engineer" for c in ranked) / len(ranked)
+        print(
+            f"{args.candidates} candidates: build {built:.2f}s, save {saved * 1000:.0f} ms "
+            f"({size / 1024 / 1024:.1f} MiB), mmap load {statistics.median(loads) * 1000:.1f} ms, "
+            f"rank top {args.top} {statistics.median(ranks) * 1000:.1f} ms"
+        )
+        print(f"top {args.top} precision for 'Data Engineer': {precision:.0%}")
+        for candidate in ranked[:5]:
+            print(f"  {candidate['score']:5.1f}  {candidate['name']}  {candidate['components']}")
+
+
+if __name__ == "__main__":
+    main()
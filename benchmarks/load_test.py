@@ -0,0 +1,113 @@
+"""
+Load test comparing the HTTP API (api.py) with the Streamlit path (app.py).
+
+Both paths run real chat turns against the configured LLM, so keys for Groq
+must be set. The profile must already have a thread (create it once through
+either UI) so scraping is not part of the measurement.
+
+Usage:
+    uvicorn api:app --port 8000 --workers 4 &
+    python benchmarks/load_test.py --profile-url https://www.linkedin.com/in/username/ \
+        --requests 20 --concurrency 5
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+from typing import List
+
+import httpx
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def summarize(name: str, latencies: List[float], wall: float) -> None:
+    if not latencies:
+        print(f"{name}: no successful requests")
+        return
+    ordered = sorted(latencies)
+    p95 = ordered[min(len(ordered) - 1, int(0.95 * len(ordered)))]
+    print(
+        f"{name}: n={len(latencies)} mean={statistics.mean(latencies):.3f}s "
+        f"p50={statistics.median(latencies):.3f}s p95={p95:.3f}s "
+        f"throughput={len(latencies) / wall:.2f} turns/s"
+    )
+
+
+async def run_api(base_url: str, profile_urls: List[str], message: str, total: int, concurrency: int) -> None:
+    async with httpx.AsyncClient(base_url=base_url, timeout=120) as client:
+        thread_ids = []
+        for profile_url in profile_urls:
+            resp = await client.get("/threads", params={"profile_url": profile_url})
+            resp.raise_for_status()
+            thread_ids.append(resp.json()["thread_id"])
+
+        latencies: List[float] = []
+        sem = asyncio.Semaphore(concurrency)
+
+        async def one_turn(i: int):
+            # Turns on one thread are serialized by the API, so spread them over all threads.
+            thread_id = thread_ids[i % len(thread_ids)]
+            async with sem:
+                start = time.perf_counter()
+                r = await client.post(f"/threads/{thread_id}/messages", json={"content": message})
+                if r.status_code == 200:
+                    latencies.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(one_turn(i) for i in range(total)))
+        summarize("api", latencies, time.perf_counter() - start)
+
+
+def run_streamlit(profile_url: str, message: str, total: int) -> None:
+    """
+    Drive app.py through Streamlit's script runner: every turn is a full rerun.
+    """
+    from streamlit.testing.v1 import AppTest
+
+    sys.path.insert(0, ROOT)
+    from agent import find_thread_id_for_url
+    from storage import get_store
+
+    thread_id, previous_state = find_thread_id_for_url(get_store(), profile_url)
+    if thread_id is None:
+        print("streamlit: no thread for this profile URL, skipping")
+        return
+
+    at = AppTest.from_file(os.path.join(ROOT, "app.py"), default_timeout=120)
+    at.session_state["chat_mode"] = "continue"
+    at.session_state["thread_id"] = thread_id
+    at.session_state["state"] = dict(previous_state)
+    at.run()
+
+    latencies: List[float] = []
+    start = time.perf_counter()
+    for _ in range(total):
+        turn_start = time.perf_counter()
+        at.chat_input[0].set_value(message).run()
+        latencies.append(time.perf_counter() - turn_start)
+    summarize("streamlit", latencies, time.perf_counter() - start)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--profile-url", action="append", required=True,
+                        help="May be repeated; API turns are spread over all given threads.")
+    parser.add_argument("--message", default="How is my headline?")
+    parser.add_argument("--requests", type=int, default=20)
+    parser.add_argument("--concurrency", type=int, default=5)
+    parser.add_argument("--skip-streamlit", action="store_true")
+    args = parser.parse_args()
+
+    profile_urls = [url.rstrip("/") for url in args.profile_url]
+    asyncio.run(run_api(args.base_url, profile_urls, args.message, args.requests, args.concurrency))
+    if not args.skip_streamlit:
+        # Streamlit serves one rerun at a time per session, so this path is sequential.
+        run_streamlit(profile_urls[0], args.message, args.requests)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,473 @@
+"""
+Vectorized ranking of many candidates against one role, without the LLM.
+
+job_matcher scores one profile against one role through an LLM call. For
+"rank these 5,000 candidates for a data engineer role" this module builds a
+columnar index from preprocess_profile outputs instead:
+
+- skills: sparse candidate x skill matrix over normalized skill names
+  (parenthesized acronyms such as "(NLP)" count as aliases);
+- text: L2-normalized TF-IDF of About + Projects;
+- credentials: terms of Educations + Certifications, plus the highest degree
+  level and the certification count as dense columns.
+
+Sparse matrices are stored as coordinate arrays (row, column, value), so
+scoring every candidate is a handful of NumPy gathers and np.bincount calls.
+The index is saved as .npy files and loaded memory-mapped, so reopening a
+large index is instant and pages in only what a query touches. Optionally the
+top of the ranking is sent through the job fit LLM call for missing skills
+and suggestions.
+
+Usage:
+    python candidate_ranking.py build summarized.jsonl candidates.idx
+    python candidate_ranking.py build raw_profiles.jsonl candidates.idx --raw --workers 4
+    python candidate_ranking.py rank candidates.idx --role "Data Engineer" \\
+        --skills python,sql,spark --preferred airflow,kafka --top 20 --narrative 5
+"""
+import argparse
+import json
+import math
+import os
+import re
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import copy_context
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from pydantic import BaseModel, Field
+
+INDEX_FORMAT = 1
+# Largest vocabularies kept, most frequent terms first
+MAX_SKILL_VOCAB = int(os.getenv("RANKING_MAX_SKILL_VOCAB", "50000"))
+MAX_TEXT_VOCAB = int(os.getenv("RANKING_MAX_TEXT_VOCAB", "50000"))
+# Concurrent job fit calls for the shortlist; llm_scheduler paces them
+NARRATIVE_WORKERS = int(os.getenv("RANKING_NARRATIVE_WORKERS", "4"))
+NARRATIVE_CACHE_TTL = 7 * 24 * 3600
+
+DEGREE_LEVELS = {"none": 0, "bachelor": 1, "master": 2, "phd": 3}
+_DEGREE_PATTERNS = [
+    (3, re.compile(r"\b(ph\.?\s?d|doctor(ate)?|d\.?phil)\b", re.I)),
+    (2, re.compile(r"\b(master'?s?|m\.?\s?tech|m\.?sc|m\.?s\.|mba|m\.?e\.|m\.?eng|mca)\b", re.I)),
+    (1, re.compile(r"\b(bachelor'?s?|b\.?\s?tech|b\.?sc|b\.?s\.|b\.?e\.|b\.?eng|bca|b\.?a\.|undergraduate)\b", re.I)),
+]
+
+STOPWORDS = {
+    "a", "an", "the", "and", "or", "of", "to", "in", "on", "at", "for", "with", "by", "from", "as",
+    "is", "are", "was", "were", "be", "been", "am", "i", "me", "my", "we", "our", "you", "your",
+    "it", "its", "this", "that", "these", "those", "using", "used", "use", "into", "over", "via",
+    "also", "have", "has", "had", "which", "who", "their", "they", "them", "while", "about",
+}
+_TOKEN_RE = re.compile(r"[a-z0-9][a-z0-9+#.]*[a-z0-9+#]|[a-z0-9]")
+_SKILL_WORD_RE = re.compile(r"[a-z0-9+#]+")
+
+ARRAYS = (
+    "skill_rows", "skill_cols",
+    "text_rows", "text_cols", "text_vals",
+    "cred_rows", "cred_cols",
+    "text_idf", "degree", "n_certs", "n_skills",
+    "profile_offsets",
+)
+
+
+class RoleSpec(BaseModel):
+    title: str
+    required_skills: List[str] = Field(default_factory=list)
+    preferred_skills: List[str] = Field(default_factory=list)
+    # Extra terms matched against About/Projects and credentials
+    keywords: List[str] = Field(default_factory=list)
+    min_degree: str = "none"
+    # Relative weight of each score component
+    weights: Dict[str, float] = Field(default_factory=lambda: {
+        "skills": 0.5, "text": 0.3, "credentials": 0.1, "education": 0.1,
+    })
+
+
+def tokenize(text: str) -> List[str]:
+    return [t for t in _TOKEN_RE.findall((text or "").lower()) if t not in STOPWORDS and len(t) > 1]
+
+
+def normalize_skill(skill: str) -> List[str]:
+    """
+    "Natural Language Processing (NLP)" -> ["natural language processing", "nlp"]
+    """
+    skill = (skill or "").lower()
+    aliases = [a.strip() for a in re.findall(r"\(([^)]*)\)", skill)]
+    name = " ".join(re.sub(r"\([^)]*\)", " ", skill).split())
+    return [s for s in dict.fromkeys([name] + aliases) if s]
+
+
+def split_skills(skills: str) -> List[str]:
+    names: List[str] = []
+    for skill in (skills or "").split(","):
+        names.extend(normalize_skill(skill))
+    return list(dict.fromkeys(names))
+
+
+def degree_level(educations: str) -> int:
+    for level, pattern in _DEGREE_PATTERNS:
+        if pattern.search(educations or ""):
+            return level
+    return 0
+
+
+def _count_items(summary: str) -> int:
+    # Certifications summaries are "Title (Issuer, Date), ..."
+    return len(re.findall(r"\)\s*(?:,|$)", summary or ""))
+
+
+def _vocabulary(doc_terms: List[List[str]], max_size: int) -> Tuple[Dict[str, int], np.ndarray]:
+    df = Counter(t for terms in doc_terms for t in set(terms))
+    terms = [t for t, _ in sorted(df.items(), key=lambda item: (-item[1], item[0]))[:max_size]]
+    return {t: i for i, t in enumerate(terms)}, np.array([df[t] for t in terms], dtype=np.int32)
+
+
+def _binary_coo(doc_terms: List[List[str]], vocab: Dict[str, int]) -> Tuple[np.ndarray, np.ndarray]:
+    rows, cols = [], []
+    for row, terms in enumerate(doc_terms):
+        ids = {vocab[t] for t in terms if t in vocab}
+        rows.extend([row] * len(ids))
+        cols.extend(sorted(ids))
+    return np.array(rows, dtype=np.int32), np.array(cols, dtype=np.int32)
+
+
+class CandidateIndex:
+    """
+    Columnar candidate index. Build with build_index() or CandidateIndex.load().
+    """
+
+    def __init__(self, arrays: Dict[str, np.ndarray], meta: Dict[str, Any], directory: Optional[str] = None):
+        self.arrays = arrays
+        self.meta = meta
+        self.directory = directory
+        self.size = meta["size"]
+        self.skill_vocab = {t: i for i, t in enumerate(meta["skill_vocab"])}
+        self.text_vocab = {t: i for i, t in enumerate(meta["text_vocab"])}
+        self.cred_vocab = {t: i for i, t in enumerate(meta["cred_vocab"])}
+        self._profiles: Optional[List[Dict[str, Any]]] = meta.get("profiles")
+        self._skill_words: Optional[Dict[str, set]] = None
+
+    # --- Persistence ---
+
+    def save(self, directory: str) -> None:
+        os.makedirs(directory, exist_ok=True)
+        if self._profiles is not None:
+            # Full profiles for the narrative step, read back by byte offset
+            offsets = []
+            with open(os.path.join(directory, "profiles.jsonl"), "wb") as f:
+                for profile in self._profiles:
+                    offsets.append(f.tell())
+                    f.write(json.dumps(profile, ensure_ascii=False).encode("utf-8") + b"\n")
+            self.arrays["profile_offsets"] = np.array(offsets, dtype=np.int64)
+        for name in ARRAYS:
+            np.save(os.path.join(directory, f"{name}.npy"), self.arrays[name])
+        meta = {k: v for k, v in self.meta.items() if k != "profiles"}
+        with open(os.path.join(directory, "meta.json"), "w", encoding="utf-8") as f:
+            json.dump(meta, f, ensure_ascii=False)
+        self.directory = directory
+
+    @classmethod
+    def load(cls, directory: str, mmap: bool = True) -> "CandidateIndex":
+        with open(os.path.join(directory, "meta.json"), encoding="utf-8") as f:
+            meta = json.load(f)
+        if meta.get("format") != INDEX_FORMAT:
+            raise ValueError(f"{directory} has index format {meta.get('format')}, expected {INDEX_FORMAT}; rebuild it")
+        arrays = {
+            name: np.load(os.path.join(directory, f"{name}.npy"), mmap_mode="r" if mmap else None)
+            for name in ARRAYS
+        }
+        return cls(arrays, meta, directory)
+
+    def profile(self, row: int) -> Dict[str, Any]:
+        if self._profiles is not None:
+            return self._profiles[row]
+        with open(os.path.join(self.directory, "profiles.jsonl"), "rb") as f:
+            f.seek(int(self.arrays["profile_offsets"][row]))
+            return json.loads(f.readline())
+
+    # --- Scoring ---
+
+    def _row_sums(self, rows: np.ndarray, values: np.ndarray) -> np.ndarray:
+        return np.bincount(rows, weights=values, minlength=self.size).astype(np.float32)
+
+    def _skill_ids(self, name: str) -> List[int]:
+        """
+        Vocabulary skills named `name`, or containing all of its words
+        ("spark" matches "apache spark", "react" matches "react.js").
+        """
+        if self._skill_words is None:
+            self._skill_words = {}
+            for skill, i in self.skill_vocab.items():
+                for word in _SKILL_WORD_RE.findall(skill):
+                    self._skill_words.setdefault(word, set()).add(i)
+        ids = {self.skill_vocab[name]} if name in self.skill_vocab else set()
+        postings = [self._skill_words.get(word, set()) for word in _SKILL_WORD_RE.findall(name)]
+        if postings:
+            ids |= set.intersection(*postings)
+        return sorted(ids)
+
+    def _skill_score(self, role: RoleSpec) -> np.ndarray:
+        """
+        Weighted share of the role's skills each candidate lists: required
+        skills count double, and each skill counts once, whichever of its
+        names the candidate uses.
+        """
+        rows, cols = self.arrays["skill_rows"], self.arrays["skill_cols"]
+        score = np.zeros(self.size, dtype=np.float32)
+        total = 0.0
+        mask = np.zeros(len(self.skill_vocab), dtype=np.float32)
+        for skills, weight in ((role.required_skills, 2.0), (role.preferred_skills, 1.0)):
+            for skill in skills:
+                total += weight
+                ids = [i for name in normalize_skill(skill) for i in self._skill_ids(name)]
+                if not ids:
+                    continue
+                mask[:] = 0.0
+                mask[ids] = 1.0
+                score += weight * (self._row_sums(rows, mask[cols]) > 0)
+        return score / total if total else score
+
+    def _role_terms(self, role: RoleSpec) -> List[str]:
+        text = " ".join([role.title] + role.required_skills + role.preferred_skills + role.keywords)
+        return tokenize(text)
+
+    def score(self, role: RoleSpec) -> Dict[str, np.ndarray]:
+        """
+        Per-component and total scores (0..1) for every candidate.
+        """
+        a = self.arrays
+        skills = self._skill_score(role)
+
+        terms = self._role_terms(role)
+        query = np.zeros(len(self.text_vocab), dtype=np.float32)
+        for term, count in Counter(terms).items():
+            if term in self.text_vocab:
+                col = self.text_vocab[term]
+                query[col] = (1.0 + math.log(count)) * a["text_idf"][col]
+        norm = np.linalg.norm(query)
+        text = self._row_sums(a["text_rows"], a["text_vals"] * query[a["text_cols"]]) / norm if norm else \
+            np.zeros(self.size, dtype=np.float32)
+
+        wanted = set(tokenize(" ".join([role.title] + role.required_skills + role.keywords)))
+        cred_terms = [self.cred_vocab[t] for t in wanted if t in self.cred_vocab]
+        if cred_terms:
+            mask = np.zeros(len(self.cred_vocab), dtype=np.float32)
+            mask[cred_terms] = 1.0
+            credentials = self._row_sums(a["cred_rows"], mask[a["cred_cols"]]) / len(wanted)
+            # A relevant certification is worth more than a relevant degree subject alone
+            credentials = np.minimum(1.0, credentials + 0.1 * np.minimum(a["n_certs"], 3) * (credentials > 0))
+        else:
+            credentials = np.zeros(self.size, dtype=np.float32)
+
+        required = DEGREE_LEVELS.get(role.min_degree.lower(), 0)
+        degree = np.asarray(a["degree"], dtype=np.float32)
+        education = np.where(degree >= required, 0.5 + degree / 6.0, degree / (2.0 * max(required, 1)))
+
+        components = {"skills": skills, "text": text, "credentials": credentials, "education": education}
+        weight_sum = sum(role.weights.get(name, 0.0) for name in components) or 1.0
+        components["total"] = sum(role.weights.get(name, 0.0) * values for name, values in components.items()) / weight_sum
+        return components
+
+    def rank(self, role: RoleSpec, top_k: int = 20) -> List[Dict[str, Any]]:
+        """
+        The top_k candidates, best first, with their component scores.
+        """
+        scores = self.score(role)
+        total = scores["total"]
+        top_k = min(top_k, self.size)
+        if top_k <= 0:
+            return []
+        top = np.argpartition(-total, top_k - 1)[:top_k]
+        top = top[np.argsort(-total[top], kind="stable")]
+        ids = self.meta["ids"]
+        names = self.meta["names"]
+        return [
+            {
+                "row": int(row),
+                "profile_url": ids[row],
+                "name": names[row],
+                "score": round(float(total[row]) * 100, 1),
+                "components": {k: round(float(v[row]), 3) for k, v in scores.items() if k != "total"},
+            }
+            for row in top
+        ]
+
+
+def build_index(profiles: Iterable[Dict[str, Any]]) -> CandidateIndex:
+    """
+    Build an in-memory index from preprocess_profile outputs.
+    """
+    kept: List[Dict[str, Any]] = []
+    skill_terms: List[List[str]] = []
+    text_terms: List[List[str]] = []
+    cred_terms: List[List[str]] = []
+    degrees, certs, n_skills = [], [], []
+    for profile in profiles:
+        kept.append(profile)
+        skills = split_skills(profile.get("Skills"))
+        skill_terms.append(skills)
+        text_terms.append(tokenize(f"{profile.get('About') or ''}\n{profile.get('Projects') or ''}"))
+        cred_terms.append(tokenize(f"{profile.get('Educations') or ''}\n{profile.get('Certifications') or ''}"))
+        degrees.append(degree_level(profile.get("Educations")))
+        certs.append(_count_items(profile.get("Certifications")))
+        n_skills.append(len(skills))
+
+    skill_vocab, _ = _vocabulary(skill_terms, MAX_SKILL_VOCAB)
+    skill_rows, skill_cols = _binary_coo(skill_terms, skill_vocab)
+    cred_vocab, _ = _vocabulary(cred_terms, MAX_TEXT_VOCAB)
+    cred_rows, cred_cols = _binary_coo(cred_terms, cred_vocab)
+
+    text_vocab, df = _vocabulary(text_terms, MAX_TEXT_VOCAB)
+    idf = np.log((1.0 + len(kept)) / (1.0 + df)).astype(np.float32) + 1.0
+    rows, cols, vals = [], [], []
+    for row, terms in enumerate(text_terms):
+        counts = Counter(text_vocab[t] for t in terms if t in text_vocab)
+        if not counts:
+            continue
+        ids = np.fromiter(counts.keys(), dtype=np.int32, count=len(counts))
+        weights = (1.0 + np.log(np.fromiter(counts.values(), dtype=np.float32, count=len(counts)))) * idf[ids]
+        weights /= np.linalg.norm(weights)
+        rows.extend([row] * len(ids))
+        cols.extend(ids.tolist())
+        vals.extend(weights.tolist())
+
+    arrays = {
+        "skill_rows": skill_rows,
+        "skill_cols": skill_cols,
+        "text_rows": np.array(rows, dtype=np.int32),
+        "text_cols": np.array(cols, dtype=np.int32),
+        "text_vals": np.array(vals, dtype=np.float32),
+        "cred_rows": cred_rows,
+        "cred_cols": cred_cols,
+        "text_idf": idf,
+        "degree": np.array(degrees, dtype=np.int8),
+        "n_certs": np.array(certs, dtype=np.int16),
+        "n_skills": np.array(n_skills, dtype=np.int16),
+        "profile_offsets": np.zeros(0, dtype=np.int64),
+    }
+    meta = {
+        "format": INDEX_FORMAT,
+        "size": len(kept),
+        "ids": [p.get("profile_url") or "" for p in kept],
+        "names": [p.get("FullName") or "" for p in kept],
+        "skill_vocab": list(skill_vocab),
+        "text_vocab": list(text_vocab),
+        "cred_vocab": list(cred_vocab),
+        "profiles": kept,
+    }
+    return CandidateIndex(arrays, meta)
+
+
+def add_narratives(index: CandidateIndex, ranked: List[Dict[str, Any]], role: RoleSpec,
+                   limit: int, store=None) -> List[Dict[str, Any]]:
+    """
+    Run the job fit LLM call for the first `limit` ranked candidates and attach
+    its match score, missing skills and suggestions as "job_fit". Results are
+    cached in the store per profile version and role.
+    """
+    # Imported here: the agent sets up the LLM clients, which ranking alone does not need
+    from agent import job_fit_memory_key, run_job_fit
+    from llm_scheduler import BACKGROUND, llm_context
+    from storage import get_store
+
+    store = store or get_store()
+
+    def job_fit(candidate: Dict[str, Any]) -> Dict[str, Any]:
+        profile = index.profile(candidate["row"])
+        key = f"ranking:{job_fit_memory_key(profile, role.title)}"
+        cached = store.get(key)
+        if cached is not None:
+            return cached
+        with llm_context(user=f"ranking:{candidate['profile_url']}", priority=BACKGROUND):
+            try:
+                result = run_job_fit(profile, role.title)
+            except Exception as e:
+                print(f"[ranking] job fit failed for {candidate['profile_url']}: {e}")
+                return {"error": str(e)}
+        store.set(key, result, ttl=NARRATIVE_CACHE_TTL)
+        return result
+
+    shortlist = ranked[:limit]
+    with ThreadPoolExecutor(max_workers=NARRATIVE_WORKERS, thread_name_prefix="ranking") as pool:
+        results = list(pool.map(lambda c: copy_context().run(job_fit, c), shortlist))
+    for candidate, result in zip(shortlist, results):
+        candidate["job_fit"] = result
+    return ranked
+
+
+def _iter_summarized(path: str) -> Iterable[Dict[str, Any]]:
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def _split(value: Optional[str]) -> List[str]:
+    return [v.strip() for v in (value or "").split(",") if v.strip()]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    build = commands.add_parser("build", help="Build an index from summarized (or raw) profiles")
+    build.add_argument("input", help="JSONL of preprocess_profile outputs (see batch_preprocessing.py)")
+    build.add_argument("index", help="Index directory to write")
+    build.add_argument("--raw", action="store_true", help="Input holds raw scraped profiles")
+    build.add_argument("--workers", type=int, default=None, help="Preprocessing pool size with --raw")
+
+    rank = commands.add_parser("rank", help="Rank indexed candidates for a role")
+    rank.add_argument("index", help="Index directory")
+    rank.add_argument("--role", help="Role title, e.g. 'Data Engineer'")
+    rank.add_argument("--spec", help="JSON file with a full RoleSpec instead of the flags below")
+    rank.add_argument("--skills", help="Required skills, comma-separated")
+    rank.add_argument("--preferred", help="Preferred skills, comma-separated")
+    rank.add_argument("--keywords", help="Extra keywords, comma-separated")
+    rank.add_argument("--min-degree", default="none", choices=list(DEGREE_LEVELS))
+    rank.add_argument("--top", type=int, default=20)
+    rank.add_argument("--narrative", type=int, default=0,
+                      help="Run the LLM job fit for this many top candidates")
+    rank.add_argument("--json", action="store_true", help="Print the ranking as JSON")
+    args = parser.parse_args()
+
+    if args.command == "build":
+        if args.raw:
+            from batch_preprocessing import iter_preprocessed_profiles, iter_raw_records
+            profiles = iter_preprocessed_profiles(iter_raw_records(args.input), args.workers)
+        else:
+            profiles = _iter_summarized(args.input)
+        index = build_index(profiles)
+        index.save(args.index)
+        print(f"✅ Indexed {index.size} candidates ({len(index.skill_vocab)} skills, "
+              f"{len(index.text_vocab)} terms) into {args.index}")
+        return
+
+    if args.spec:
+        with open(args.spec, encoding="utf-8") as f:
+            role = RoleSpec.model_validate(json.load(f))
+    elif args.role:
+        role = RoleSpec(title=args.role, required_skills=_split(args.skills), preferred_skills=_split(args.preferred),
+                        keywords=_split(args.keywords), min_degree=args.min_degree)
+    else:
+        parser.error("rank needs --role or --spec")
+
+    index = CandidateIndex.load(args.index)
+    ranked = index.rank(role, args.top)
+    if args.narrative:
+        add_narratives(index, ranked, role, args.narrative)
+
+    if args.json:
+        print(json.dumps(ranked, indent=2, ensure_ascii=False))
+        return
+    for place, candidate in enumerate(ranked, 1):
+        parts = ", ".join(f"{k} {v:.2f}" for k, v in candidate["components"].items())
+        print(f"{place:>3}. {candidate['score']:5.1f}  {candidate['name'] or candidate['profile_url']}  ({parts})")
+        fit = candidate.get("job_fit")
+        if fit and "error" not in fit:
+            print(f"       LLM match {fit.get('match_score', 0)}%, missing: {', '.join(fit.get('missing_skills', []))}")
+            for suggestion in fit.get("suggestions", [])[:3]:
+                print(f"       • {suggestion}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,6 @@
-from typing import List, Dict, Any, Optional, Annotated
+import time
+from collections import OrderedDict, deque
+from typing import List, Dict, Any, Optional, Annotated, Deque
 from pydantic import BaseModel, Field
 from langchain_core.messages import BaseMessage
 from langgraph.graph import add_messages
@@ -118,13 +120,123 @@ class ContentGenerationModel(BaseModel):
 # ========== 6. MEMORY SETUP ==========
 
 class UserMemory:
-    def __init__(self):
+    """
+    Memory of tool results for a single chat thread.
+
+    Keeps the latest value per key in an LRU-bounded dict (O(1) lookup, e.g.
+    "profile_analysis:<profile version>") plus a bounded history of saves as
+    (key, timestamp); values live only in latest.
+    When a store is given, it is persisted there next to the thread's
+    checkpoints, so every worker sees the same memory. Saves reload the
+    stored memory under a per-thread store lock and merge into it, so
+    concurrent writers (a chat turn and prewarm.py) don't drop each other's
+    entries.
+    """
+    LOCK_TTL = 30
+
+    def __init__(self, thread_id: Optional[str] = None, store=None, max_entries: int = 50,
+                 max_roles: int = 10):
+        self.thread_id = thread_id
+        self.store = store
+        self.max_entries = max_entries
+        self.max_roles = max_roles
         self.profile = None
         self.target_roles = []
-        self.history = []
+        self.latest: "OrderedDict[str, Any]" = OrderedDict()
+        self.history: Deque = deque(maxlen=max_entries)
+        # Keys read and roles added since the last load, re-applied on save
+        self._used: List[str] = []
+        self._new_roles: List[str] = []
+        self._load()
+
+    @property
+    def store_key(self) -> str:
+        return f"memory:{self.thread_id}"
+
+    @property
+    def _persistent(self) -> bool:
+        return self.store is not None and self.thread_id is not None
+
+    def _load(self):
+        if not self._persistent:
+            return
+        data = self.store.get(self.store_key) or {}
+        self.latest.clear()
+        for key, value in data.get("latest", []):
+            self.latest[key] = value
+        self.history.clear()
+        for key, saved_at in data.get("history", []):
+            # Older payloads stored (key, value) pairs
+            self.history.append((key, saved_at if isinstance(saved_at, (int, float)) else None))
+        self.target_roles = data.get("target_roles", [])
+
+    def _persist(self):
+        self.store.set(self.store_key, {
+            "latest": list(self.latest.items()),
+            "history": list(self.history),
+            "target_roles": self.target_roles,
+        })
+
+    def _lock(self):
+        return self.store.lock(self.store_key, ttl=self.LOCK_TTL, wait=self.LOCK_TTL)
+
+    def _with_role(self, roles: List[str], role: str) -> List[str]:
+        # Case-insensitive match, newest wording and position win
+        folded = " ".join(role.lower().split())
+        kept = [r for r in roles if " ".join(r.lower().split()) != folded]
+        return (kept + [role])[-self.max_roles:]
+
+    def add_target_role(self, role: str) -> None:
+        """
+        Remember a role the user asked about, as they wrote it; persisted with
+        the next save().
+        """
+        role = " ".join((role or "").split())
+        if role:
+            self._new_roles.append(role)
+            self.target_roles = self._with_role(self.target_roles, role)
+
+    def _put(self, key, value):
+        for used in self._used:
+            if used in self.latest:
+                self.latest.move_to_end(used)
+        self.latest[key] = value
+        self.latest.move_to_end(key)
+        while len(self.latest) > self.max_entries:
+            self.latest.popitem(last=False)
+        self.history.append((key, time.time()))
+        for role in self._new_roles:
+            self.target_roles = self._with_role(self.target_roles, role)
+        self._used, self._new_roles = [], []
 
     def save(self, key, value):
-        self.history.append((key, value))
+        if not self._persistent:
+            self._put(key, value)
+            return
+        with self._lock():
+            self._load()
+            self._put(key, value)
+            self._persist()
+
+    def get(self, key, default=None):
+        if key not in self.latest:
+            return default
+        # Recency is persisted with the next save
+        self.latest.move_to_end(key)
+        self._used.append(key)
+        return self.latest[key]
 
     def get_history(self):
-        return self.history
+        """
+        (key, saved_at, value) per save, oldest first; value is None once the
+        key has been evicted from latest.
+        """
+        return [(key, saved_at, self.latest.get(key)) for key, saved_at in self.history]
+
+    def clear(self):
+        self.latest.clear()
+        self.history.clear()
+        self.target_roles = []
+        if self._persistent:
+            with self._lock():
+                self.store.delete(self.store_key)
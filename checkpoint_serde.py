@@ -0,0 +1,310 @@
+"""
+Deduplicating, compressed checkpoint serializer.
+
+SqliteSaver stores every checkpoint as one serialized blob of the whole
+ChatbotState, so each turn rewrites the full profile, sections and every
+prior message. DedupSerializer instead stores each message and each large
+channel value once, content-addressed (sha256) in the Store's blob table,
+and the checkpoint row only keeps references plus the small channels,
+compressed with zstd (zlib if zstandard is not installed).
+
+Pending writes get the same treatment, since the graph input carries the
+whole state every turn; small values pass through to the default serializer.
+
+Reads fetch only the blobs that are not already in a process-wide LRU of
+decompressed blob bytes, in one batched query, so loading checkpoint N after
+N-1 costs one or two new messages. Rows written by the default serializer
+are read unchanged.
+
+Blobs may be shared by threads, so deleting a thread leaves its blobs in
+place; gc_blobs() sweeps the ones no checkpoint or write row references any
+more. Every write touches the blobs it references, at least every
+BLOB_TOUCH_INTERVAL, and the sweep spares blobs touched within
+BLOB_GC_GRACE, so a checkpoint being written never loses a blob it reuses.
+"""
+import hashlib
+import os
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer
+
+try:
+    import zstandard
+except ImportError:  # optional; zlib is always available
+    zstandard = None
+
+TYPE_PREFIX = "dedup"
+BLOB_PREFIX = "ckpt:"
+
+# Channel values serialized to at least this many bytes become blobs
+MIN_BLOB_SIZE = 256
+# Blobs smaller than this are stored uncompressed
+MIN_COMPRESS_SIZE = 128
+BLOB_CACHE_BYTES = 32 * 1024 * 1024
+
+# Unreferenced blobs are only swept once untouched for this long
+BLOB_GC_GRACE = float(os.getenv("CHECKPOINT_BLOB_GC_GRACE", str(24 * 3600)))
+# A write re-touches a reused blob when its last touch is older than this,
+# and stores it again past half the grace, when a sweep may have taken it
+BLOB_TOUCH_INTERVAL = min(3600.0, BLOB_GC_GRACE / 4)
+
+ZSTD_LEVEL = 3
+ZLIB_LEVEL = 3
+
+_RAW, _ZLIB, _ZSTD = b"r", b"z", b"s"
+
+
+class _Codec:
+    """
+    Tagged compression: the first byte says how the rest was encoded, so
+    data written with zstd stays readable by a process without it and vice versa.
+    """
+
+    def __init__(self, prefer_zstd: bool = True):
+        self.use_zstd = prefer_zstd and zstandard is not None
+        self.name = "zstd" if self.use_zstd else "zlib"
+        self._local = threading.local()
+
+    def _zstd(self):
+        # zstandard (de)compressors are not thread-safe; keep one per thread
+        local = self._local
+        if not hasattr(local, "compressor"):
+            local.compressor = zstandard.ZstdCompressor(level=ZSTD_LEVEL)
+            local.decompressor = zstandard.ZstdDecompressor()
+        return local.compressor, local.decompressor
+
+    def compress(self, data: bytes) -> bytes:
+        if len(data) < MIN_COMPRESS_SIZE:
+            return _RAW + data
+        if self.use_zstd:
+            packed = _ZSTD + self._zstd()[0].compress(data)
+        else:
+            packed = _ZLIB + zlib.compress(data, ZLIB_LEVEL)
+        return packed if len(packed) < len(data) + 1 else _RAW + data
+
+    def decompress(self, data: bytes) -> bytes:
+        tag, body = data[:1], data[1:]
+        if tag == _RAW:
+            return bytes(body)
+        if tag == _ZLIB:
+            return zlib.decompress(body)
+        if tag == _ZSTD:
+            if zstandard is None:
+                raise RuntimeError("Checkpoint was written with zstd; pip install zstandard to read it")
+            return self._zstd()[1].decompress(body)
+        raise ValueError(f"Unknown checkpoint codec tag {tag!r}")
+
+
+class _BlobCache:
+    """
+    LRU of decoded blob payloads, bounded by total bytes.
+    """
+
+    def __init__(self, max_bytes: int = BLOB_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._items: "OrderedDict[str, Tuple[str, bytes]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, digest: str) -> Optional[Tuple[str, bytes]]:
+        with self._lock:
+            item = self._items.get(digest)
+            if item is not None:
+                self._items.move_to_end(digest)
+            return item
+
+    def put(self, digest: str, item: Tuple[str, bytes]) -> None:
+        with self._lock:
+            if digest in self._items:
+                return
+            self._items[digest] = item
+            self.size += len(item[1])
+            while self.size > self.max_bytes and self._items:
+                _, (_, data) = self._items.popitem(last=False)
+                self.size -= len(data)
+
+
+class DedupSerializer:
+    """
+    SerializerProtocol implementation for LangGraph checkpointers.
+
+    store: a storage.Store, used for put_blobs/get_blobs.
+    """
+
+    def __init__(self, store, inner=None, prefer_zstd: bool = True):
+        self.store = store
+        self.inner = inner or JsonPlusSerializer()
+        self.codec = _Codec(prefer_zstd)
+        self.cache = _BlobCache()
+        # Digests known to be persisted -> when this process last stored or
+        # touched them, so repeated messages skip the write
+        self._stored: "OrderedDict[str, float]" = OrderedDict()
+        self._stored_lock = threading.Lock()
+
+    # --- Blobs ---
+
+    def _blob_ref(self, type_: str, data: bytes, new_blobs: Dict[str, Optional[bytes]]) -> str:
+        """
+        new_blobs collects blobs to store (digest -> data) and known blobs to
+        touch (digest -> None).
+        """
+        digest = hashlib.sha256(type_.encode() + b"\0" + data).hexdigest()
+        with self._stored_lock:
+            stored_at = self._stored.get(digest)
+        age = time.time() - stored_at if stored_at is not None else None
+        if age is None or age > BLOB_GC_GRACE / 2:
+            new_blobs[digest] = self.codec.compress(type_.encode() + b"\0" + data)
+        elif age > BLOB_TOUCH_INTERVAL:
+            new_blobs.setdefault(digest, None)
+        self.cache.put(digest, (type_, data))
+        return digest
+
+    def _save_blobs(self, new_blobs: Dict[str, Optional[bytes]]) -> None:
+        if not new_blobs:
+            return
+        blobs = {BLOB_PREFIX + d: blob for d, blob in new_blobs.items() if blob is not None}
+        if blobs:
+            self.store.put_blobs(blobs)
+        touched = [BLOB_PREFIX + d for d, blob in new_blobs.items() if blob is None]
+        if touched:
+            self.store.touch_blobs(touched)
+        now = time.time()
+        with self._stored_lock:
+            for digest in new_blobs:
+                self._stored[digest] = now
+                self._stored.move_to_end(digest)
+            while len(self._stored) > 100_000:
+                self._stored.popitem(last=False)
+
+    def _load_blobs(self, digests: Iterable[str]) -> Dict[str, Tuple[str, bytes]]:
+        found, missing = {}, []
+        for digest in digests:
+            item = self.cache.get(digest)
+            if item is None:
+                missing.append(digest)
+            else:
+                found[digest] = item
+        if missing:
+            rows = self.store.get_blobs([BLOB_PREFIX + d for d in missing])
+            for digest in missing:
+                blob = rows.get(BLOB_PREFIX + digest)
+                if blob is None:
+                    raise KeyError(f"Checkpoint blob {digest} is missing from the store")
+                type_, _, data = self.codec.decompress(blob).partition(b"\0")
+                item = (type_.decode(), data)
+                self.cache.put(digest, item)
+                found[digest] = item
+        return found
+
+    def _ref(self, value: Any, new_blobs: Dict[str, Optional[bytes]]) -> Optional[Any]:
+        """
+        Blob reference(s) for a value worth deduplicating, else None.
+        Lists (message channels) get one blob per item, shared across checkpoints.
+        """
+        if isinstance(value, list) and value:
+            return [self._blob_ref(*self.inner.dumps_typed(item), new_blobs) for item in value]
+        type_, data = self.inner.dumps_typed(value)
+        if len(data) >= MIN_BLOB_SIZE:
+            return self._blob_ref(type_, data, new_blobs)
+        return None
+
+    def _resolve(self, ref: Any, blobs: Dict[str, Tuple[str, bytes]]) -> Any:
+        if isinstance(ref, list):
+            return [self.inner.loads_typed(blobs[d]) for d in ref]
+        return self.inner.loads_typed(blobs[ref])
+
+    def _load_refs(self, refs: Iterable[Any]) -> Dict[str, Tuple[str, bytes]]:
+        digests: List[str] = []
+        for ref in refs:
+            digests.extend(ref if isinstance(ref, list) else [ref])
+        return self._load_blobs(dict.fromkeys(digests))
+
+    def _pack(self, body: Any) -> Tuple[str, bytes]:
+        type_, data = self.inner.dumps_typed(body)
+        return f"{TYPE_PREFIX}:{self.codec.name}:{type_}", self.codec.compress(data)
+
+    # --- SerializerProtocol ---
+
+    def dumps_typed(self, obj: Any) -> Tuple[str, bytes]:
+        new_blobs: Dict[str, Optional[bytes]] = {}
+        if not (isinstance(obj, dict) and isinstance(obj.get("channel_values"), dict)):
+            # Pending writes: the graph input carries the whole state each turn
+            ref = self._ref(obj, new_blobs)
+            if ref is None:
+                return self.inner.dumps_typed(obj)
+            self._save_blobs(new_blobs)
+            return self._pack({"blob_ref": ref})
+
+        channel_values: Dict[str, Any] = {}
+        refs: Dict[str, Any] = {}
+        for channel, value in obj["channel_values"].items():
+            ref = self._ref(value, new_blobs)
+            if ref is None:
+                channel_values[channel] = value
+            else:
+                refs[channel] = ref
+        self._save_blobs(new_blobs)
+        return self._pack(dict(obj, channel_values=channel_values, blob_refs=refs))
+
+    def loads_typed(self, data: Tuple[str, bytes]) -> Any:
+        type_, payload = data
+        if not type_.startswith(TYPE_PREFIX + ":"):
+            return self.inner.loads_typed(data)
+        inner_type = type_.split(":", 2)[2]
+        body = self.inner.loads_typed((inner_type, self.codec.decompress(payload)))
+
+        if "blob_ref" in body:
+            ref = body["blob_ref"]
+            return self._resolve(ref, self._load_refs([ref]))
+
+        refs: Dict[str, Any] = body.pop("blob_refs", None) or {}
+        blobs = self._load_refs(refs.values())
+        channel_values = body["channel_values"]
+        for channel, ref in refs.items():
+            channel_values[channel] = self._resolve(ref, blobs)
+        return body
+
+    # --- Garbage collection ---
+
+    def referenced_digests(self, data: Tuple[str, bytes]) -> Set[str]:
+        """
+        Blob digests a serialized row refers to, without loading the blobs.
+        """
+        type_, payload = data
+        if not type_.startswith(TYPE_PREFIX + ":"):
+            return set()
+        inner_type = type_.split(":", 2)[2]
+        body = self.inner.loads_typed((inner_type, self.codec.decompress(payload)))
+        refs = [body["blob_ref"]] if "blob_ref" in body else list((body.get("blob_refs") or {}).values())
+        digests: Set[str] = set()
+        for ref in refs:
+            digests.update(ref if isinstance(ref, list) else [ref])
+        return digests
+
+
+def gc_blobs(store, grace: float = BLOB_GC_GRACE) -> Optional[int]:
+    """
+    Delete checkpoint blobs that no checkpoint or pending write references
+    and that nobody touched within `grace` seconds. Writers assume
+    BLOB_GC_GRACE, so only pass a shorter grace when nothing is writing.
+    Returns the number deleted, or None if the store's checkpointer does not
+    use DedupSerializer.
+    """
+    serde = getattr(store.checkpointer(), "serde", None)
+    if not isinstance(serde, DedupSerializer):
+        return None
+    # Cut-off taken before the scan: anything touched after it is kept anyway
+    untouched_since = time.time() - grace
+    referenced: Set[str] = set()
+    try:
+        for row in store.checkpoint_payloads():
+            referenced.update(BLOB_PREFIX + d for d in serde.referenced_digests(row))
+        deleted = store.sweep_blobs(BLOB_PREFIX, referenced, untouched_since)
+    except NotImplementedError:
+        return None
+    print(f"[checkpoint_serde] swept {deleted} unreferenced blobs, {len(referenced)} referenced")
+    return deleted
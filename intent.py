@@ -0,0 +1,180 @@
+"""
+Cheap local intent classification of user messages.
+
+Runs on every incoming HumanMessage, before (and in parallel with) the LLM
+router in chatbot_node, to guess which tool the router is about to pick.
+Keyword/regex rules only: no model to load, microseconds per message.
+"""
+import re
+import threading
+from typing import Any, Dict, NamedTuple, Optional
+
+# Profile sections a user can ask to see, mapped to extract_from_state_tool keys.
+SECTION_ALIASES = {
+    "about": "sections.about",
+    "summary": "sections.about",
+    "headline": "sections.headline",
+    "skills": "sections.skills",
+    "projects": "sections.projects",
+    "education": "sections.educations",
+    "educations": "sections.educations",
+    "certifications": "sections.certifications",
+    "certificates": "sections.certifications",
+    "awards": "sections.honors_and_awards",
+    "honors": "sections.honors_and_awards",
+    "experience": "sections.experiences",
+    "experiences": "sections.experiences",
+    "publications": "sections.publications",
+    "patents": "sections.patents",
+    "courses": "sections.courses",
+    "test scores": "sections.test_scores",
+    "verifications": "sections.verifications",
+    "highlights": "sections.highlights",
+    "job title": "sections.job_title",
+    "company": "sections.company_name",
+    "industry": "sections.company_industry",
+}
+
+_SECTION_RE = "|".join(sorted((re.escape(k) for k in SECTION_ALIASES), key=len, reverse=True))
+
+ENHANCE_RE = re.compile(
+    r"\b(enhance|improve|rewrite|re-write|rephrase|polish|optimi[sz]e|make .* better)\b", re.I
+)
+ANALYSIS_RE = re.compile(
+    r"\b(analy[sz]e|analysis|review|evaluate|assess|audit|feedback on)\b.*\b(profile|linkedin)\b"
+    r"|\bstrengths?\b.*\bweakness(es)?\b"
+    r"|\b(profile|linkedin)\b.*\b(analy[sz]e|analysis|review|evaluation|assessment)\b",
+    re.I,
+)
+JOB_FIT_RE = re.compile(
+    # "good/ready/apply to ..." is ordinary chat ("good to know", "apply to Google"),
+    # so those verbs only take "for"/"as"
+    # "match with/to" is about expectations, not roles ("a good match with what I expected")
+    r"(?:\b(?:fit|fits|suited|suitable|qualified)\b(?:\s+(?:for|as|to|with))+"
+    r"|\b(?:ready|apply|applying|good|match|matches)\b(?:\s+(?:for|as))+)"
+    r"\s+(?:an?\s+|the\s+)?(?:role\s+of\s+|position\s+of\s+)?"
+    r"(?P<role>[a-z0-9][a-z0-9 .+#/&-]*?)"
+    r"(?:\s+(?:role|position|job|jobs|roles|positions))?\s*(?:[?.!,]|$)",
+    re.I,
+)
+# Captured "roles" that are really the rest of a sentence
+NOT_A_ROLE_WORDS = {
+    "me", "you", "him", "her", "us", "them", "it", "this", "that", "these", "those", "everyone",
+    "now", "today", "tomorrow", "later", "sure", "real", "nothing", "anything", "something",
+    "go", "know", "see", "do", "be", "get", "have", "start", "help", "hear", "talk", "chat",
+    "my", "your", "our", "their", "lunch", "dinner", "work", "fun",
+    "what", "which", "who", "whom", "how", "why", "where", "when", "whatever",
+}
+# Things people fit that are not roles: "fit for the team", "apply for a job at
+# Google". Only rejected alone or followed by a preposition, so "team lead" stays.
+NOT_A_ROLE_NOUNS = {
+    "team", "teams", "company", "companies", "group", "culture", "people", "org", "organization",
+    "startup", "job", "jobs", "role", "roles", "position", "positions", "opening", "openings", "vacancy",
+}
+SECTION_RE = re.compile(
+    r"\b(show|see|view|display|what(?:'s| is| are)|how(?:'s| is| are)|give me|print)\b"
+    r".*?\b(?:my\s+)?(?P<section>" + _SECTION_RE + r")\b",
+    re.I,
+)
+
+
+class Intent(NamedTuple):
+    tool: Optional[str]
+    args: Dict[str, Any]
+    # "enhance" when the user wants a section rewritten
+    kind: Optional[str] = None
+
+
+def _section_key(text: str) -> Optional[str]:
+    match = re.search(r"\b(" + _SECTION_RE + r")\b", text, re.I)
+    return SECTION_ALIASES[match.group(1).lower()] if match else None
+
+
+def _looks_like_role(role: str) -> bool:
+    words = role.lower().split()
+    if not words or words[0] in NOT_A_ROLE_WORDS or role.lower() == "my profile":
+        return False
+    if words[0] in NOT_A_ROLE_NOUNS and (len(words) == 1 or words[1] in {"at", "with", "in", "on", "from", "of"}):
+        return False
+    return True
+
+
+def classify_intent(text: str) -> Intent:
+    """
+    Guess the tool (and its arguments) the router is likely to choose.
+    Returns Intent(None, {}) when nothing matches confidently.
+    """
+    text = (text or "").strip()
+    if not text:
+        return Intent(None, {})
+
+    if ENHANCE_RE.search(text):
+        key = _section_key(text)
+        if key:
+            return Intent("content_generator", {"section": key.split(".", 1)[1]}, kind="enhance")
+        return Intent(None, {}, kind="enhance")
+
+    match = JOB_FIT_RE.search(text)
+    if match and match.group("role").strip():
+        role = match.group("role").strip(" .")
+        if _looks_like_role(role):
+            return Intent("job_matcher", {"target_role": role}, kind="job_fit")
+
+    if ANALYSIS_RE.search(text):
+        return Intent("profile_analyzer", {}, kind="analysis")
+
+    match = SECTION_RE.search(text)
+    if match:
+        return Intent("extract_from_state_tool", {"key": SECTION_ALIASES[match.group("section").lower()]},
+                      kind="section")
+
+    return Intent(None, {})
+
+
+def normalize_role(role: Optional[str]) -> str:
+    role = " ".join((role or "").lower().split())
+    return re.sub(r"\s+(role|position|job)$", "", role)
+
+
+class SpeculationStats:
+    """
+    Thread-safe counters for speculative tool prefetch.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.turns = 0
+        self.attempts = 0
+        self.hits = 0
+        self.misses = 0
+        self.saved_seconds = 0.0
+
+    def record_turn(self):
+        with self._lock:
+            self.turns += 1
+
+    def record_attempt(self):
+        with self._lock:
+            self.attempts += 1
+
+    def record_hit(self, saved_seconds: float):
+        with self._lock:
+            self.hits += 1
+            self.saved_seconds += max(0.0, saved_seconds)
+
+    def record_miss(self):
+        with self._lock:
+            self.misses += 1
+
+    def summary(self) -> Dict[str, Any]:
+        with self._lock:
+            resolved = self.hits + self.misses
+            return {
+                "turns": self.turns,
+                "attempts": self.attempts,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / resolved, 3) if resolved else 0.0,
+                "saved_seconds_total": round(self.saved_seconds, 3),
+                "saved_seconds_per_turn": round(self.saved_seconds / self.turns, 3) if self.turns else 0.0,
+            }
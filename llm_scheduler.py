@@ -0,0 +1,360 @@
+"""
+Admission control and fair scheduling for LLM calls.
+
+Every Groq call (call_llm_and_parse and the router's llm_with_tools.invoke)
+goes through llm_scheduler.admit(), which blocks until both token buckets
+(requests/min and tokens/min) have room. Waiting calls are served by
+priority first (interactive chat turns before background work such as
+prewarm.py), then round-robin across users (the graph's thread_id), so one
+busy thread or batch job can't starve the others.
+
+Limits start from LLM_RPM / LLM_TPM and are corrected from the provider's
+x-ratelimit-* response headers; a 429 with Retry-After pauses admission for
+everyone. With LLM_SCHEDULER_SHARED=1 the buckets live in the shared store,
+so all workers on the store draw from one budget.
+"""
+import os
+import re
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Deque, Dict, Iterator, Mapping, Optional
+
+from langchain_core.runnables.config import ensure_config
+
+from profiling import span
+
+INTERACTIVE = 0
+BACKGROUND = 1
+PRIORITY_NAMES = {INTERACTIVE: "interactive", BACKGROUND: "background"}
+
+LLM_RPM = float(os.getenv("LLM_RPM", "30"))
+LLM_TPM = float(os.getenv("LLM_TPM", "30000"))
+LLM_QUEUE_TIMEOUT = float(os.getenv("LLM_QUEUE_TIMEOUT", "300"))
+LLM_SCHEDULER_SHARED = os.getenv("LLM_SCHEDULER_SHARED", "0") == "1"
+
+# Caller overrides for code running outside a graph turn (e.g. prewarm.py)
+_caller: ContextVar[Optional[Dict[str, Any]]] = ContextVar("llm_caller", default=None)
+
+
+@contextmanager
+def llm_context(user: Optional[str] = None, priority: Optional[int] = None):
+    """
+    Set the user and/or priority for LLM calls made inside the block
+    (and in pool tasks submitted with a copied context).
+    """
+    current = dict(_caller.get() or {})
+    if user is not None:
+        current["user"] = str(user)
+    if priority is not None:
+        current["priority"] = priority
+    token = _caller.set(current)
+    try:
+        yield
+    finally:
+        _caller.reset(token)
+
+
+def current_caller() -> Dict[str, Any]:
+    """
+    (user, priority) of the running code: an explicit llm_context wins,
+    otherwise the thread_id of the current graph run, interactive.
+    """
+    caller = _caller.get() or {}
+    user = caller.get("user")
+    if user is None:
+        configurable = ensure_config().get("configurable") or {}
+        user = configurable.get("thread_id")
+    return {"user": str(user) if user is not None else "default",
+            "priority": caller.get("priority", INTERACTIVE)}
+
+
+def estimate_tokens(messages: Any, max_tokens: int) -> int:
+    """
+    Rough prompt size (4 chars/token) plus the output budget.
+    """
+    chars = 0
+    for message in messages or []:
+        content = message.get("content") if isinstance(message, dict) else getattr(message, "content", "")
+        chars += len(content or "")
+    return chars // 4 + max_tokens
+
+
+_DURATION_RE = re.compile(r"(\d+(?:\.\d+)?)(ms|h|m|s)")
+
+
+def parse_duration(value: Optional[str]) -> Optional[float]:
+    """
+    Seconds from a rate-limit reset header: "7.66s", "2m59.56s", "120ms" or "12".
+    """
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    units = {"ms": 0.001, "s": 1, "m": 60, "h": 3600}
+    parts = _DURATION_RE.findall(value)
+    return sum(float(n) * units[u] for n, u in parts) if parts else None
+
+
+class RateLimits:
+    """
+    Request and token buckets, refilled continuously at limit/60 per second.
+    Kept in process memory, or in the store (one lock per check) when shared.
+    """
+
+    KEY = "llm:buckets"
+
+    def __init__(self, rpm: float, tpm: float, store=None):
+        self.rpm = rpm
+        self.tpm = tpm
+        self.store = store
+        self._state = {"requests": rpm, "tokens": tpm, "ts": time.time(), "paused_until": 0.0}
+
+    @contextmanager
+    def _locked_state(self) -> Iterator[Dict[str, float]]:
+        if self.store is None:
+            yield self._state
+            return
+        with self.store.lock(self.KEY, ttl=5, wait=30, poll=0.01):
+            state = self.store.get(self.KEY) or dict(self._state)
+            yield state
+            self.store.set(self.KEY, state, ttl=3600)
+
+    def _refill(self, state: Dict[str, float], now: float) -> None:
+        elapsed = max(0.0, now - state["ts"])
+        state["requests"] = min(self.rpm, state["requests"] + elapsed * self.rpm / 60)
+        state["tokens"] = min(self.tpm, state["tokens"] + elapsed * self.tpm / 60)
+        state["ts"] = now
+
+    def try_take(self, tokens: int) -> float:
+        """
+        Take one request and `tokens` tokens if available and return 0,
+        else return the seconds to wait before trying again.
+        """
+        tokens = min(tokens, self.tpm)
+        now = time.time()
+        with self._locked_state() as state:
+            self._refill(state, now)
+            if state.get("paused_until", 0) > now:
+                return state["paused_until"] - now
+            if state["requests"] >= 1 and state["tokens"] >= tokens:
+                state["requests"] -= 1
+                state["tokens"] -= tokens
+                return 0.0
+            wait_requests = (1 - state["requests"]) * 60 / self.rpm if state["requests"] < 1 else 0.0
+            wait_tokens = (tokens - state["tokens"]) * 60 / self.tpm if state["tokens"] < tokens else 0.0
+            return max(wait_requests, wait_tokens, 0.01)
+
+    def settle(self, estimated: int, actual: int) -> None:
+        """
+        Refund (or charge) the difference between estimated and actual tokens.
+        """
+        with self._locked_state() as state:
+            state["tokens"] = min(self.tpm, state["tokens"] + estimated - actual)
+
+    def pause(self, seconds: float) -> None:
+        with self._locked_state() as state:
+            state["paused_until"] = max(state.get("paused_until", 0), time.time() + seconds)
+
+    def update_from_headers(self, headers: Mapping[str, str]) -> None:
+        """
+        Align with the provider's view (x-ratelimit-* headers). The token
+        limit is per minute; the request limit's window varies by provider
+        (Groq: per day), so requests only pause when none remain.
+        """
+        headers = headers or {}
+        limit_tokens = headers.get("x-ratelimit-limit-tokens")
+        if limit_tokens and "LLM_TPM" not in os.environ:
+            self.tpm = float(limit_tokens)
+        remaining_tokens = headers.get("x-ratelimit-remaining-tokens")
+        remaining_requests = headers.get("x-ratelimit-remaining-requests")
+        with self._locked_state() as state:
+            if remaining_tokens is not None:
+                state["tokens"] = min(state["tokens"], float(remaining_tokens))
+            if remaining_requests is not None and float(remaining_requests) < 1:
+                reset = parse_duration(headers.get("x-ratelimit-reset-requests")) or 60.0
+                state["paused_until"] = max(state.get("paused_until", 0), time.time() + reset)
+
+    def snapshot(self) -> Dict[str, float]:
+        with self._locked_state() as state:
+            self._refill(state, time.time())
+            return {"rpm": self.rpm, "tpm": self.tpm, "requests_available": round(state["requests"], 2),
+                    "tokens_available": int(state["tokens"]),
+                    "paused_for": round(max(0.0, state.get("paused_until", 0) - time.time()), 2)}
+
+
+class _Waiter:
+    __slots__ = ("user", "priority", "tokens", "enqueued")
+
+    def __init__(self, user: str, priority: int, tokens: int):
+        self.user = user
+        self.priority = priority
+        self.tokens = tokens
+        self.enqueued = time.perf_counter()
+
+
+class Admission:
+    """
+    Handle for an admitted call; report usage and headers once it returns.
+    """
+
+    def __init__(self, scheduler: "LLMScheduler", tokens: int):
+        self.scheduler = scheduler
+        self.tokens = tokens
+
+    def record(self, total_tokens: Optional[int] = None, headers: Optional[Mapping[str, str]] = None) -> None:
+        limits = self.scheduler.limits
+        if total_tokens is not None:
+            limits.settle(self.tokens, total_tokens)
+        if headers:
+            limits.update_from_headers(headers)
+
+    def failed(self, exc: Exception) -> None:
+        """
+        On a 429, pause admission for everyone for the provider's Retry-After.
+        """
+        response = getattr(exc, "response", None)
+        status = getattr(exc, "status_code", None) or getattr(response, "status_code", None)
+        if status != 429:
+            return
+        headers = getattr(response, "headers", None) or {}
+        self.scheduler.record_throttled()
+        self.scheduler.limits.pause(parse_duration(headers.get("retry-after")) or 10.0)
+
+
+class LLMScheduler:
+    """
+    Priority + per-user round-robin queue in front of RateLimits.
+    """
+
+    def __init__(self, limits: RateLimits, queue_timeout: float = LLM_QUEUE_TIMEOUT):
+        self.limits = limits
+        self.queue_timeout = queue_timeout
+        self._cond = threading.Condition()
+        # priority -> user -> waiters; user order is the round-robin order
+        self._queues: Dict[int, "OrderedDict[str, Deque[_Waiter]]"] = {}
+        self._admitted: Dict[int, int] = {}
+        self._waits: Dict[int, Deque[float]] = {}
+        # True while a waiter is calling limits.try_take() outside the condition
+        self._taking = False
+        self._throttled = 0
+        self._timeouts = 0
+
+    def _head(self) -> Optional[_Waiter]:
+        for priority in sorted(self._queues):
+            users = self._queues[priority]
+            if users:
+                return next(iter(users.values()))[0]
+        return None
+
+    def _dequeue(self, waiter: _Waiter, served: bool) -> None:
+        users = self._queues.get(waiter.priority) or {}
+        waiters = users.get(waiter.user)
+        if waiters is not None and waiter in waiters:
+            waiters.remove(waiter)
+            if not waiters:
+                del users[waiter.user]
+            elif served:
+                # Round robin: this user goes behind the others at its priority
+                users.move_to_end(waiter.user)
+        self._cond.notify_all()
+
+    def _wait_turn(self, waiter: _Waiter, deadline: float) -> None:
+        """
+        Wait (holding self._cond) until waiter is at the head and nobody else
+        is taking from the buckets, then claim the right to take.
+        """
+        while True:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                self._timeouts += 1
+                raise TimeoutError(f"LLM call for {waiter.user!r} waited over {self.queue_timeout:.0f}s")
+            if self._head() is waiter and not self._taking:
+                self._taking = True
+                return
+            self._cond.wait(min(1.0, remaining))
+
+    @contextmanager
+    def admit(self, tokens: int, user: Optional[str] = None, priority: Optional[int] = None):
+        """
+        Block until the call may be sent, then yield an Admission.
+        Raises TimeoutError after queue_timeout seconds in the queue.
+        """
+        caller = current_caller()
+        waiter = _Waiter(user or caller["user"], caller["priority"] if priority is None else priority, tokens)
+        deadline = time.perf_counter() + self.queue_timeout
+        with span("llm.queue"):
+            with self._cond:
+                self._queues.setdefault(waiter.priority, OrderedDict()).setdefault(waiter.user, deque()).append(waiter)
+            try:
+                while True:
+                    with self._cond:
+                        self._wait_turn(waiter, deadline)
+                    # Outside the condition: in shared mode this takes a store
+                    # lock and writes, which must not block the other waiters
+                    try:
+                        delay = self.limits.try_take(tokens)
+                    finally:
+                        with self._cond:
+                            self._taking = False
+                            self._cond.notify_all()
+                    if delay == 0:
+                        break
+                    with self._cond:
+                        self._cond.wait(min(delay, max(0.0, deadline - time.perf_counter())))
+            except BaseException:
+                # Store errors and timeouts must not leave a dead waiter at the head
+                with self._cond:
+                    self._dequeue(waiter, served=False)
+                raise
+            with self._cond:
+                self._dequeue(waiter, served=True)
+                waited = time.perf_counter() - waiter.enqueued
+                self._admitted[waiter.priority] = self._admitted.get(waiter.priority, 0) + 1
+                self._waits.setdefault(waiter.priority, deque(maxlen=500)).append(waited)
+        if waited > 1:
+            print(f"[llm_scheduler] {PRIORITY_NAMES.get(waiter.priority)} call for {waiter.user} "
+                  f"waited {waited:.1f}s")
+        admission = Admission(self, tokens)
+        try:
+            yield admission
+        except Exception as e:
+            admission.failed(e)
+            raise
+
+    def record_throttled(self) -> None:
+        with self._cond:
+            self._throttled += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            per_priority = {}
+            for priority, name in PRIORITY_NAMES.items():
+                users = self._queues.get(priority) or {}
+                waits = sorted(self._waits.get(priority) or [])
+                per_priority[name] = {
+                    "queue_depth": sum(len(w) for w in users.values()),
+                    "waiting_users": len(users),
+                    "admitted": self._admitted.get(priority, 0),
+                    "wait_avg_s": round(sum(waits) / len(waits), 3) if waits else 0.0,
+                    "wait_p95_s": round(waits[int(0.95 * (len(waits) - 1))], 3) if waits else 0.0,
+                }
+            throttled, timeouts = self._throttled, self._timeouts
+        return {"priorities": per_priority, "throttled": throttled, "queue_timeouts": timeouts,
+                "limits": self.limits.snapshot()}
+
+
+def _build_scheduler() -> LLMScheduler:
+    store = None
+    if LLM_SCHEDULER_SHARED:
+        from storage import get_store
+        store = get_store()
+    return LLMScheduler(RateLimits(LLM_RPM, LLM_TPM, store=store))
+
+
+llm_scheduler = _build_scheduler()
@@ -1,70 +1,259 @@
+import threading
 import time
-from typing import Type, Union, Dict, Any
+from collections import Counter, deque
+from typing import Type, Union, Dict, Any, List, Optional, Tuple
 from pydantic import BaseModel
 import dirtyjson
 import re
+from llm_scheduler import llm_scheduler, estimate_tokens
+from profiling import span
 # Make sure you install dirtyjson: pip install dirtyjson
 
 # === Optionally, import your Groq client from where you configure it ===
 
-# === Helper function ===
+LLM_MODEL = "llama3-8b-8192"
+
+# Output budget per schema: starts at DEFAULT_MAX_TOKENS, then follows the
+# largest recent completion for that schema (plus headroom), within bounds.
+DEFAULT_MAX_TOKENS = 800
+MIN_MAX_TOKENS = 256
+MAX_MAX_TOKENS = 4096
+MAX_TOKENS_HEADROOM = 1.3
+MAX_TOKENS_WINDOW = 20
+
+# How many times a truncated answer may be continued before re-querying
+MAX_CONTINUATIONS = 2
+
+CONTINUE_PROMPT = (
+    "Your previous answer was cut off. Continue it exactly from the last character, "
+    "without repeating anything and without any extra text, so that the two parts "
+    "joined together form the complete JSON."
+)
+
+
+class RetryStats:
+    """
+    Thread-safe counters for call_llm_and_parse recovery, by cause.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.failures = 0
+        self.causes: Counter = Counter()
+        self.continuations = 0
+        self.local_repairs = 0
+        self.requeries = 0
+        self.completion_tokens = 0
+        # Completion tokens kept by continuing instead of regenerating from scratch
+        self.tokens_saved = 0
+        self.seconds_saved = 0.0
+
+    def record_call(self, ok: bool):
+        with self._lock:
+            self.calls += 1
+            if not ok:
+                self.failures += 1
+
+    def record_cause(self, cause: str):
+        with self._lock:
+            self.causes[cause] += 1
+
+    def record_completion(self, tokens: int):
+        with self._lock:
+            self.completion_tokens += tokens
+
+    def record_continuation(self, tokens_kept: int, seconds_kept: float):
+        with self._lock:
+            self.continuations += 1
+            self.tokens_saved += tokens_kept
+            self.seconds_saved += seconds_kept
+
+    def record_local_repair(self, seconds_saved: float):
+        with self._lock:
+            self.local_repairs += 1
+            self.seconds_saved += seconds_saved
+
+    def record_requery(self):
+        with self._lock:
+            self.requeries += 1
+
+    def summary(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "calls": self.calls,
+                "failures": self.failures,
+                "retries_by_cause": dict(self.causes),
+                "continuations": self.continuations,
+                "local_repairs": self.local_repairs,
+                "requeries": self.requeries,
+                "completion_tokens": self.completion_tokens,
+                "tokens_saved": self.tokens_saved,
+                "seconds_saved": round(self.seconds_saved, 3),
+            }
+
+
+retry_stats = RetryStats()
+
+_completion_sizes: Dict[str, deque] = {}
+_completion_sizes_lock = threading.Lock()
+
+
+def max_tokens_for(model: Type[BaseModel]) -> int:
+    """
+    Output token budget for a schema, sized from its recent completions.
+    """
+    with _completion_sizes_lock:
+        sizes = _completion_sizes.get(model.__name__)
+        if not sizes:
+            return DEFAULT_MAX_TOKENS
+        budget = int(max(sizes) * MAX_TOKENS_HEADROOM)
+    return max(MIN_MAX_TOKENS, min(MAX_MAX_TOKENS, budget))
+
+
+def record_completion_size(model: Type[BaseModel], tokens: int) -> None:
+    with _completion_sizes_lock:
+        sizes = _completion_sizes.setdefault(model.__name__, deque(maxlen=MAX_TOKENS_WINDOW))
+        sizes.append(tokens)
+
+
+def _create(groq_client, messages: List[Dict[str, str]], max_tokens: int) -> Tuple[str, str, int]:
+    """
+    One chat completion. Returns (text, finish_reason, completion_tokens).
+    """
+    with llm_scheduler.admit(estimate_tokens(messages, max_tokens)) as admission, span("llm.completion"):
+        raw = groq_client.chat.completions.with_raw_response.create(
+            model=LLM_MODEL,
+            messages=messages,
+            temperature=0.3,
+            max_tokens=max_tokens
+        )
+        completion = raw.parse()
+    choice = completion.choices[0]
+    text = choice.message.content or ""
+    usage = getattr(completion, "usage", None)
+    tokens = getattr(usage, "completion_tokens", None) or len(text) // 4
+    admission.record(getattr(usage, "total_tokens", None), raw.headers)
+    return text, getattr(choice, "finish_reason", None) or "stop", tokens
+
+
+def _stitch(partial: str, continuation: str) -> str:
+    """
+    Join a truncated answer with its continuation. If the model restarted the
+    JSON from the top instead of continuing, keep the restart.
+    """
+    restart = re.sub(r"^\s*```(?:json)?\s*", "", continuation)
+    signature = re.sub(r"\s+", "", partial)[:20]
+    if signature and re.sub(r"\s+", "", restart).startswith(signature):
+        return restart
+    return partial + continuation
+
+
+def _parse(text: str, model: Type[BaseModel], repair: bool) -> BaseModel:
+    json_str = repair_truncated_json(text) if repair else extract_and_repair_json(text)
+    return model.model_validate(dirtyjson.loads(json_str))
+
 
 def call_llm_and_parse(
     groq_client,
-    prompt: str,
+    prompt: Union[str, List[Dict[str, str]]],
     model: Type[BaseModel],
     max_retries: int = 3,
-    delay: float = 1.0
+    delay: float = 1.0,
+    max_tokens: Optional[int] = None,
 ) -> Union[BaseModel, Dict[str, Any]]:
     """
     Call LLM with a prompt, parse the JSON response, and validate it using a Pydantic model.
-    
+
+    Recovery is cheapest-first: an answer cut off by max_tokens
+    (finish_reason == "length") is continued and stitched rather than
+    regenerated; an answer that fails to parse is repaired locally before the
+    prompt is sent again. Only API errors sleep before retrying.
+
     Args:
-        prompt (str): The prompt to send to the LLM.
+        prompt (str | list): The prompt to send to the LLM, or a full list of chat
+            messages (e.g. from a PromptTemplate, to keep a cacheable prefix).
         model (Type[BaseModel]): The Pydantic model to validate against.
-        max_retries (int, optional): Number of retries on failure. Default is 3.
-        delay (float, optional): Delay (in seconds) between retries, multiplied by attempt count.
-    
+        max_retries (int, optional): Number of full requests before giving up. Default is 3.
+        delay (float, optional): Delay (in seconds) after an API error, multiplied by attempt count.
+        max_tokens (int, optional): Output budget; sized per schema from past completions if omitted.
+
     Returns:
         BaseModel: Validated Pydantic model instance if successful.
         dict: Contains 'error' and 'raw' fields if validation fails after retries.
     """
+    messages = [{"role": "user", "content": prompt}] if isinstance(prompt, str) else prompt
+    budget = max_tokens or max_tokens_for(model)
+    response_text = ""
+    error: Optional[Exception] = None
+
     for attempt in range(1, max_retries + 1):
+        if attempt > 1:
+            retry_stats.record_requery()
         try:
-            print(f"[call_llm_and_parse] Attempt {attempt}: sending prompt to LLM...")
-
-            completion = groq_client.chat.completions.create(
-                model="llama3-8b-8192",
-                messages=[{"role": "user", "content": prompt}],
-                temperature=0.3,
-                max_tokens=800
-            )
-
-            response_text = completion.choices[0].message.content
+            print(f"[call_llm_and_parse] Attempt {attempt}: sending prompt to LLM (max_tokens={budget})...")
+            start = time.perf_counter()
+            response_text, finish_reason, tokens = _create(groq_client, messages, budget)
+            total_tokens = tokens
+            retry_stats.record_completion(tokens)
             print(f"[call_llm_and_parse] Raw LLM response: {response_text[:200]}...")  # first 200 chars
 
-            # Extract JSON (handle dirty or partial JSON)
-            json_str = extract_and_repair_json(response_text)
-
-            # Parse JSON using dirtyjson
-            parsed = dirtyjson.loads(json_str)
-
-            # Validate with Pydantic
-            validated = model.model_validate(parsed)
+            continuations = 0
+            while finish_reason == "length" and continuations < MAX_CONTINUATIONS:
+                continuations += 1
+                retry_stats.record_cause("truncated")
+                kept_seconds = time.perf_counter() - start
+                print(f"[call_llm_and_parse] Truncated after {total_tokens} tokens, continuing ({continuations})...")
+                continuation, finish_reason, tokens = _create(groq_client, messages + [
+                    {"role": "assistant", "content": response_text},
+                    {"role": "user", "content": CONTINUE_PROMPT},
+                ], budget)
+                retry_stats.record_completion(tokens)
+                retry_stats.record_continuation(total_tokens, kept_seconds)
+                response_text = _stitch(response_text, continuation)
+                total_tokens += tokens
+            record_completion_size(model, total_tokens)
+            if finish_reason == "length":
+                budget = min(MAX_MAX_TOKENS, budget * 2)
+        except Exception as e:
+            error = e
+            retry_stats.record_cause("api_error")
+            print(f"[Retry {attempt}] API error: {e}")
+            if attempt < max_retries:
+                time.sleep(delay * attempt)
+            continue
 
+        try:
+            validated = _parse(response_text, model, repair=False)
             print("[call_llm_and_parse] Successfully parsed and validated.")
+            retry_stats.record_call(ok=True)
             return validated
+        except Exception as e:
+            error = e
 
+        try:
+            validated = _parse(response_text, model, repair=True)
+            retry_stats.record_cause("parse_error")
+            retry_stats.record_local_repair(time.perf_counter() - start)
+            print("[call_llm_and_parse] Parsed and validated after local repair.")
+            retry_stats.record_call(ok=True)
+            return validated
         except Exception as e:
-            print(f"[Retry {attempt}] Error: {e}")
-            if attempt < max_retries:
-                time.sleep(delay * attempt)
-            else:
-                print("[call_llm_and_parse] Failed after retries.")
-                return {
-                    "error": f"Validation failed after {max_retries} retries: {e}",
-                    "raw": json_str if 'json_str' in locals() else response_text
-                }
+            error = e
+            cause = "validation_error" if hasattr(e, "errors") else "parse_error"
+            retry_stats.record_cause(cause)
+            print(f"[Retry {attempt}] {cause}: {e}")
+
+    print("[call_llm_and_parse] Failed after retries.")
+    retry_stats.record_call(ok=False)
+    try:
+        raw = repair_truncated_json(response_text)
+    except ValueError:
+        raw = response_text
+    return {
+        "error": f"Validation failed after {max_retries} retries: {error}",
+        "raw": raw
+    }
 
 
 def extract_and_repair_json(text: str) -> str:
@@ -80,4 +269,75 @@ def extract_and_repair_json(text: str) -> str:
     close_braces = json_str.count('}')
     if open_braces > close_braces:
         json_str += '}' * (open_braces - close_braces)
-    return json_str
\ No newline at end of file
+    return json_str
+
+
+def repair_truncated_json(text: str) -> str:
+    """
+    Close a JSON object that was cut off mid-way: drops text after the last
+    complete value, terminates an open string and closes brackets in order.
+    """
+    start = text.find("{")
+    if start < 0:
+        raise ValueError("No JSON object found.")
+    text = re.sub(r"\s*```\s*$", "", text[start:])
+
+    stack: List[str] = []
+    in_string = escaped = False
+    # Start of the escape sequence being read, and \uXXXX digits still to come
+    escape_at, hex_left = 0, 0
+    # Position right after the last complete value/container, and the stack there
+    last_good, last_stack = 0, []
+    for i, ch in enumerate(text):
+        if in_string:
+            if hex_left:
+                hex_left -= 1
+            elif escaped:
+                escaped = False
+                if ch == "u":
+                    hex_left = 4
+            elif ch == "\\":
+                escaped, escape_at = True, i
+            elif ch == '"':
+                in_string = False
+                last_good, last_stack = i + 1, list(stack)
+            continue
+        if ch == '"':
+            in_string = True
+        elif ch in "{[":
+            stack.append("}" if ch == "{" else "]")
+            last_good, last_stack = i + 1, list(stack)
+        elif ch in "}]":
+            if stack:
+                stack.pop()
+            last_good, last_stack = i + 1, list(stack)
+            if not stack:
+                return text[:i + 1]
+        elif ch.isalnum() or ch in ".-+":
+            last_good, last_stack = i + 1, list(stack)
+
+    if in_string:
+        # Keep a partial string value; a partial key is dropped below. A cut
+        # escape ("\\" or "\\u00") would otherwise escape the closing quote.
+        body = text[:escape_at] if escaped or hex_left else text
+        head, stack_now = body + '"', stack
+    else:
+        head, stack_now = text[:last_good], last_stack
+
+    head = head.rstrip()
+    # A literal cut off mid-word (e.g. "tr" of true)
+    word = re.search(r"[A-Za-z]+$", head)
+    if word and not in_string and word.group() not in ("true", "false", "null") \
+            and not re.search(r"[0-9.][eE]$", head):
+        head = head[:word.start()].rstrip()
+    # A number cut off mid-way ("-", "1.", "2e-")
+    number = re.search(r"[-+0-9.eE]+$", head)
+    if number and not in_string and not head[:number.start()][-1:].isalnum():
+        valid = re.match(r"-?\d+(?:\.\d+)?(?:[eE][-+]?\d+)?", number.group())
+        head = (head[:number.start()] + (valid.group() if valid else "")).rstrip()
+    in_object = bool(stack_now) and stack_now[-1] == "}"
+    # A key whose value never arrived, then any trailing comma
+    if re.search(r':\s*$', head) or (in_object and re.search(r'[{,]\s*"(?:[^"\\]|\\.)*"$', head)):
+        head = re.sub(r'"(?:[^"\\]|\\.)*"\s*:?\s*$', "", head).rstrip()
+    head = re.sub(r",\s*$", "", head)
+    return head + "".join(reversed(stack_now))
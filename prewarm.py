@@ -0,0 +1,266 @@
+"""
+Scheduled pre-warming of analyses for tracked profiles.
+
+Walks every thread in the store's profile-URL index and, during off-peak
+hours and within a global LLM call budget:
+
+- re-scrapes profiles whose last scrape is older than PREWARM_SCRAPE_TTL
+  (in bulk, through shared actor runs) and writes changed profiles back to
+  the thread's checkpoint;
+- precomputes the profile analysis and job fit for PREWARM_ROLES plus the
+  roles the thread has asked about, into the thread's UserMemory, under the
+  same keys profile_analyzer / job_matcher look up.
+
+The first "analyze my profile" or "how do I fit for X" of the day then is a
+memory lookup. Only one scheduler pass runs at a time across all workers
+sharing the store.
+
+Usage:
+    python prewarm.py            # run forever, one pass every PREWARM_INTERVAL
+    python prewarm.py --once     # one pass now, if inside off-peak hours
+    python prewarm.py --once --force
+"""
+import argparse
+import os
+import threading
+import time
+from collections import deque
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+from agent import (
+    USER_MEMORY_MAX_ENTRIES,
+    compile_graph,
+    analysis_memory_key,
+    job_fit_memory_key,
+    run_profile_analysis,
+    run_job_fit,
+)
+from chatbot_model import UserMemory
+from checkpoint_serde import gc_blobs
+from intent import normalize_role
+from llm_scheduler import BACKGROUND, llm_context
+from profile_preprocessing import initialize_state, profile_version
+from scraping_profile import scrape_linkedin_profiles
+from storage import get_store
+
+PREWARM_ROLES = [r.strip() for r in os.getenv("PREWARM_ROLES", "").split(",") if r.strip()]
+# Local hours, "start-end"; may wrap around midnight (e.g. "22-6")
+PREWARM_HOURS = os.getenv("PREWARM_HOURS", "1-6")
+PREWARM_INTERVAL = float(os.getenv("PREWARM_INTERVAL", str(15 * 60)))
+PREWARM_SCRAPE_TTL = float(os.getenv("PREWARM_SCRAPE_TTL", str(24 * 3600)))
+# Only threads used within this many days are kept warm
+PREWARM_ACTIVE_DAYS = float(os.getenv("PREWARM_ACTIVE_DAYS", "7"))
+PREWARM_LLM_CALLS_PER_MINUTE = int(os.getenv("PREWARM_LLM_CALLS_PER_MINUTE", "10"))
+PREWARM_MAX_LLM_CALLS = int(os.getenv("PREWARM_MAX_LLM_CALLS", "200"))
+PREWARM_MAX_SCRAPES = int(os.getenv("PREWARM_MAX_SCRAPES", "100"))
+# Roles kept per thread beyond PREWARM_ROLES
+PREWARM_ROLES_PER_THREAD = 5
+
+PASS_LOCK_TTL = 6 * 3600
+TURN_LOCK_TTL = 300
+
+
+def in_off_peak(now: Optional[datetime] = None, hours: str = PREWARM_HOURS) -> bool:
+    start, end = (int(h) for h in hours.split("-"))
+    hour = (now or datetime.now()).hour
+    if start <= end:
+        return start <= hour < end
+    return hour >= start or hour < end
+
+
+class RateBudget:
+    """
+    At most per_minute calls in any 60s window, and max_calls in total.
+    acquire() sleeps until a call is allowed; returns False once exhausted.
+    """
+
+    def __init__(self, per_minute: int, max_calls: int):
+        self.per_minute = per_minute
+        self.max_calls = max_calls
+        self.used = 0
+        self._calls: deque = deque()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> bool:
+        while True:
+            with self._lock:
+                if self.used >= self.max_calls:
+                    return False
+                now = time.monotonic()
+                while self._calls and now - self._calls[0] >= 60:
+                    self._calls.popleft()
+                if len(self._calls) < self.per_minute:
+                    self._calls.append(now)
+                    self.used += 1
+                    return True
+                wait = 60 - (now - self._calls[0])
+            time.sleep(wait)
+
+
+def _checkpoint_age(checkpoint: Dict[str, Any]) -> float:
+    try:
+        ts = datetime.fromisoformat(checkpoint["ts"])
+    except (KeyError, TypeError, ValueError):
+        return 0.0
+    return (datetime.now(timezone.utc) - ts).total_seconds()
+
+
+def tracked_threads(store, active_days: float = PREWARM_ACTIVE_DAYS) -> List[Dict[str, Any]]:
+    """
+    Indexed threads with a checkpoint used within active_days.
+    """
+    checkpointer = store.checkpointer()
+    threads = []
+    for url, thread_id in store.list_threads().items():
+        checkpoint = checkpointer.get({"configurable": {"thread_id": str(thread_id), "checkpoint_ns": ""}})
+        if not checkpoint or "channel_values" not in checkpoint:
+            continue
+        if _checkpoint_age(checkpoint) > active_days * 86400:
+            continue
+        values = checkpoint["channel_values"]
+        if not values.get("profile"):
+            continue
+        threads.append({
+            "thread_id": str(thread_id),
+            "url": url,
+            "profile": values["profile"],
+            "target_role": values.get("target_role"),
+        })
+    return threads
+
+
+def refresh_scrapes(store, graph, threads: List[Dict[str, Any]], max_scrapes: int = PREWARM_MAX_SCRAPES) -> int:
+    """
+    Re-scrape stale profiles in bulk and write changed ones to their threads.
+    Updates the "profile" of the given thread dicts in place.
+    """
+    now = time.time()
+    stale = [t for t in threads if now - (store.scraped_at(t["thread_id"]) or 0) > PREWARM_SCRAPE_TTL]
+    stale = stale[:max_scrapes]
+    if not stale:
+        return 0
+
+    print(f"[prewarm] re-scraping {len(stale)} profiles")
+    scraped = scrape_linkedin_profiles([t["url"] for t in stale])
+    updated = 0
+    for t in stale:
+        raw = scraped.get(t["url"])
+        if not raw:
+            continue
+        fresh = initialize_state(raw)
+        store.mark_scraped(t["thread_id"], now)
+        if profile_version(fresh["profile"]) == profile_version(t["profile"]):
+            continue
+        config = {"configurable": {"thread_id": t["thread_id"]}}
+        # Same lock as a chat turn on this thread, so the update can't interleave with one
+        with store.lock(f"turn:{t['thread_id']}", ttl=TURN_LOCK_TTL, wait=TURN_LOCK_TTL):
+            graph.update_state(config, {"profile": fresh["profile"], "sections": fresh["sections"]},
+                               as_node="chatbot")
+        t["profile"] = fresh["profile"]
+        updated += 1
+    print(f"[prewarm] {updated} profiles changed since their last scrape")
+    return updated
+
+
+def prewarm_thread(store, thread: Dict[str, Any], budget: RateBudget, roles: List[str]) -> int:
+    """
+    Fill the thread's memory with analysis and job fit results it doesn't have yet.
+    Returns the number of LLM-backed results computed.
+    """
+    thread_id = thread["thread_id"]
+    # save() reloads and merges under the memory lock, so entries a chat turn
+    # writes while an LLM call runs here are kept
+    memory = UserMemory(thread_id, store=store, max_entries=USER_MEMORY_MAX_ENTRIES)
+    profile = thread["profile"]
+    computed = 0
+
+    key = analysis_memory_key(profile)
+    if memory.get(key) is None:
+        if not budget.acquire():
+            return computed
+        try:
+            memory.save(key, run_profile_analysis(profile))
+            computed += 1
+        except Exception as e:
+            print(f"[prewarm] analysis failed for thread {thread_id}: {e}")
+
+    wanted = list(roles) + list(memory.target_roles)[-PREWARM_ROLES_PER_THREAD:]
+    if thread.get("target_role"):
+        wanted.append(thread["target_role"])
+    # One run per normalized role, passed to the LLM in the user's wording:
+    # job_matcher serves the result verbatim on a warm hit
+    by_role: Dict[str, str] = {}
+    for role in wanted:
+        if normalize_role(role):
+            by_role.setdefault(normalize_role(role), role.strip())
+    for role in by_role.values():
+        key = job_fit_memory_key(profile, role)
+        if memory.get(key) is not None:
+            continue
+        if not budget.acquire():
+            return computed
+        try:
+            memory.save(key, run_job_fit(profile, role))
+            computed += 1
+        except Exception as e:
+            print(f"[prewarm] job fit for {role!r} failed for thread {thread_id}: {e}")
+    return computed
+
+
+def run_pass(store=None, graph=None, roles: Optional[List[str]] = None, budget: Optional[RateBudget] = None) -> Dict[str, int]:
+    """
+    One pre-warming pass over every tracked thread.
+    """
+    store = store or get_store()
+    graph = graph or compile_graph(store.checkpointer())
+    roles = PREWARM_ROLES if roles is None else roles
+    budget = budget or RateBudget(PREWARM_LLM_CALLS_PER_MINUTE, PREWARM_MAX_LLM_CALLS)
+
+    started = time.time()
+    with store.lock("prewarm", ttl=PASS_LOCK_TTL, wait=0):
+        threads = tracked_threads(store)
+        refreshed = refresh_scrapes(store, graph, threads)
+        computed = 0
+        for thread in threads:
+            # Behind every interactive chat turn in llm_scheduler
+            with llm_context(user=thread["thread_id"], priority=BACKGROUND):
+                computed += prewarm_thread(store, thread, budget, roles)
+            if budget.used >= budget.max_calls:
+                print("[prewarm] LLM call budget exhausted for this pass")
+                break
+        # Deleted threads leave their checkpoint blobs behind
+        blobs_deleted = gc_blobs(store) or 0
+    stats = {"threads": len(threads), "refreshed": refreshed, "computed": computed,
+             "blobs_deleted": blobs_deleted, "seconds": int(time.time() - started)}
+    print(f"[prewarm] pass done: {stats}")
+    return stats
+
+
+def run_forever(interval: float = PREWARM_INTERVAL) -> None:
+    store = get_store()
+    graph = compile_graph(store.checkpointer())
+    while True:
+        if in_off_peak():
+            try:
+                run_pass(store, graph)
+            except TimeoutError:
+                print("[prewarm] another worker is running a pass, skipping")
+            except Exception as e:
+                print(f"[prewarm] pass failed: {e}")
+        time.sleep(interval)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Pre-warm scrapes and analyses for tracked profiles.")
+    parser.add_argument("--once", action="store_true", help="Run a single pass and exit")
+    parser.add_argument("--force", action="store_true", help="Ignore off-peak hours")
+    args = parser.parse_args()
+
+    if args.once:
+        if args.force or in_off_peak():
+            run_pass()
+        else:
+            print(f"[prewarm] outside off-peak hours ({PREWARM_HOURS}); use --force to run anyway")
+    else:
+        run_forever()
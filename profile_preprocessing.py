@@ -1,9 +1,25 @@
+import hashlib
+import json
+import re
 from typing import List, Dict, Any
 from urllib.parse import urlparse
 # ========== 3. PROFILE PREPROCESSING HELPERS ==========
+# What the scraper accepts: a single public profile
+LINKEDIN_PROFILE_RE = re.compile(r"^https://www\.linkedin\.com/in/[^/]+/?$")
+
 def normalize_url(url):
     return url.strip().rstrip('/')
 
+def is_profile_url(url: str) -> bool:
+    return bool(LINKEDIN_PROFILE_RE.match((url or "").strip()))
+
+def profile_version(profile: Dict[str, Any]) -> str:
+    """
+    Short stable hash of a (preprocessed) profile, used to key cached results.
+    """
+    payload = json.dumps(profile, sort_keys=True, default=str)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()[:16]
+
 def summarize_skills(skills: List[Dict]) -> str:
     return ', '.join([s.get('title', '') for s in skills if s.get('title')])
 
@@ -11,12 +27,12 @@ def summarize_projects(projects: List[Dict]) -> str:
     summaries = []
     for p in projects:
         title = p.get('title', '')
-        desc = ''
-        if p.get('subComponents'):
-            for comp in p['subComponents']:
-                for d in comp.get('description', []):
-                    if d.get('type') == 'textComponent':
-                        desc += d.get('text', '') + ' '
+        desc = ' '.join(
+            d.get('text', '')
+            for comp in (p.get('subComponents') or [])
+            for d in comp.get('description', [])
+            if d.get('type') == 'textComponent'
+        )
         summaries.append(f"{title}: {desc.strip()}")
     return '\n'.join(summaries)
 
@@ -0,0 +1,312 @@
+"""
+Opt-in, low-overhead profiling of app reruns and graph invocations.
+
+Enabled with APP_PROFILE=1 (every run) or the ?profile=1 query parameter
+(one browser session). A profiled run records:
+
+- timing spans (imports, state validation, transcript rendering, graph
+  stream, checkpoint writes, LLM calls) for the in-app waterfall panel;
+- wall-clock stack samples of the threads working for this run, written as
+  folded stacks (one "frame;frame;frame count" line per stack) to
+  PROFILE_DIR, ready for flamegraph.pl / speedscope / inferno.
+
+Only the thread that called begin_run() is sampled throughout, plus worker
+threads while they are inside a span() of this run (they inherit the run
+through the context). On a server with many concurrent sessions, other
+sessions' threads therefore stay out of this run's stacks.
+
+When profiling is off, span() costs one ContextVar lookup.
+"""
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional
+
+PROFILE_ENV = "APP_PROFILE"
+PROFILE_DIR = os.getenv("APP_PROFILE_DIR", "profiles")
+# Sampling period in seconds; 10ms keeps the sampler well under 1% of a core
+SAMPLE_INTERVAL = float(os.getenv("APP_PROFILE_INTERVAL", "0.01"))
+# A run that is never ended (e.g. the script stopped early) stops sampling after this
+MAX_RUN_SECONDS = 300.0
+
+PROJECT_ROOT = os.path.dirname(os.path.abspath(__file__))
+
+_current_run: ContextVar[Optional["ProfiledRun"]] = ContextVar("profiled_run", default=None)
+
+
+def profiling_enabled(query_params: Optional[Dict[str, Any]] = None) -> bool:
+    """
+    True if APP_PROFILE is set, or the request carries profile=1.
+    """
+    if os.getenv(PROFILE_ENV, "").lower() in ("1", "true", "yes"):
+        return True
+    value = (query_params or {}).get("profile")
+    if isinstance(value, list):
+        value = value[0] if value else None
+    return str(value).lower() in ("1", "true", "yes")
+
+
+class SamplingProfiler:
+    """
+    Samples the stacks of the given threads every `interval` seconds from a
+    background thread, and counts identical stacks.
+
+    threads: live mapping whose keys are the idents to sample; None samples
+    every thread running project code.
+    """
+
+    def __init__(self, interval: float = SAMPLE_INTERVAL, max_seconds: float = MAX_RUN_SECONDS,
+                 threads: Optional[Dict[int, int]] = None):
+        self.interval = interval
+        self.max_seconds = max_seconds
+        self.threads = threads
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        # Time the sampler itself spent walking stacks (holding the GIL)
+        self.busy_seconds = 0.0
+        self.started_at = 0.0
+        self.stopped_at = 0.0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._frame_names: Dict[Any, str] = {}
+        self._thread_names: Dict[int, str] = {}
+
+    def start(self) -> None:
+        self.started_at = time.perf_counter()
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join()
+        self.stopped_at = self.stopped_at or time.perf_counter()
+
+    @property
+    def overhead(self) -> float:
+        """
+        Fraction of the run's wall time the sampler spent sampling.
+        """
+        elapsed = (self.stopped_at or time.perf_counter()) - self.started_at
+        return self.busy_seconds / elapsed if elapsed > 0 else 0.0
+
+    def _frame_name(self, code) -> str:
+        name = self._frame_names.get(code)
+        if name is None:
+            name = f"{os.path.basename(code.co_filename)}:{code.co_name}"
+            self._frame_names[code] = name
+        return name
+
+    def _thread_name(self, ident: int) -> str:
+        name = self._thread_names.get(ident)
+        if name is None:
+            self._thread_names = {t.ident: t.name for t in threading.enumerate()}
+            name = self._thread_names.get(ident, str(ident))
+        return name
+
+    def _sample(self, own_ident: int) -> None:
+        wanted = set(self.threads) if self.threads is not None else None
+        for ident, frame in sys._current_frames().items():
+            if ident == own_ident or (wanted is not None and ident not in wanted):
+                continue
+            codes = []
+            in_project = False
+            while frame is not None:
+                code = frame.f_code
+                codes.append(code)
+                if not in_project and code.co_filename.startswith(PROJECT_ROOT):
+                    in_project = True
+                frame = frame.f_back
+            # Idle pool workers and the server's own threads are not interesting
+            if not in_project:
+                continue
+            names = [self._thread_name(ident)]
+            names.extend(self._frame_name(code) for code in reversed(codes))
+            self.stacks[";".join(names)] += 1
+        self.samples += 1
+
+    def _run(self) -> None:
+        own_ident = threading.get_ident()
+        deadline = self.started_at + self.max_seconds
+        while not self._stop.wait(self.interval):
+            start = time.perf_counter()
+            if start > deadline:
+                break
+            self._sample(own_ident)
+            self.busy_seconds += time.perf_counter() - start
+        self.stopped_at = time.perf_counter()
+
+    def folded(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+
+class ProfiledRun:
+    """
+    One profiled rerun: timing spans plus a sampling profiler.
+    """
+
+    def __init__(self, label: str, interval: float = SAMPLE_INTERVAL):
+        self.label = label
+        self.started_at = time.perf_counter()
+        self.wall_start = time.time()
+        self.spans: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+        # Thread ident -> nesting depth of this run's spans on it
+        self.threads: Dict[int, int] = {}
+        self.profiler = SamplingProfiler(interval, threads=self.threads)
+        self.duration = 0.0
+        self.path: Optional[str] = None
+
+    def enter_thread(self) -> None:
+        ident = threading.get_ident()
+        with self._lock:
+            self.threads[ident] = self.threads.get(ident, 0) + 1
+
+    def exit_thread(self) -> None:
+        ident = threading.get_ident()
+        with self._lock:
+            depth = self.threads.get(ident, 0) - 1
+            if depth > 0:
+                self.threads[ident] = depth
+            else:
+                # Pool threads are reused by other sessions once this work is done
+                self.threads.pop(ident, None)
+
+    def add_span(self, name: str, start: float, end: float) -> None:
+        with self._lock:
+            self.spans.append({
+                "name": name,
+                "start": start - self.started_at,
+                "end": end - self.started_at,
+                "thread": threading.current_thread().name,
+            })
+
+    def write_folded(self, directory: Optional[str] = None) -> Optional[str]:
+        if not self.profiler.stacks:
+            return None
+        directory = directory or PROFILE_DIR
+        os.makedirs(directory, exist_ok=True)
+        stamp = time.strftime("%Y%m%d-%H%M%S", time.localtime(self.wall_start))
+        path = os.path.join(directory, f"{self.label}-{stamp}-{int(self.wall_start * 1000) % 1000:03d}.folded")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(self.profiler.folded())
+        return path
+
+    def summary(self) -> Dict[str, Any]:
+        leaves: Counter = Counter()
+        for stack, count in self.profiler.stacks.items():
+            leaves[stack.rsplit(";", 1)[-1]] += count
+        return {
+            "label": self.label,
+            "duration": self.duration,
+            "spans": sorted(self.spans, key=lambda s: s["start"]),
+            "samples": self.profiler.samples,
+            "overhead": self.profiler.overhead,
+            "top_frames": leaves.most_common(8),
+            "path": self.path,
+        }
+
+
+def begin_run(label: str, interval: float = SAMPLE_INTERVAL) -> ProfiledRun:
+    """
+    Start profiling the current thread's work (and the threads it fans out to).
+    """
+    run = ProfiledRun(label, interval)
+    run.enter_thread()
+    run.profiler.start()
+    run._token = _current_run.set(run)
+    return run
+
+
+def end_run(run: ProfiledRun) -> Dict[str, Any]:
+    """
+    Stop sampling, write the folded stacks and return the run summary.
+    """
+    run.profiler.stop()
+    run.duration = time.perf_counter() - run.started_at
+    try:
+        _current_run.reset(run._token)
+    except ValueError:
+        # Ended from a different context than it was started in
+        _current_run.set(None)
+    run.path = run.write_folded()
+    summary = run.summary()
+    print(f"[profiling] {run.label}: {run.duration * 1000:.0f} ms, {summary['samples']} samples, "
+          f"overhead {summary['overhead']:.2%}, stacks -> {run.path}")
+    return summary
+
+
+def discard_run(run: ProfiledRun) -> None:
+    """
+    Stop a run that will never be ended (no stacks written).
+    """
+    run.profiler.stop()
+    if _current_run.get() is run:
+        _current_run.set(None)
+
+
+def current_run() -> Optional[ProfiledRun]:
+    return _current_run.get()
+
+
+@contextmanager
+def span(name: str):
+    """
+    Time a block as a waterfall span of the active run (no-op otherwise).
+    """
+    run = _current_run.get()
+    if run is None:
+        yield
+        return
+    run.enter_thread()
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        run.add_span(name, start, time.perf_counter())
+        run.exit_thread()
+
+
+def instrument_checkpointer(checkpointer):
+    """
+    Record checkpoint writes as spans. Patches the instance, not the class.
+    """
+    if getattr(checkpointer, "_spans_instrumented", False):
+        return checkpointer
+    checkpointer._spans_instrumented = True
+    for method in ("put", "put_writes"):
+        original = getattr(checkpointer, method, None)
+        if original is None:
+            continue
+
+        def timed(*args, _original=original, _name=f"checkpoint.{method}", **kwargs):
+            with span(_name):
+                return _original(*args, **kwargs)
+
+        setattr(checkpointer, method, timed)
+    return checkpointer
+
+
+def waterfall_html(summary: Dict[str, Any]) -> str:
+    """
+    Horizontal timing bars for a run summary, one row per span.
+    """
+    total = max(summary["duration"], max((s["end"] for s in summary["spans"]), default=0.0), 1e-9)
+    rows = []
+    for s in summary["spans"]:
+        left = 100 * s["start"] / total
+        width = max(100 * (s["end"] - s["start"]) / total, 0.3)
+        rows.append(
+            f"<div style='display:flex;align-items:center;font-size:0.85rem;margin:2px 0;'>"
+            f"<div style='width:180px;flex:none;overflow:hidden;white-space:nowrap;'>{s['name']}</div>"
+            f"<div style='position:relative;flex:1;height:14px;background:#f3f3f3;'>"
+            f"<div style='position:absolute;left:{left:.2f}%;width:{width:.2f}%;height:100%;background:#4a90e2;'></div>"
+            f"</div>"
+            f"<div style='width:80px;flex:none;text-align:right;'>{(s['end'] - s['start']) * 1000:.1f} ms</div>"
+            f"</div>"
+        )
+    return "".join(rows)
@@ -0,0 +1,197 @@
+"""
+Precompiled, versioned prompt templates.
+
+Every LLM call about a profile is laid out as
+
+    [system: shared instructions]  [user: profile block]  [user: task suffix]
+    \______________ stable prefix ______________/          \__ varies __/
+
+The system message and the profile block are identical for all calls on the
+same profile version (analysis, job fit for any role, content rewrites), so
+backends with prefix/KV caching can reuse them. The profile block is a plain
+join of the profile fields: byte-identical for the same profile, and cheaper
+to render than any cache key over the profile would be to compute.
+"""
+from string import Formatter
+from typing import Any, Dict, List
+
+# Bump when the shared system prompt or the profile block layout changes.
+PROMPT_TEMPLATE_VERSION = "v2"
+
+SHARED_SYSTEM_PROMPT = """
+You are a top-tier LinkedIn career coach, recruiter and copywriter.
+
+You will receive one candidate profile, followed by a task about it.
+Important instructions:
+- Respond ONLY with valid JSON that matches the schema given in the task.
+- Do NOT include text before or after the JSON, and no markdown.
+- Be concise but detailed, and stay truthful to the profile data.
+""".strip()
+
+# (label, key in preprocess_profile output), in prompt order
+PROFILE_FIELDS = [
+    ("FullName", "FullName"),
+    ("Headline", "Headline"),
+    ("JobTitle", "JobTitle"),
+    ("CompanyName", "CompanyName"),
+    ("CompanyIndustry", "CompanyIndustry"),
+    ("CurrentJobDuration", "CurrentJobDuration"),
+    ("About", "About"),
+    ("Experiences", "Experiences"),
+    ("Skills", "Skills"),
+    ("Educations", "Educations"),
+    ("Certifications", "Certifications"),
+    ("HonorsAndAwards", "HonorsAndAwards"),
+    ("Verifications", "Verifications"),
+    ("Highlights", "Highlights"),
+    ("Projects", "Projects"),
+    ("Publications", "Publications"),
+    ("Patents", "Patents"),
+    ("Courses", "Courses"),
+    ("TestScores", "TestScores"),
+]
+
+_PROFILE_BLOCK = "\n".join(["Candidate profile data:"] + [f"{label}: %s" for label, _ in PROFILE_FIELDS])
+
+
+def render_profile_block(profile: Dict[str, Any]) -> str:
+    """
+    Candidate profile as prompt text.
+    """
+    return _PROFILE_BLOCK % tuple([profile.get(field, "") or "" for _, field in PROFILE_FIELDS])
+
+
+class PromptTemplate:
+    """
+    A task prompt: shared system prompt + profile block + task suffix.
+    The suffix is a str.format template filled with the call's variables.
+    """
+
+    def __init__(self, name: str, version: str, suffix: str):
+        self.name = name
+        self.version = version
+        self.suffix = suffix.strip()
+        # Parsed once: str.format re-parses the whole JSON schema text each call
+        self._parts = list(Formatter().parse(self.suffix))
+        self._simple = all(spec == "" and conversion is None for _, field, spec, conversion in self._parts
+                           if field is not None)
+        self._static = self.suffix.format() if all(f is None for _, f, _, _ in self._parts) else None
+
+    @property
+    def cache_tag(self) -> str:
+        """
+        Identifies this template version in cache keys.
+        """
+        return f"{self.name}:{PROMPT_TEMPLATE_VERSION}.{self.version}"
+
+    def prefix_messages(self, profile: Dict[str, Any]) -> List[Dict[str, str]]:
+        return [
+            {"role": "system", "content": SHARED_SYSTEM_PROMPT},
+            {"role": "user", "content": render_profile_block(profile)},
+        ]
+
+    def render_suffix(self, **variables: Any) -> str:
+        if self._static is not None:
+            return self._static
+        if not self._simple:
+            return self.suffix.format(**variables)
+        return "".join(literal + (str(variables[field]) if field is not None else "")
+                       for literal, field, _, _ in self._parts)
+
+    def messages(self, profile: Dict[str, Any], **variables: Any) -> List[Dict[str, str]]:
+        return self.prefix_messages(profile) + [
+            {"role": "user", "content": self.render_suffix(**variables)}
+        ]
+
+
+PROFILE_ANALYSIS_TEMPLATE = PromptTemplate("profile_analysis", "1", """
+Task: analyze the candidate profile above.
+
+Identify and summarize:
+1. strengths:
+    - technical strengths (skills, tools, frameworks)
+    - project strengths (impactful projects, innovation)
+    - educational strengths (degrees, certifications, awards)
+    - soft skills and personality traits (teamwork, leadership)
+2. weaknesses:
+    - missing or weak technical skills
+    - gaps in projects, experience, or education
+    - unclear profile sections or missing context
+3. actionable suggestions:
+    - concrete ways to improve profile headline, about section, or add projects
+    - suggestions to learn or highlight new skills
+    - ideas to make the profile more attractive for recruiters
+
+Example JSON format:
+{{
+  "strengths": {{
+    "technical": ["...", "..."],
+    "projects": ["...", "..."],
+    "education": ["...", "..."],
+    "soft_skills": ["...", "..."]
+  }},
+  "weaknesses": {{
+    "technical_gaps": ["...", "..."],
+    "project_or_experience_gaps": ["...", "..."],
+    "missing_context": ["...", "..."]
+  }},
+  "suggestions": [
+    "...",
+    "...",
+    "..."
+  ]
+}}
+""")
+
+JOB_FIT_TEMPLATE = PromptTemplate("job_fit", "1", """
+Task: compare the candidate profile above against the typical requirements for the role of "{target_role}".
+
+Your JSON must exactly match the following schema:
+{{
+  "match_score": 85,
+  "missing_skills": ["Skill1", "Skill2"],
+  "suggestions": ["...", "...", "..."]
+}}
+- "match_score": integer from 0–100 estimating how well the profile fits the target role.
+- "missing_skills": key missing or weakly mentioned skills.
+- "suggestions": 3 actionable recommendations to improve fit (e.g., learn tools, rewrite headline).
+
+Start with '{{' and end with '}}'.
+""")
+
+CONTENT_GENERATION_TEMPLATE = PromptTemplate("content_generation", "1", """
+Task: rewrite the candidate's "{section}" section so it is more compelling for recruiters.
+
+Current "{section}" section:
+{text}
+
+Style: {style}
+Additional user instructions: {instructions}
+
+Keep every fact truthful to the profile; do not invent employers, degrees or numbers.
+Your JSON must exactly match: {{"new_content": "..."}}
+""")
+
+CHATBOT_SYSTEM_PROMPT = """
+You are a helpful AI assistant specialized in LinkedIn profile coaching.
+
+Guidelines:
+- Greet the user if they greet you, and explain you can help analyze, enhance, and improve their LinkedIn profile.
+- Prefer using tools instead of answering directly whenever this can give better, data-backed answers.
+- Call only one tool at a time. Never call multiple tools together.
+
+When to use tools:
+- If the user asks to show a section (like About, Projects, etc.): call extract_from_state_tool, unless you already have that section stored.
+- If the user asks to enhance, improve or rewrite a section: use content_generator with that section name.
+- If the user requests a full profile analysis: use profile_analyzer.
+- If the user wants to know how well they fit a target job role: use job_matcher with the given role.
+- Use tools to check strengths, weaknesses, missing skills, or improvement suggestions.
+- If the tool was just called recently and info is still fresh, you may answer directly.
+
+Important:
+- Never describe or print JSON of a tool call.
+- Never say "I'm about to call a tool" — just call the tool properly.
+- Keep answers clear, helpful, and actionable.
+
+Your goal: help the user see, improve, and analyze their LinkedIn profile.
+""".strip()
@@ -0,0 +1,336 @@
+"""
+Semantic cache of chatbot_node router responses.
+
+Users ask the same few things ("how is my about section?", "analyze my
+profile please") against unchanged profiles, and each time the router LLM
+picks the same tool. This cache keys the router's response by profile
+version plus a local embedding of the question: hashed TF-IDF over
+normalized word unigrams, bigrams and character trigrams, CPU-only, no model
+to load. Each entry keeps only its nonzero features; lookup scores all the
+questions cached for that profile version in one pass over their
+concatenated features (gather + bincount), outside the lock.
+
+Only questions the local intent classifier maps to a tool are cached, and a
+hit also needs it to agree on the tool and its arguments, so "fit for data
+engineer" never serves the cached answer to "fit for data scientist", and
+follow-ups that depend on the conversation ("make it shorter and more
+formal") always reach the LLM. Entries expire after RESPONSE_CACHE_TTL and
+the least recently used are evicted past RESPONSE_CACHE_MAX_PER_VERSION for
+one profile version or RESPONSE_CACHE_MAX_ENTRIES overall. The cache is per
+process, like the speculation pool.
+"""
+import math
+import os
+import re
+import threading
+import time
+import uuid
+import zlib
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from intent import classify_intent, normalize_role
+
+RESPONSE_CACHE = os.getenv("RESPONSE_CACHE", "1") == "1"
+# Minimum cosine similarity between the new and the cached question
+RESPONSE_CACHE_THRESHOLD = float(os.getenv("RESPONSE_CACHE_THRESHOLD", "0.8"))
+RESPONSE_CACHE_TTL = float(os.getenv("RESPONSE_CACHE_TTL", str(6 * 3600)))
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "5000"))
+RESPONSE_CACHE_MAX_PER_VERSION = int(os.getenv("RESPONSE_CACHE_MAX_PER_VERSION", "200"))
+
+# Width of the hashed feature space
+FEATURE_BITS = 14
+N_FEATURES = 1 << FEATURE_BITS
+# Questions with fewer content words ("do it", "yes") depend on the conversation
+MIN_WORDS = 2
+CHAR_NGRAM_WEIGHT = 0.5
+
+STOPWORDS = {
+    "a", "an", "the", "and", "or", "of", "to", "in", "on", "at", "for", "is", "are", "was", "be",
+    "i", "me", "my", "mine", "you", "your", "it", "its", "this", "that", "these", "those",
+    "please", "pls", "plz", "can", "could", "would", "will", "do", "does", "did", "just",
+    "hi", "hey", "hello", "thanks", "thank", "ok", "okay", "so", "now", "then", "also",
+    "tell", "let", "know", "want", "like", "give", "get", "show", "see", "look",
+    "how", "what", "which", "good", "way", "tip", "some", "any", "more", "bit",
+}
+_WORD_RE = re.compile(r"[a-z0-9+#]+")
+_BRITISH_RE = re.compile(r"([yi])s(e|ed|es|ing)$")
+
+
+def normalize_question(text: str) -> List[str]:
+    """
+    Lowercased content words, stopwords dropped and crudely stemmed.
+    """
+    words = []
+    for word in _WORD_RE.findall((text or "").lower()):
+        if word in STOPWORDS:
+            continue
+        word = _stem(word)
+        if len(word) > 1 and word not in STOPWORDS:
+            words.append(word)
+    return words
+
+
+def _stem(word: str) -> str:
+    # Enough to fold "ways"/"way", "writing"/"write", "analyse"/"analyzed"
+    word = _BRITISH_RE.sub(r"\1z\2", word)
+    if len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+        word = word[:-1]
+    for suffix in ("ing", "ed"):
+        if len(word) > len(suffix) + 2 and word.endswith(suffix):
+            word = word[:-len(suffix)]
+            break
+    if len(word) > 3 and word.endswith("e"):
+        word = word[:-1]
+    return word
+
+
+def _bucket(feature: str) -> int:
+    # crc32 rather than hash(): stable across processes and runs
+    return zlib.crc32(feature.encode()) & (N_FEATURES - 1)
+
+
+def term_features(words: List[str]) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Hashed feature indices of a normalized question and their sublinear term
+    frequencies. IDF weights are applied at lookup time, since they change as
+    the cache fills.
+    """
+    counts: Dict[int, float] = {}
+    features = [(w, 1.0) for w in words]
+    features += [(f"{a} {b}", 1.0) for a, b in zip(words, words[1:])]
+    for word in words:
+        padded = f"<{word}>"
+        features += [(padded[i:i + 3], CHAR_NGRAM_WEIGHT) for i in range(len(padded) - 2)]
+    for feature, weight in features:
+        index = _bucket(feature)
+        counts[index] = counts.get(index, 0.0) + weight
+    indices = np.array(sorted(counts), dtype=np.int32)
+    weights = np.array([1.0 + math.log(counts[i]) if counts[i] >= 1 else counts[i] for i in indices],
+                       dtype=np.float32)
+    return indices, weights
+
+
+def _intent_key(text: str) -> Optional[tuple]:
+    """
+    The tool and arguments the question asks for, or None if it names no tool.
+    """
+    intent = classify_intent(text)
+    if intent.tool is None:
+        return None
+    args = dict(intent.args)
+    if "target_role" in args:
+        args["target_role"] = normalize_role(args["target_role"])
+    return intent.tool, intent.kind, tuple(sorted(args.items()))
+
+
+class _VersionIndex:
+    """
+    Cached questions of one profile version, with their features concatenated
+    CSR-style on first lookup after a change.
+    """
+
+    def __init__(self):
+        self.entries: Dict[int, Dict[str, Any]] = {}
+        # entry ids, least recently used first
+        self.lru: "OrderedDict[int, None]" = OrderedDict()
+        # normalized words -> entry id
+        self.by_words: Dict[tuple, int] = {}
+        self._packed: Optional[tuple] = None
+
+    def add(self, entry: Dict[str, Any]) -> None:
+        self.entries[entry["id"]] = entry
+        self.lru[entry["id"]] = None
+        self.by_words[entry["words"]] = entry["id"]
+        self._packed = None
+
+    def remove(self, entry_id: int) -> Optional[Dict[str, Any]]:
+        self.lru.pop(entry_id, None)
+        entry = self.entries.pop(entry_id, None)
+        if entry is not None:
+            self.by_words.pop(entry["words"], None)
+            self._packed = None
+        return entry
+
+    def packed(self) -> tuple:
+        """
+        (entries, feature indices, weights, row of each feature). The arrays
+        are rebuilt rather than mutated, so callers may use them unlocked.
+        """
+        if self._packed is None:
+            entries = list(self.entries.values())
+            lengths = [len(e["indices"]) for e in entries]
+            self._packed = (
+                entries,
+                np.concatenate([e["indices"] for e in entries]),
+                np.concatenate([e["weights"] for e in entries]),
+                np.repeat(np.arange(len(entries)), lengths),
+            )
+        return self._packed
+
+
+class ResponseCache:
+    """
+    Thread-safe semantic cache of router responses, per profile version.
+    """
+
+    def __init__(self, threshold: float = RESPONSE_CACHE_THRESHOLD, ttl: float = RESPONSE_CACHE_TTL,
+                 max_entries: int = RESPONSE_CACHE_MAX_ENTRIES,
+                 max_per_version: int = RESPONSE_CACHE_MAX_PER_VERSION):
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_per_version = max_per_version
+        self._lock = threading.Lock()
+        self._indexes: Dict[str, _VersionIndex] = {}
+        # entry id -> profile version, least recently used first
+        self._lru: "OrderedDict[int, str]" = OrderedDict()
+        # Document frequency of each feature over all cached questions, for IDF
+        self._df = np.zeros(N_FEATURES, dtype=np.float32)
+        self._next_id = 0
+        self.lookups = 0
+        self.hits = 0
+        self.stores = 0
+        self.evictions = 0
+        self.expired = 0
+        self.seconds_saved = 0.0
+
+    def _drop(self, version: str, entry_id: int) -> None:
+        self._lru.pop(entry_id, None)
+        index = self._indexes.get(version)
+        if index is None:
+            return
+        entry = index.remove(entry_id)
+        if entry is not None:
+            self._df[entry["indices"]] -= 1
+        if not index.entries:
+            del self._indexes[version]
+
+    def _prune(self, version: str, now: float) -> None:
+        index = self._indexes.get(version)
+        if index is None:
+            return
+        for entry in [e for e in index.entries.values() if now - e["created"] > self.ttl]:
+            self._drop(version, entry["id"])
+            self.expired += 1
+
+    def lookup(self, version: str, question: str) -> Optional[Dict[str, Any]]:
+        """
+        Cached response for the closest question under this profile version,
+        with its "similarity", or None.
+        """
+        words = normalize_question(question)
+        if len(words) < MIN_WORDS:
+            return None
+        intent = _intent_key(question)
+        if intent is None:
+            return None
+        query_indices, query_weights = term_features(words)
+        with self._lock:
+            self.lookups += 1
+            self._prune(version, time.time())
+            index = self._indexes.get(version)
+            if index is None:
+                return None
+            entries, indices, weights, rows = index.packed()
+            n_docs = len(self._lru)
+            df = self._df.copy()
+
+        idf = np.log((1.0 + n_docs) / (1.0 + df)) + 1.0
+        weights = weights * idf[indices]
+        query = np.zeros(N_FEATURES, dtype=np.float32)
+        query[query_indices] = query_weights * idf[query_indices]
+        norms = np.sqrt(np.bincount(rows, weights=weights * weights, minlength=len(entries)))
+        norms *= np.linalg.norm(query) or 1.0
+        dots = np.bincount(rows, weights=weights * query[indices], minlength=len(entries))
+        similarities = dots / np.where(norms > 0, norms, 1.0)
+
+        for row in np.argsort(-similarities):
+            similarity = float(similarities[row])
+            if similarity < self.threshold:
+                break
+            entry = entries[row]
+            if entry["intent"] != intent:
+                continue
+            with self._lock:
+                if entry["id"] not in self._lru:
+                    # Evicted while we were scoring
+                    continue
+                self._lru.move_to_end(entry["id"])
+                self._indexes[version].lru.move_to_end(entry["id"])
+                entry["hits"] += 1
+                self.hits += 1
+                self.seconds_saved += entry["seconds"]
+            return dict(entry["response"], similarity=similarity, question=entry["question"])
+        return None
+
+    def store(self, version: str, question: str, response: Dict[str, Any], seconds: float = 0.0) -> bool:
+        """
+        Cache a router response: {"content": str, "tool_calls": [{"name", "args"}]}.
+        seconds is what the LLM round trip took, credited on later hits.
+        """
+        words = normalize_question(question)
+        if len(words) < MIN_WORDS:
+            return False
+        intent = _intent_key(question)
+        if intent is None:
+            return False
+        indices, weights = term_features(words)
+        entry = {
+            "question": question,
+            "words": tuple(words),
+            "intent": intent,
+            "response": response,
+            "indices": indices,
+            "weights": weights,
+            "created": time.time(),
+            "seconds": seconds,
+            "hits": 0,
+        }
+        with self._lock:
+            index = self._indexes.get(version)
+            # Replace an identical question rather than stacking duplicates
+            if index is not None and entry["words"] in index.by_words:
+                self._drop(version, index.by_words[entry["words"]])
+            entry["id"] = self._next_id
+            self._next_id += 1
+            index = self._indexes.setdefault(version, _VersionIndex())
+            index.add(entry)
+            self._lru[entry["id"]] = version
+            self._df[indices] += 1
+            self.stores += 1
+            while len(index.entries) > self.max_per_version:
+                self._drop(version, next(iter(index.lru)))
+                self.evictions += 1
+            while len(self._lru) > self.max_entries:
+                old_id, old_version = next(iter(self._lru.items()))
+                self._drop(old_version, old_id)
+                self.evictions += 1
+        return True
+
+    def summary(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "entries": len(self._lru),
+                "profile_versions": len(self._indexes),
+                "lookups": self.lookups,
+                "hits": self.hits,
+                "hit_rate": round(self.hits / self.lookups, 3) if self.lookups else 0.0,
+                "stores": self.stores,
+                "evictions": self.evictions,
+                "expired": self.expired,
+                "seconds_saved": round(self.seconds_saved, 2),
+            }
+
+
+def replay_tool_calls(tool_calls: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Cached tool calls with fresh ids, so ToolNode results pair with this turn's call.
+    """
+    return [{"name": call["name"], "args": dict(call.get("args") or {}), "id": f"call_{uuid.uuid4().hex[:24]}"}
+            for call in tool_calls]
+
+
+response_cache = ResponseCache()
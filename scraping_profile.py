@@ -1,7 +1,9 @@
-from apify_client import ApifyClient
+from apify_client import ApifyClient, ApifyClientAsync
 from dotenv import load_dotenv
+import asyncio
 import os
 import json
+from typing import AsyncIterator, Dict, Iterable, List, Tuple
 
 # Load environment variables
 load_dotenv()
@@ -9,8 +11,12 @@ load_dotenv()
 # Get API token
 api_token = os.getenv("APIFY_API_TOKEN")
 
-# Initialize client once (global)
+# Initialize clients once (global)
 client = ApifyClient(api_token)
+async_client = ApifyClientAsync(api_token)
+
+ACTOR_ID = "dev_fusion/Linkedin-Profile-Scraper"
+TERMINAL_RUN_STATUSES = {"SUCCEEDED", "FAILED", "TIMED-OUT", "ABORTED"}
 
 
 def scrape_linkedin_profile(profile_url: str) -> dict:
@@ -19,7 +25,7 @@ def scrape_linkedin_profile(profile_url: str) -> dict:
     """
     try:
         run_input = {"profileUrls": [profile_url]}
-        run = client.actor("dev_fusion/Linkedin-Profile-Scraper").call(run_input=run_input)
+        run = client.actor(ACTOR_ID).call(run_input=run_input)
 
         items = list(client.dataset(run["defaultDatasetId"]).iterate_items())
 
@@ -35,6 +41,112 @@ def scrape_linkedin_profile(profile_url: str) -> dict:
         return {}
 
 
+# ========== BULK SCRAPING ==========
+
+def _url_key(url: str) -> str:
+    """
+    Key for matching dataset items to requested URLs (scheme, www, case,
+    query string and trailing slash don't matter).
+    """
+    url = (url or "").strip().lower().split("?")[0].rstrip("/")
+    for prefix in ("https://", "http://", "www."):
+        if url.startswith(prefix):
+            url = url[len(prefix):]
+    return url
+
+
+def _batches(urls: List[str], size: int) -> List[List[str]]:
+    return [urls[i:i + size] for i in range(0, len(urls), size)]
+
+
+async def _stream_run(run: dict, queue: asyncio.Queue, poll_interval: int, page_size: int) -> None:
+    """
+    Poll one actor run and push its dataset items to the queue as they appear,
+    without waiting for the whole run to finish.
+    """
+    run_client = async_client.run(run["id"])
+    dataset = async_client.dataset(run["defaultDatasetId"])
+    offset = 0
+    status = run.get("status")
+    try:
+        while True:
+            finished = status in TERMINAL_RUN_STATUSES
+            page = await dataset.list_items(offset=offset, limit=page_size)
+            for item in page.items:
+                await queue.put(item)
+            offset += len(page.items)
+            if finished and len(page.items) < page_size:
+                if status != "SUCCEEDED":
+                    print(f"⚠️ Actor run {run['id']} ended with status {status}.")
+                break
+            if not finished:
+                info = await run_client.wait_for_finish(wait_secs=poll_interval)
+                status = (info or {}).get("status", status)
+    except Exception as e:
+        print(f"❌ Error while streaming actor run {run.get('id')}: {e}")
+
+
+async def iter_scraped_profiles_async(
+    profile_urls: Iterable[str],
+    batch_size: int = 100,
+    poll_interval: int = 5,
+    page_size: int = 100,
+) -> AsyncIterator[Tuple[str, dict]]:
+    """
+    Scrape many profiles with as few actor runs as possible.
+
+    URLs are packed into runs of up to batch_size, all runs are started
+    without blocking and polled concurrently, and (requested_url, item)
+    pairs are yielded one by one as soon as they land in a run's dataset.
+    Items are mapped back to the requested URL via their linkedinUrl.
+    """
+    urls = list(dict.fromkeys(u.strip() for u in profile_urls if u and u.strip()))
+    if not urls:
+        return
+    requested = {_url_key(u): u for u in urls}
+
+    actor = async_client.actor(ACTOR_ID)
+    runs = await asyncio.gather(*(
+        actor.start(run_input={"profileUrls": batch}) for batch in _batches(urls, batch_size)
+    ))
+
+    queue: asyncio.Queue = asyncio.Queue()
+    pollers = [asyncio.create_task(_stream_run(run, queue, poll_interval, page_size)) for run in runs]
+    done = asyncio.gather(*pollers)
+    try:
+        while not (done.done() and queue.empty()):
+            if not queue.empty():
+                item = queue.get_nowait()
+            else:
+                getter = asyncio.ensure_future(queue.get())
+                await asyncio.wait({getter, done}, return_when=asyncio.FIRST_COMPLETED)
+                if not getter.done():
+                    getter.cancel()
+                    continue
+                item = getter.result()
+            url = item.get("linkedinUrl") or ""
+            yield requested.get(_url_key(url), url), item
+    finally:
+        for poller in pollers:
+            poller.cancel()
+
+
+def scrape_linkedin_profiles(profile_urls: Iterable[str], **kwargs) -> Dict[str, dict]:
+    """
+    📄 Scrapes many LinkedIn profiles in bulk and returns {requested_url: profile}.
+    URLs the actor returned nothing for map to an empty dict.
+    """
+    urls = [u.strip() for u in profile_urls if u and u.strip()]
+
+    async def collect():
+        results = {u: {} for u in urls}
+        async for url, item in iter_scraped_profiles_async(urls, **kwargs):
+            results[url] = item
+        return results
+
+    return asyncio.run(collect())
+
+
 # 🧪 OPTIONAL: test code only runs when this file is executed directly
 if __name__ == "__main__":
     test_url = "https://www.linkedin.com/in/sri-vallabh-tammireddy/"
@@ -0,0 +1,460 @@
+"""
+Shared storage for checkpoints, the profile-URL thread index and caches.
+
+Everything stateful that several worker processes (Streamlit servers, API
+workers, containers) must agree on goes through a Store, so any worker can
+serve any thread. The backend is picked from STORE_URL:
+
+    sqlite:///checkpoints1.db   (default) one file, shared by processes on one host
+    redis://host:6379/0         shared server-side store for multi-host replicas
+    memory://                   in-process stand-in for tests and local runs
+"""
+import base64
+import json
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterable, Iterator, Optional, Set, Tuple
+
+from langgraph.checkpoint.memory import MemorySaver
+from langgraph.checkpoint.sqlite import SqliteSaver
+
+DEFAULT_STORE_URL = "sqlite:///checkpoints1.db"
+
+THREAD_INDEX_PREFIX = "thread:url:"
+THREAD_COUNTER_KEY = "thread:counter"
+SCRAPED_AT_PREFIX = "thread:scraped_at:"
+
+
+class Store:
+    """
+    Base class: key/value primitives are implemented by each backend, the
+    thread index and locking are built on top of them.
+    Values are JSON-serializable objects.
+    """
+
+    def checkpointer(self):
+        raise NotImplementedError
+
+    def get(self, key: str, default: Any = None) -> Any:
+        raise NotImplementedError
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        raise NotImplementedError
+
+    def add(self, key: str, value: Any, ttl: Optional[float] = None) -> bool:
+        """
+        Set key only if it does not exist yet. Returns True if it was set.
+        """
+        raise NotImplementedError
+
+    def delete(self, key: str) -> None:
+        raise NotImplementedError
+
+    def incr(self, key: str) -> int:
+        raise NotImplementedError
+
+    def scan(self, prefix: str) -> Iterator[str]:
+        raise NotImplementedError
+
+    # --- Immutable binary blobs (content-addressed checkpoint data) ---
+
+    def put_blobs(self, blobs: Dict[str, bytes]) -> None:
+        """
+        Store blobs that are not stored yet; existing keys are left as they are.
+        """
+        for key, data in blobs.items():
+            self.add("blob:" + key, base64.b64encode(data).decode("ascii"))
+
+    def get_blobs(self, keys: Iterable[str]) -> Dict[str, bytes]:
+        """
+        Map of key -> data for the keys that exist.
+        """
+        blobs = {}
+        for key in keys:
+            value = self.get("blob:" + key)
+            if value is not None:
+                blobs[key] = base64.b64decode(value)
+        return blobs
+
+    def touch_blobs(self, keys: Iterable[str]) -> None:
+        """
+        Mark existing blobs as in use now, so sweep_blobs() keeps them for a while.
+        Backends without sweep_blobs() have nothing to do.
+        """
+
+    def checkpoint_payloads(self) -> Iterator[Tuple[str, bytes]]:
+        """
+        (type, data) of every serialized checkpoint and pending write row.
+        """
+        raise NotImplementedError
+
+    def sweep_blobs(self, prefix: str, keep: Set[str], untouched_since: float) -> int:
+        """
+        Delete blobs under prefix that are not in keep and were last stored or
+        touched before untouched_since. Returns the number deleted.
+        """
+        raise NotImplementedError
+
+    # --- Thread index ---
+
+    def find_thread(self, profile_url: str) -> Optional[str]:
+        return self.get(THREAD_INDEX_PREFIX + profile_url)
+
+    def register_thread(self, profile_url: str, thread_id: str) -> None:
+        self.set(THREAD_INDEX_PREFIX + profile_url, thread_id)
+
+    def unregister_thread(self, profile_url: str) -> None:
+        self.delete(THREAD_INDEX_PREFIX + profile_url)
+
+    def list_threads(self) -> Dict[str, str]:
+        """
+        Map of profile URL -> thread_id for every indexed thread.
+        """
+        threads = {}
+        for key in self.scan(THREAD_INDEX_PREFIX):
+            thread_id = self.get(key)
+            if thread_id is not None:
+                threads[key[len(THREAD_INDEX_PREFIX):]] = thread_id
+        return threads
+
+    def mark_scraped(self, thread_id: str, when: Optional[float] = None) -> None:
+        """
+        Record when a thread's profile was last scraped (see prewarm.py).
+        """
+        self.set(SCRAPED_AT_PREFIX + str(thread_id), when or time.time())
+
+    def scraped_at(self, thread_id: str) -> Optional[float]:
+        return self.get(SCRAPED_AT_PREFIX + str(thread_id))
+
+    def allocate_thread_id(self) -> str:
+        # Counter starts at 1; thread ids keep the historical "0", "1", ... scheme.
+        return str(self.incr(THREAD_COUNTER_KEY) - 1)
+
+    # --- Locking ---
+
+    @contextmanager
+    def lock(self, name: str, ttl: float = 120.0, wait: float = 120.0, poll: float = 0.05):
+        """
+        Cross-process mutex built on add(). The TTL frees locks of crashed workers.
+        """
+        key = f"lock:{name}"
+        token = f"{os.getpid()}:{threading.get_ident()}:{time.time()}"
+        deadline = time.time() + wait
+        while not self.add(key, token, ttl=ttl):
+            if time.time() > deadline:
+                raise TimeoutError(f"Could not acquire lock {name!r}")
+            time.sleep(poll)
+        try:
+            yield
+        finally:
+            if self.get(key) == token:
+                self.delete(key)
+
+
+class MemoryStore(Store):
+    """
+    In-process store for tests and single-process runs.
+    """
+
+    def __init__(self):
+        self._data: Dict[str, Any] = {}
+        self._expires: Dict[str, float] = {}
+        self._lock = threading.RLock()
+        self._checkpointer = MemorySaver()
+
+    def checkpointer(self):
+        return self._checkpointer
+
+    def _expired(self, key: str) -> bool:
+        expires = self._expires.get(key)
+        if expires is not None and expires <= time.time():
+            self._data.pop(key, None)
+            self._expires.pop(key, None)
+            return True
+        return False
+
+    def get(self, key, default=None):
+        with self._lock:
+            if self._expired(key) or key not in self._data:
+                return default
+            return json.loads(self._data[key])
+
+    def set(self, key, value, ttl=None):
+        with self._lock:
+            self._data[key] = json.dumps(value)
+            if ttl is None:
+                self._expires.pop(key, None)
+            else:
+                self._expires[key] = time.time() + ttl
+
+    def add(self, key, value, ttl=None):
+        with self._lock:
+            if not self._expired(key) and key in self._data:
+                return False
+            self.set(key, value, ttl)
+            return True
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+            self._expires.pop(key, None)
+
+    def incr(self, key):
+        with self._lock:
+            value = int(self.get(key, 0)) + 1
+            self.set(key, value)
+            return value
+
+    def scan(self, prefix):
+        with self._lock:
+            keys = [k for k in self._data if k.startswith(prefix) and not self._expired(k)]
+        return iter(keys)
+
+
+class SqliteStore(Store):
+    """
+    Single SQLite file holding both the LangGraph checkpoints and a kv table.
+    WAL mode lets several processes on the same host share it.
+    """
+
+    def __init__(self, path: str = "checkpoints1.db"):
+        self.path = path
+        self.conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        # The kv table gets its own connection so its transactions never
+        # interleave with the checkpointer's on a shared connection.
+        self.kv = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self.kv.execute(
+            "CREATE TABLE IF NOT EXISTS kv ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL)"
+        )
+        self.kv.execute(
+            "CREATE TABLE IF NOT EXISTS blobs (key TEXT PRIMARY KEY, data BLOB NOT NULL, touched REAL)"
+        )
+        if "touched" not in {row[1] for row in self.kv.execute("PRAGMA table_info(blobs)")}:
+            # Blob tables from before sweeping: rows count as untouched
+            self.kv.execute("ALTER TABLE blobs ADD COLUMN touched REAL")
+        self.kv.commit()
+        self._lock = threading.RLock()
+        self._checkpointer = SqliteSaver(self.conn, serde=checkpoint_serde(self))
+
+    def checkpointer(self):
+        return self._checkpointer
+
+    def get(self, key, default=None):
+        with self._lock:
+            row = self.kv.execute(
+                "SELECT value, expires_at FROM kv WHERE key = ?", (key,)
+            ).fetchone()
+        if row is None:
+            return default
+        value, expires_at = row
+        if expires_at is not None and expires_at <= time.time():
+            self.delete(key)
+            return default
+        return json.loads(value)
+
+    def set(self, key, value, ttl=None):
+        expires_at = time.time() + ttl if ttl is not None else None
+        with self._lock, self.kv:
+            self.kv.execute(
+                "INSERT OR REPLACE INTO kv (key, value, expires_at) VALUES (?, ?, ?)",
+                (key, json.dumps(value), expires_at),
+            )
+
+    def add(self, key, value, ttl=None):
+        now = time.time()
+        expires_at = now + ttl if ttl is not None else None
+        with self._lock, self.kv:
+            self.kv.execute(
+                "DELETE FROM kv WHERE key = ? AND expires_at IS NOT NULL AND expires_at <= ?",
+                (key, now),
+            )
+            cur = self.kv.execute(
+                "INSERT OR IGNORE INTO kv (key, value, expires_at) VALUES (?, ?, ?)",
+                (key, json.dumps(value), expires_at),
+            )
+            return cur.rowcount == 1
+
+    def delete(self, key):
+        with self._lock, self.kv:
+            self.kv.execute("DELETE FROM kv WHERE key = ?", (key,))
+
+    def incr(self, key):
+        with self._lock, self.kv:
+            # BEGIN IMMEDIATE takes the write lock so other processes can't interleave.
+            self.kv.execute("BEGIN IMMEDIATE")
+            row = self.kv.execute("SELECT value FROM kv WHERE key = ?", (key,)).fetchone()
+            value = (json.loads(row[0]) if row else 0) + 1
+            self.kv.execute(
+                "INSERT OR REPLACE INTO kv (key, value, expires_at) VALUES (?, ?, NULL)",
+                (key, json.dumps(value)),
+            )
+            return value
+
+    def scan(self, prefix):
+        with self._lock:
+            rows = self.kv.execute(
+                "SELECT key FROM kv WHERE key >= ? AND key < ? AND (expires_at IS NULL OR expires_at > ?)",
+                (prefix, prefix + "\uffff", time.time()),
+            ).fetchall()
+        return iter(row[0] for row in rows)
+
+    def put_blobs(self, blobs):
+        now = time.time()
+        with self._lock, self.kv:
+            self.kv.executemany(
+                "INSERT INTO blobs (key, data, touched) VALUES (?, ?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET touched = excluded.touched",
+                [(key, data, now) for key, data in blobs.items()],
+            )
+
+    def touch_blobs(self, keys):
+        keys = list(keys)
+        now = time.time()
+        with self._lock, self.kv:
+            for i in range(0, len(keys), 500):
+                batch = keys[i:i + 500]
+                self.kv.execute(
+                    f"UPDATE blobs SET touched = ? WHERE key IN ({','.join('?' * len(batch))})", [now] + batch
+                )
+
+    def checkpoint_payloads(self):
+        # Read through the kv connection: the checkpointer's may be mid-transaction
+        self.checkpointer()
+        for query in ("SELECT type, checkpoint FROM checkpoints", "SELECT type, value FROM writes"):
+            try:
+                cursor = self.kv.execute(query)
+            except sqlite3.OperationalError:
+                # Tables are created by the checkpointer on first use
+                continue
+            for type_, data in cursor:
+                if type_ is not None and data is not None:
+                    yield type_, bytes(data)
+
+    def sweep_blobs(self, prefix, keep, untouched_since):
+        with self._lock:
+            rows = self.kv.execute(
+                "SELECT key FROM blobs WHERE key >= ? AND key < ? AND (touched IS NULL OR touched < ?)",
+                (prefix, prefix + "\uffff", untouched_since),
+            ).fetchall()
+        stale = [key for (key,) in rows if key not in keep]
+        deleted = 0
+        with self._lock, self.kv:
+            for i in range(0, len(stale), 500):
+                batch = stale[i:i + 500]
+                # Re-check touched: a writer may have reused the blob since the select
+                deleted += self.kv.execute(
+                    f"DELETE FROM blobs WHERE key IN ({','.join('?' * len(batch))}) "
+                    "AND (touched IS NULL OR touched < ?)", batch + [untouched_since]
+                ).rowcount
+        return deleted
+
+    def get_blobs(self, keys):
+        keys = list(keys)
+        blobs = {}
+        with self._lock:
+            # Stay under SQLite's bound-parameter limit
+            for i in range(0, len(keys), 500):
+                batch = keys[i:i + 500]
+                rows = self.kv.execute(
+                    f"SELECT key, data FROM blobs WHERE key IN ({','.join('?' * len(batch))})", batch
+                ).fetchall()
+                blobs.update(rows)
+        return blobs
+
+
+class RedisStore(Store):
+    """
+    Redis-backed store for replicas on several hosts.
+    Requires: pip install redis langgraph-checkpoint-redis
+    """
+
+    def __init__(self, url: str, namespace: str = "linkedin-assistant"):
+        import redis
+        from langgraph.checkpoint.redis import RedisSaver
+
+        self.client = redis.Redis.from_url(url)
+        self.ns = namespace
+        self._checkpointer = RedisSaver(redis_client=self.client)
+        self._checkpointer.setup()
+
+    def _key(self, key: str) -> str:
+        return f"{self.ns}:{key}"
+
+    def checkpointer(self):
+        return self._checkpointer
+
+    def get(self, key, default=None):
+        value = self.client.get(self._key(key))
+        return default if value is None else json.loads(value)
+
+    def set(self, key, value, ttl=None):
+        self.client.set(self._key(key), json.dumps(value), px=int(ttl * 1000) if ttl else None)
+
+    def add(self, key, value, ttl=None):
+        return bool(self.client.set(self._key(key), json.dumps(value), nx=True,
+                                    px=int(ttl * 1000) if ttl else None))
+
+    def delete(self, key):
+        self.client.delete(self._key(key))
+
+    def incr(self, key):
+        return int(self.client.incr(self._key(key)))
+
+    def put_blobs(self, blobs):
+        pipe = self.client.pipeline(transaction=False)
+        for key, data in blobs.items():
+            pipe.set(self._key("blob:" + key), data, nx=True)
+        pipe.execute()
+
+    def get_blobs(self, keys):
+        keys = list(keys)
+        values = self.client.mget([self._key("blob:" + key) for key in keys]) if keys else []
+        return {key: value for key, value in zip(keys, values) if value is not None}
+
+    def scan(self, prefix):
+        strip = len(self.ns) + 1
+        for key in self.client.scan_iter(match=self._key(prefix) + "*"):
+            yield key.decode()[strip:] if isinstance(key, bytes) else key[strip:]
+
+
+def checkpoint_serde(store: Store):
+    """
+    Checkpoint serializer for a store's checkpointer, from CHECKPOINT_SERDE:
+    "dedup" (default) stores messages and large values once, compressed;
+    "default" keeps LangGraph's serializer. dedup also reads rows written by
+    the default serializer, but not the other way round.
+    """
+    if os.getenv("CHECKPOINT_SERDE", "dedup") == "default":
+        return None
+    from checkpoint_serde import DedupSerializer
+    return DedupSerializer(store)
+
+
+def open_store(url: str) -> Store:
+    if url.startswith("memory://"):
+        return MemoryStore()
+    if url.startswith("sqlite:///"):
+        return SqliteStore(url[len("sqlite:///"):])
+    if url.startswith(("redis://", "rediss://")):
+        return RedisStore(url)
+    raise ValueError(f"Unsupported STORE_URL: {url}")
+
+
+_store: Optional[Store] = None
+_store_lock = threading.Lock()
+
+
+def get_store() -> Store:
+    """
+    Process-wide store, opened on first use from STORE_URL.
+    """
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = open_store(os.getenv("STORE_URL", DEFAULT_STORE_URL))
+        return _store
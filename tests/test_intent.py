@@ -0,0 +1,30 @@
+import pytest
+
+from intent import classify_intent
+
+
+@pytest.mark.parametrize("text, role", [
+    ("Am I a good fit for a data engineer role?", "data engineer"),
+    ("am I suited to product management", "product management"),
+    ("is my profile a match for ML engineer", "ML engineer"),
+    ("good fit for team lead", "team lead"),
+    ("ready to apply for the backend role", "backend"),
+])
+def test_job_fit_questions(text, role):
+    intent = classify_intent(text)
+    assert intent.tool == "job_matcher" and intent.args["target_role"] == role
+
+
+@pytest.mark.parametrize("text", [
+    "good match with what I expected",
+    "match with senior backend engineer",
+    "apply for a job at Google",
+    "good fit for the team",
+    "am I a fit for the team at Stripe",
+    "is this a good fit for what I want",
+    "good to know",
+    "apply to Google",
+    "good for me",
+])
+def test_ordinary_chat_is_not_job_fit(text):
+    assert classify_intent(text).tool != "job_matcher"
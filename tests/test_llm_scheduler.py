@@ -0,0 +1,65 @@
+import sqlite3
+import threading
+
+import pytest
+
+from llm_scheduler import LLMScheduler, RateLimits
+
+
+class FlakyLimits(RateLimits):
+    """
+    Buckets whose shared store fails on the first take.
+    """
+
+    def __init__(self):
+        super().__init__(rpm=600, tpm=100_000)
+        self.failures = 1
+
+    def try_take(self, tokens):
+        if self.failures:
+            self.failures -= 1
+            raise sqlite3.OperationalError("database is locked")
+        return super().try_take(tokens)
+
+
+def test_store_error_does_not_block_later_calls():
+    scheduler = LLMScheduler(FlakyLimits(), queue_timeout=3)
+    with pytest.raises(sqlite3.OperationalError):
+        with scheduler.admit(100, user="a"):
+            pass
+    with scheduler.admit(100, user="b"):
+        pass
+    depths = [p["queue_depth"] for p in scheduler.stats()["priorities"].values()]
+    assert depths == [0] * len(depths)
+
+
+def test_take_runs_outside_the_condition():
+    class SlowLimits(RateLimits):
+        def try_take(self, tokens):
+            # Another thread can still use the scheduler's condition meanwhile
+            acquired = []
+
+            def probe():
+                acquired.append(scheduler._cond.acquire(timeout=1))
+                if acquired[0]:
+                    scheduler._cond.release()
+
+            thread = threading.Thread(target=probe)
+            thread.start()
+            thread.join()
+            assert acquired == [True]
+            return super().try_take(tokens)
+
+    scheduler = LLMScheduler(SlowLimits(rpm=600, tpm=100_000), queue_timeout=3)
+    with scheduler.admit(100, user="a"):
+        pass
+
+
+def test_timeout_removes_waiter():
+    scheduler = LLMScheduler(RateLimits(rpm=600, tpm=100_000), queue_timeout=0.2)
+    scheduler.limits.pause(60)
+    with pytest.raises(TimeoutError):
+        with scheduler.admit(100, user="a"):
+            pass
+    assert scheduler.stats()["queue_timeouts"] == 1
+    assert all(p["queue_depth"] == 0 for p in scheduler.stats()["priorities"].values())
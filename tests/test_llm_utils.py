@@ -0,0 +1,42 @@
+import json
+
+import pytest
+
+from llm_utils import repair_truncated_json
+
+SAMPLE = {
+    "strengths": {"technical": ["Python, \"ML\" pipelines", "C:\\tools\\bin", "caf\u00e9 \u2013 r\u00e9sum\u00e9"]},
+    "match_score": -12.5e-1,
+    "flags": [True, False, None],
+    "suggestions": ["Add metrics", ""],
+    "nested": [{"a": 1}, {"b": [2, 3]}],
+}
+
+
+@pytest.mark.parametrize("text", [
+    json.dumps(SAMPLE),
+    json.dumps(SAMPLE, indent=2),
+    json.dumps(SAMPLE, ensure_ascii=False),
+])
+def test_repair_truncated_json_at_every_offset(text):
+    for cut in range(1, len(text) + 1):
+        repaired = repair_truncated_json(text[:cut])
+        try:
+            value = json.loads(repaired)
+        except json.JSONDecodeError as e:
+            pytest.fail(f"cut at {cut} ({text[max(0, cut - 15):cut]!r}): {repaired!r} -> {e}")
+        assert isinstance(value, dict)
+
+
+def test_repair_keeps_complete_json():
+    text = json.dumps(SAMPLE)
+    assert json.loads(repair_truncated_json("Here you go:\n```json\n" + text + "\n```")) == SAMPLE
+
+
+@pytest.mark.parametrize("cut, expected", [
+    ('{"skills": ["Python, \\', {"skills": ["Python, "]}),
+    ('{"note": "said \\"ML\\', {"note": 'said "ML'}),
+    ('{"skills": ["caf\\u00', {"skills": ["caf"]}),
+])
+def test_repair_drops_partial_escapes(cut, expected):
+    assert json.loads(repair_truncated_json(cut)) == expected
@@ -0,0 +1,23 @@
+from string import Formatter
+
+import pytest
+
+import prompt_templates
+from prompt_templates import PROFILE_FIELDS, PromptTemplate, render_profile_block
+
+TEMPLATES = [value for value in vars(prompt_templates).values() if isinstance(value, PromptTemplate)]
+
+
+@pytest.mark.parametrize("template", TEMPLATES, ids=lambda t: t.name)
+def test_precompiled_suffix_matches_str_format(template):
+    names = {field for _, field, _, _ in Formatter().parse(template.suffix) if field}
+    variables = {name: f"<{name} {{x}} 100%>" for name in names}
+    assert template.render_suffix(**variables) == template.suffix.format(**variables)
+
+
+def test_profile_block_lists_every_field_in_order():
+    profile = {field: f"value of {field} 50%" for _, field in PROFILE_FIELDS}
+    profile["About"] = None
+    lines = render_profile_block(profile).split("\n")
+    assert lines[0] == "Candidate profile data:"
+    assert lines[1:] == [f"{label}: {'' if field == 'About' else profile[field]}" for label, field in PROFILE_FIELDS]
@@ -0,0 +1,81 @@
+import pytest
+
+import response_cache as rc
+from response_cache import ResponseCache
+
+ANALYSIS = {"content": "", "tool_calls": [{"name": "profile_analyzer", "args": {}}]}
+
+
+def fit(role):
+    return {"content": "", "tool_calls": [{"name": "job_matcher", "args": {"target_role": role}}]}
+
+
+def test_similar_question_hits():
+    cache = ResponseCache()
+    assert cache.store("v1", "Please analyze my LinkedIn profile", ANALYSIS, seconds=2.0)
+    hit = cache.lookup("v1", "analyse my linkedin profile please")
+    assert hit is not None and hit["tool_calls"] == ANALYSIS["tool_calls"]
+    assert hit["similarity"] >= cache.threshold
+    assert cache.summary()["seconds_saved"] == 2.0
+
+
+def test_dissimilar_question_and_other_version_miss():
+    cache = ResponseCache()
+    cache.store("v1", "Please analyze my LinkedIn profile", ANALYSIS)
+    assert cache.lookup("v1", "review my linkedin profile strengths and weaknesses for recruiters") is None
+    assert cache.lookup("v2", "Please analyze my LinkedIn profile") is None
+
+
+def test_different_role_misses_despite_similar_wording():
+    cache = ResponseCache(threshold=0.5)
+    cache.store("v1", "Am I a good fit for a data engineer role?", fit("data engineer"))
+    assert cache.lookup("v1", "Am I a good fit for a data scientist role?") is None
+    assert cache.lookup("v1", "am i a good fit for a data engineer position")["tool_calls"] == \
+        fit("data engineer")["tool_calls"]
+
+
+@pytest.mark.parametrize("question", [
+    "make it shorter and more formal",
+    "what do you think about remote work these days",
+    "yes",
+])
+def test_questions_without_tool_intent_are_not_cached(question):
+    cache = ResponseCache()
+    assert not cache.store("v1", question, {"content": "Sure, here it is.", "tool_calls": []})
+    assert cache.lookup("v1", question) is None
+    assert cache.summary()["entries"] == 0
+
+
+def test_entries_expire(monkeypatch):
+    cache = ResponseCache(ttl=10)
+    now = [1000.0]
+    monkeypatch.setattr(rc.time, "time", lambda: now[0])
+    cache.store("v1", "Please analyze my LinkedIn profile", ANALYSIS)
+    now[0] += 11
+    assert cache.lookup("v1", "Please analyze my LinkedIn profile") is None
+    assert cache.summary()["expired"] == 1
+
+
+def test_caps_evict_least_recently_used():
+    roles = ["data engineer", "data scientist", "frontend engineer"]
+    cache = ResponseCache(max_per_version=2)
+    for role in roles[:2]:
+        cache.store("v1", f"Am I a good fit for {role}?", fit(role))
+    assert cache.lookup("v1", "Am I a good fit for data engineer?") is not None
+    cache.store("v1", f"Am I a good fit for {roles[2]}?", fit(roles[2]))
+    assert cache.lookup("v1", "Am I a good fit for data scientist?") is None
+    assert cache.lookup("v1", "Am I a good fit for data engineer?") is not None
+    assert cache.summary()["evictions"] == 1
+
+    cache = ResponseCache(max_entries=2)
+    for version, role in enumerate(roles):
+        cache.store(f"v{version}", f"Am I a good fit for {role}?", fit(role))
+    assert cache.summary()["entries"] == 2
+    assert cache.lookup("v0", "Am I a good fit for data engineer?") is None
+
+
+def test_identical_question_replaces_entry():
+    cache = ResponseCache()
+    cache.store("v1", "Please analyze my LinkedIn profile", ANALYSIS)
+    cache.store("v1", "please ANALYZE my linkedin profile!", ANALYSIS)
+    assert cache.summary()["entries"] == 1
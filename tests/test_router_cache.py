@@ -0,0 +1,29 @@
+import os
+
+# agent.py refuses to import without a key; no call reaches Groq here
+os.environ.setdefault("GROQ_API_KEY", "test-key")
+
+from langchain_core.messages import AIMessage  # noqa: E402
+
+import agent  # noqa: E402
+from response_cache import ResponseCache  # noqa: E402
+
+QUESTION = "Please analyze my LinkedIn profile"
+
+
+def test_text_only_router_answer_is_not_cached(monkeypatch):
+    cache = ResponseCache()
+    monkeypatch.setattr(agent, "response_cache", cache)
+    agent.remember_router_response("v1", QUESTION, AIMessage(content="Your profile looks strong."), 1.0)
+    assert cache.summary()["entries"] == 0
+    assert agent.cached_router_response("v1", QUESTION) is None
+
+
+def test_tool_routing_is_cached_and_replayed(monkeypatch):
+    cache = ResponseCache()
+    monkeypatch.setattr(agent, "response_cache", cache)
+    routed = AIMessage(content="", tool_calls=[{"name": "profile_analyzer", "args": {}, "id": "call_1"}])
+    agent.remember_router_response("v1", QUESTION, routed, 1.0)
+    replayed = agent.cached_router_response("v1", "analyse my linkedin profile please")
+    assert [call["name"] for call in replayed.tool_calls] == ["profile_analyzer"]
+    assert replayed.tool_calls[0]["id"] != "call_1"
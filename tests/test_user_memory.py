@@ -0,0 +1,42 @@
+import json
+
+from chatbot_model import UserMemory
+from storage import MemoryStore
+
+
+def test_history_keeps_keys_not_values():
+    store = MemoryStore()
+    memory = UserMemory("t1", store=store)
+    value = {"analysis": "x" * 5000}
+    for key in ("a", "b", "a"):
+        memory.save(key, value)
+    payload = store.get(memory.store_key)
+    assert len(json.dumps(payload)) < 2.5 * len(json.dumps(value))
+    assert [key for key, _ in payload["history"]] == ["a", "b", "a"]
+    assert [(key, v) for key, _, v in memory.get_history()] == [("a", value), ("b", value), ("a", value)]
+
+
+def test_get_is_lru():
+    memory = UserMemory(max_entries=2)
+    memory.save("a", 1)
+    memory.save("b", 2)
+    assert memory.get("a") == 1
+    memory.save("c", 3)
+    assert memory.get("b") is None and memory.get("a") == 1
+
+
+def test_loads_history_saved_with_values():
+    store = MemoryStore()
+    store.set("memory:t1", {"latest": [["a", 1]], "history": [["a", {"v": 1}]], "target_roles": []})
+    memory = UserMemory("t1", store=store)
+    assert memory.get_history() == [("a", None, 1)]
+
+
+def test_target_roles_keep_display_form():
+    store = MemoryStore()
+    memory = UserMemory("t1", store=store)
+    memory.add_target_role("Data Engineer")
+    memory.add_target_role("ML  Engineer")
+    memory.add_target_role("data engineer")
+    memory.save("k", 1)
+    assert UserMemory("t1", store=store).target_roles == ["ML Engineer", "data engineer"]